@@ -0,0 +1,122 @@
+"""
+Admission control for /chat.
+
+At most `max_active` chat streams run at once and up to `max_queue` more wait for a
+slot. Each session can only have one message being answered at a time: overlapping
+messages are either rejected or queued behind it, depending on `session_policy`.
+"""
+
+import asyncio
+import math
+import time
+from typing import Dict, List, Literal
+
+from backend import metrics
+
+SessionPolicy = Literal["reject", "queue"]
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class ChatAdmission:
+    def __init__(
+        self,
+        max_active: int,
+        max_queue: int,
+        queue_timeout: float,
+        session_policy: SessionPolicy = "reject",
+    ):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.session_policy = session_policy
+
+        self._slots = asyncio.Semaphore(max_active)
+        self._active = 0
+        self._waiting = 0
+        # session_id -> [lock, number of requests holding or waiting for it]
+        self._sessions: Dict[str, List] = {}
+
+    def _retry_after(self) -> int:
+        """Estimates how long until a slot frees up, from recent chat durations."""
+        avg = metrics.percentile("chat.duration_seconds", 50) or 5.0
+        return max(1, math.ceil(avg * (self._waiting + 1) / self.max_active))
+
+    def _update_gauges(self) -> None:
+        metrics.set_gauge("chat.active", self._active)
+        metrics.set_gauge("chat.queue_depth", self._waiting)
+
+    async def acquire(self, session_id: str) -> None:
+        """
+        Waits for a chat slot for this session.
+        Raises AdmissionRejected (429 for session overlap, 503 when full) instead of waiting
+        when the request can't be admitted in time.
+        """
+        session = self._sessions.get(session_id)
+        if session and self.session_policy == "reject":
+            metrics.incr("chat.rejected_session_busy")
+            raise AdmissionRejected(
+                429, "A message for this session is still being answered.", 2
+            )
+
+        if self._waiting >= self.max_queue and (
+            self._slots.locked() or session is not None
+        ):
+            metrics.incr("chat.rejected_queue_full")
+            raise AdmissionRejected(
+                503, "The assistant is busy, please retry shortly.", self._retry_after()
+            )
+
+        if session is None:
+            session = self._sessions[session_id] = [asyncio.Lock(), 0]
+        session[1] += 1
+
+        self._waiting += 1
+        self._update_gauges()
+        start = time.monotonic()
+        holds_session = False
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                await session[0].acquire()
+                holds_session = True
+                await self._slots.acquire()
+        except TimeoutError:
+            if holds_session:
+                session[0].release()
+            self._drop_session(session_id, session)
+            metrics.incr("chat.rejected_timeout")
+            raise AdmissionRejected(
+                503, "The assistant is busy, please retry shortly.", self._retry_after()
+            )
+        except BaseException:
+            if holds_session:
+                session[0].release()
+            self._drop_session(session_id, session)
+            raise
+        finally:
+            self._waiting -= 1
+            metrics.observe("chat.queue_wait_seconds", time.monotonic() - start)
+            self._update_gauges()
+
+        self._active += 1
+        metrics.incr("chat.admitted")
+        self._update_gauges()
+
+    def release(self, session_id: str) -> None:
+        session = self._sessions[session_id]
+        self._slots.release()
+        session[0].release()
+        self._drop_session(session_id, session)
+        self._active -= 1
+        self._update_gauges()
+
+    def _drop_session(self, session_id: str, session: List) -> None:
+        session[1] -= 1
+        if session[1] == 0:
+            del self._sessions[session_id]
@@ -0,0 +1,202 @@
+"""
+Decoding of /chat attachments.
+
+The website sends each attached PDF gzip compressed and base64 encoded, and sends it
+again with every later message. Attachments are decoded in chunks with a cap on the
+upload and on the decompressed size, hashed on the way, and uploaded once through the
+model backend's file API. The session keeps the file reference by upload and content
+hash, and the stored history keeps the file part of the message that shared it, so later
+turns see the transcript without it being decoded, uploaded or sent again. A re-attached
+file is only referenced again once it is no longer in the (bounded) history.
+"""
+
+import base64
+import binascii
+import hashlib
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from google.genai import types
+
+from backend import metrics
+from backend.constants import (
+    MAX_ATTACHMENTS,
+    MAX_ATTACHMENT_BYTES,
+    MAX_ATTACHMENT_UPLOAD_BYTES,
+)
+
+# base64 characters decoded per step, a multiple of 4 so every chunk decodes on its own
+DECODE_CHUNK_CHARS = 256 * 1024
+# zlib wbits for a gzip header and trailer
+GZIP_WBITS = 31
+PDF_MIME_TYPE = "application/pdf"
+# uploaded files that expire sooner than this are uploaded again
+FILE_EXPIRY_MARGIN_SECONDS = 10 * 60
+DUPLICATE_NOTE = "[{name} was already shared in this conversation.]"
+
+# {"uri", "mime_type", "expires_at" (unix time or None)} of an uploaded file
+FileRef = Dict[str, Any]
+
+
+class AttachmentError(Exception):
+    pass
+
+
+def upload_hash(encoded: str) -> str:
+    """Hash of the attachment as uploaded, checked before anything is decoded."""
+    return hashlib.sha256(encoded.encode("ascii", errors="replace")).hexdigest()
+
+
+def decode_attachment(
+    encoded: str, max_bytes: int = MAX_ATTACHMENT_BYTES
+) -> Tuple[bytes, str]:
+    """
+    Decodes a base64 gzip attachment chunk by chunk, stopping as soon as the output
+    goes over max_bytes. Returns the data and the sha256 of the decompressed content.
+    """
+    decompressor = zlib.decompressobj(wbits=GZIP_WBITS)
+    digest = hashlib.sha256()
+    chunks: List[bytes] = []
+    total = 0
+
+    try:
+        for start in range(0, len(encoded), DECODE_CHUNK_CHARS):
+            compressed = base64.b64decode(
+                encoded[start : start + DECODE_CHUNK_CHARS], validate=True
+            )
+            while compressed:
+                chunk = decompressor.decompress(compressed, max_bytes - total + 1)
+                total += len(chunk)
+                if total > max_bytes:
+                    raise AttachmentError(
+                        f"Attachment is larger than {max_bytes // (1024 * 1024)} MB."
+                    )
+                digest.update(chunk)
+                chunks.append(chunk)
+                compressed = decompressor.unconsumed_tail
+    except (binascii.Error, zlib.error) as e:
+        raise AttachmentError(f"Attachment could not be decoded: {e}")
+
+    if not decompressor.eof:
+        raise AttachmentError("Attachment is truncated.")
+    return b"".join(chunks), digest.hexdigest()
+
+
+def shared_file_uris(history: List[types.Content]) -> Set[str]:
+    """URIs of the files the history still carries."""
+    return {
+        part.file_data.file_uri
+        for content in history
+        for part in content.parts or []
+        if part.file_data and part.file_data.file_uri
+    }
+
+
+def drop_expired_files(
+    files: Dict[str, FileRef],
+    history: List[types.Content],
+    now: Optional[float] = None,
+) -> Tuple[Dict[str, FileRef], List[types.Content]]:
+    """
+    Forgets files that expired (or are about to) and removes their parts from the
+    history, the model would reject them. A re-attached file is then uploaded again.
+    """
+    now = time.time() if now is None else now
+    expired = {
+        ref["uri"]
+        for ref in files.values()
+        if ref.get("expires_at")
+        and ref["expires_at"] - FILE_EXPIRY_MARGIN_SECONDS < now
+    }
+    if not expired:
+        return files, history
+
+    kept = []
+    for content in history:
+        parts = [
+            part
+            for part in content.parts or []
+            if not (part.file_data and part.file_data.file_uri in expired)
+        ]
+        if parts:
+            kept.append(content.model_copy(update={"parts": parts}))
+    files = {key: ref for key, ref in files.items() if ref["uri"] not in expired}
+    return files, kept
+
+
+def prepare_message_parts(
+    input_text: str,
+    attachments: List[str],
+    files: Dict[str, FileRef],
+    shared_uris: Set[str],
+    upload: Callable[[bytes, str], FileRef],
+) -> Tuple[List[Union[str, types.Part]], Dict[str, FileRef]]:
+    """
+    Builds the parts of a user message from its text and attachments. files maps the
+    upload and content hashes of the session's files to their references, shared_uris
+    are the files the history still carries. New files are decoded and uploaded, known
+    files are referenced again only when the history no longer has them, and files
+    already in the history, repeated in the message or that can't be decoded become a
+    note for the model. Returns the parts and the new file references by hash.
+    Blocking, run it in an executor.
+    """
+    parts: List[Union[str, types.Part]] = [input_text]
+    new_files: Dict[str, FileRef] = {}
+    message_uris: Set[str] = set()
+
+    for i, encoded in enumerate(attachments):
+        name = f"Attachment {i + 1}"
+        if i >= MAX_ATTACHMENTS:
+            parts.append(
+                f"[{name} was skipped, at most {MAX_ATTACHMENTS} per message.]"
+            )
+            continue
+        if len(encoded) > MAX_ATTACHMENT_UPLOAD_BYTES:
+            metrics.incr("attachments.rejected")
+            parts.append(f"[{name} was skipped, the upload is too large.]")
+            continue
+
+        uploaded = upload_hash(encoded)
+        ref = files.get(uploaded) or new_files.get(uploaded)
+        if ref is None:
+            start = time.perf_counter()
+            try:
+                data, content = decode_attachment(encoded)
+            except AttachmentError as e:
+                print(f"Error processing attachment: {e}")
+                metrics.incr("attachments.rejected")
+                parts.append(f"[{name} was skipped: {e}]")
+                continue
+            finally:
+                metrics.observe(
+                    "attachments.decode_seconds", time.perf_counter() - start
+                )
+
+            # the same file compressed differently is known by its content hash
+            ref = files.get(content) or new_files.get(content)
+            if ref is None:
+                try:
+                    ref = upload(data, PDF_MIME_TYPE)
+                    metrics.incr("attachments.uploaded")
+                except Exception as e:
+                    # this message still gets the file, later ones upload it again
+                    print(f"Error uploading attachment: {e}")
+                    metrics.incr("attachments.upload_errors")
+                    parts.append(
+                        types.Part.from_bytes(data=data, mime_type=PDF_MIME_TYPE)
+                    )
+                    continue
+            new_files[uploaded] = new_files[content] = ref
+
+        if ref["uri"] in shared_uris or ref["uri"] in message_uris:
+            metrics.incr("attachments.deduplicated")
+            parts.append(DUPLICATE_NOTE.format(name=name))
+            continue
+        message_uris.add(ref["uri"])
+        metrics.incr("attachments.referenced")
+        parts.append(
+            types.Part.from_uri(file_uri=ref["uri"], mime_type=ref["mime_type"])
+        )
+
+    return parts, new_files
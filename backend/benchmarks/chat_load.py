@@ -0,0 +1,213 @@
+"""
+Load generator for /chat.
+
+Drives N concurrent sessions, each sending a few messages, and reports throughput,
+time-to-first-token, end-to-end latency, rejections and the per-tool latency breakdown
+from /metrics. By default the app is started in-process with the fake model backend
+(the tools are real, so Chroma and the local models are loaded) and, with --fake-redis,
+an in-memory Redis seeded from the local data files.
+
+    python -m backend.benchmarks.chat_load --sessions 20 --messages 3 --fake-redis
+    python -m backend.benchmarks.chat_load --url http://127.0.0.1:3001 --sessions 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import threading
+import time
+import uuid
+from typing import Any, Dict, List
+
+import httpx
+
+MESSAGES = [
+    "intro machine learning",
+    "easy gen ed classes",
+    "what databases courses can I take",
+    "make me a schedule",
+    "something about data structures in python",
+]
+
+
+def use_fake_redis() -> None:
+    import fakeredis
+    from backend import constants as c
+
+    server = fakeredis.FakeServer()
+    c._REDIS = fakeredis.FakeRedis(server=server, decode_responses=True)
+    c._ASYNC_REDIS = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    for key, path in (
+        (c.REDIS_COURSES_KEY, c.COURSE_DATA_FILE),
+        (c.REDIS_LECTURERS_KEY, c.LECTURERS_DATA_FILE),
+    ):
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                c._REDIS.set(key, f.read())
+        else:
+            print(f"Warning: {path} not found, Redis key '{key}' left empty.")
+
+
+def start_local_server(port: int, token_delay: float, first_token_delay: float):
+    import uvicorn
+    from backend import constants as c
+    from backend.models import FakeBackend
+    from backend.server import app
+
+    # FAKE_LLM_SCRIPT_FILE can change the replies and inject errors and stalls
+    script = FakeBackend.from_file(c.FAKE_LLM_SCRIPT_FILE).script
+    c._MODEL_BACKEND = FakeBackend(
+        script, token_delay=token_delay, first_token_delay=first_token_delay
+    )
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    return server
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = await client.get("/ready")
+            if response.status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise TimeoutError("Server did not become ready in time.")
+
+
+async def send_message(
+    client: httpx.AsyncClient, session_id: str, query: str, term: str
+) -> Dict[str, Any]:
+    start = time.perf_counter()
+    first_token = None
+    schedules = 0
+    lines = 0
+    body = {"sessionID": session_id, "query": query, "term": term}
+    async with client.stream("POST", "/chat", json=body) as response:
+        if response.status_code != 200:
+            await response.aread()
+            return {
+                "status": response.status_code,
+                "retry_after": float(response.headers.get("Retry-After", 1)),
+            }
+        async for line in response.aiter_lines():
+            if not line.strip():
+                continue
+            lines += 1
+            chunk = json.loads(line)
+            if chunk["type"] == "text" and first_token is None:
+                first_token = time.perf_counter() - start
+            elif chunk["type"] == "schedule":
+                schedules += 1
+    return {
+        "status": 200,
+        "ttft": first_token,
+        "latency": time.perf_counter() - start,
+        "schedules": schedules,
+        "lines": lines,
+    }
+
+
+async def run_session(
+    client: httpx.AsyncClient, messages: int, term: str, results: List[Dict]
+) -> None:
+    session_id = str(uuid.uuid4())
+    for i in range(messages):
+        query = MESSAGES[i % len(MESSAGES)]
+        while True:
+            result = await send_message(client, session_id, query, term)
+            results.append(result)
+            if result["status"] == 200:
+                break
+            await asyncio.sleep(result["retry_after"])
+
+
+def percentiles(values: List[float]) -> str:
+    if not values:
+        return "n/a"
+    values = sorted(values)
+    p95 = values[int(round(0.95 * (len(values) - 1)))]
+    return f"p50={statistics.median(values) * 1000:.0f}ms p95={p95 * 1000:.0f}ms"
+
+
+async def run(args) -> None:
+    async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+        await wait_until_ready(client, args.ready_timeout)
+
+        results: List[Dict] = []
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                run_session(client, args.messages, args.term, results)
+                for _ in range(args.sessions)
+            )
+        )
+        elapsed = time.perf_counter() - start
+
+        ok = [r for r in results if r["status"] == 200]
+        rejected = [r for r in results if r["status"] != 200]
+        print(f"sessions={args.sessions} messages={len(ok)} in {elapsed:.2f}s")
+        print(f"throughput: {len(ok) / elapsed:.2f} messages/s")
+        print(
+            f"time to first token: {percentiles([r['ttft'] for r in ok if r['ttft']])}"
+        )
+        print(f"latency: {percentiles([r['latency'] for r in ok])}")
+        if ok:
+            print(f"lines per message: {statistics.mean(r['lines'] for r in ok):.1f}")
+        print(
+            f"rejected: {len(rejected)} "
+            f"(429: {sum(r['status'] == 429 for r in rejected)}, "
+            f"503: {sum(r['status'] == 503 for r in rejected)})"
+        )
+
+        snapshot = (await client.get("/metrics")).json()
+        print("server timings:")
+        for name, timing in sorted(snapshot["timings"].items()):
+            if name.startswith(("tool.", "chat.", "executor.")):
+                print(
+                    f"  {name:40} n={timing['count']:<5} "
+                    f"p50={timing['p50'] * 1000:.1f}ms p95={timing['p95'] * 1000:.1f}ms"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the /chat endpoint.")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=3)
+    parser.add_argument("--term", type=str, default="202610")
+    parser.add_argument(
+        "--url", type=str, help="Target a running server instead of starting one."
+    )
+    parser.add_argument("--port", type=int, default=3101)
+    parser.add_argument("--fake-redis", action="store_true")
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--ready-timeout", type=float, default=600)
+    parser.add_argument(
+        "--coalesce-seconds",
+        type=float,
+        help="STREAM_COALESCE_SECONDS for the local server, 0 sends every chunk.",
+    )
+    args = parser.parse_args()
+
+    if args.coalesce_seconds is not None:
+        # read when backend.constants is first imported
+        os.environ["STREAM_COALESCE_SECONDS"] = str(args.coalesce_seconds)
+
+    if not args.url:
+        if args.fake_redis:
+            use_fake_redis()
+        start_local_server(args.port, args.token_delay, args.first_token_delay)
+        args.url = f"http://127.0.0.1:{args.port}"
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
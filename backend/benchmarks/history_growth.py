@@ -0,0 +1,123 @@
+"""
+Measures the per-message cost of loading and saving chat history as a session grows.
+
+Every simulated message adds a turn with a course_query result (and a make_schedule result
+every third message). For each message the stored history is loaded, the new turn is
+appended and the history is saved again, once as unbounded plain JSON (the previous
+format) and once through dump_history/load_history.
+
+    python -m backend.benchmarks.history_growth --messages 60
+"""
+
+import argparse
+import json
+import time
+from typing import List
+
+from google.genai import types
+
+from backend.sessions import dump_history, load_history
+
+
+def make_turn(i: int) -> List[types.Content]:
+    search_result = [
+        {
+            "id": f"CS {100 + j}",
+            "document": f"Course {j} of message {i}. " + "Lorem ipsum dolor sit. " * 20,
+            "init_distance": 0.5,
+            "score": 1.0 / (j + 1),
+        }
+        for j in range(20)
+    ]
+    turn = [
+        types.Content(role="user", parts=[types.Part(text=f"message {i}")]),
+        types.Content(
+            role="model",
+            parts=[
+                types.Part.from_function_call(
+                    name="course_query", args={"query": f"message {i}"}
+                )
+            ],
+        ),
+        types.Content(
+            role="user",
+            parts=[
+                types.Part.from_function_response(
+                    name="course_query", response={"search_result": search_result}
+                )
+            ],
+        ),
+    ]
+    if i % 3 == 0:
+        schedule = {
+            "sections": [
+                {"course": f"CS {100 + j}", "section_id": "002", "crn": "12345"}
+                for j in range(5)
+            ],
+            "days_used": ["M", "W"],
+            "num_days": 2,
+        }
+        turn += [
+            types.Content(
+                role="model",
+                parts=[
+                    types.Part.from_function_call(
+                        name="make_schedule", args={"courses": ["CS 100"]}
+                    )
+                ],
+            ),
+            types.Content(
+                role="user",
+                parts=[
+                    types.Part.from_function_response(
+                        name="make_schedule",
+                        response={"schedules": [schedule] * 5, "errors": None},
+                    )
+                ],
+            ),
+        ]
+    turn.append(
+        types.Content(role="model", parts=[types.Part(text="Here you go. " * 60)])
+    )
+    return turn
+
+
+def unbounded_dump(history: List[types.Content]) -> str:
+    return json.dumps([h.model_dump(exclude_none=True) for h in history])
+
+
+def unbounded_load(history_str: str) -> List[types.Content]:
+    if not history_str:
+        return []
+    return [types.Content.model_validate(h) for h in json.loads(history_str)]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark chat history cost as a session grows."
+    )
+    parser.add_argument("--messages", type=int, default=60)
+    args = parser.parse_args()
+
+    stores = {
+        "unbounded": (unbounded_load, unbounded_dump, ""),
+        "bounded": (load_history, dump_history, ""),
+    }
+    print(
+        f"{'msg':>4} | {'unbounded ms':>12} {'bytes':>9} | {'bounded ms':>10} {'bytes':>7}"
+    )
+    for i in range(1, args.messages + 1):
+        row = []
+        for name, (load, dump, stored) in stores.items():
+            start = time.perf_counter()
+            history = load(stored) + make_turn(i)
+            stored = dump(history)
+            row.append(((time.perf_counter() - start) * 1000, len(stored)))
+            stores[name] = (load, dump, stored)
+        if i == 1 or i % 10 == 0:
+            (u_ms, u_bytes), (b_ms, b_bytes) = row
+            print(f"{i:>4} | {u_ms:>12.2f} {u_bytes:>9} | {b_ms:>10.2f} {b_bytes:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Parse time of the section and catalog pages per HTML parser (bs4 is the original
+BeautifulSoup/html.parser code, lxml the default since).
+
+    python -m backend.benchmarks.html_parsing
+    python -m backend.benchmarks.html_parsing --courses 120 --repeat 50
+    python -m backend.benchmarks.html_parsing --sections saved/CS.html saved/MATH.html
+
+Without files, one subject page is built from the course headings and tables of the
+test fixture repeated until it lists --courses courses, and the catalog fixture is
+repeated the same way. Both engines are checked to give the same output first.
+"""
+
+import argparse
+import os
+import re
+import statistics
+import time
+from typing import Callable, List
+
+from backend.scrapers.parsing import parse_catalog_html, parse_sections_html
+
+FIXTURES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "fixtures"
+)
+ENGINES = ("bs4", "lxml")
+
+
+def read(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def synthetic_sections(courses: int) -> str:
+    fixture = read(os.path.join(FIXTURES_DIR, "sections_cs.html"))
+    blocks = re.findall(r"<h4 id=.*?</table>", fixture, flags=re.S)
+    page = [
+        block.replace('id="CS&nbsp;', f'id="CS&nbsp;{i}')
+        for i in range(courses // len(blocks) + 1)
+        for block in blocks
+    ]
+    return "<div>" + "\n".join(page[:courses]) + "</div>"
+
+
+def synthetic_catalog(courses: int) -> str:
+    fixture = read(os.path.join(FIXTURES_DIR, "catalog_computing.html"))
+    start = fixture.index('<div class="sc_sccoursedescs">')
+    end = fixture.index("</div>\n</div>\n</body>")
+    blocks = fixture[start:end]
+    return fixture[:start] + blocks * (courses // 4 + 1) + fixture[end:]
+
+
+def timed(fn: Callable[[], object], repeat: int) -> List[float]:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def compare(name: str, pages: List[str], parse, repeat: int) -> None:
+    for page in pages:
+        if parse(page, engine="bs4") != parse(page, engine="lxml"):
+            raise SystemExit(f"{name}: the engines disagree on a page")
+
+    means = {}
+    for engine in ENGINES:
+        times = [
+            t
+            for page in pages
+            for t in timed(lambda: parse(page, engine=engine), repeat)
+        ]
+        means[engine] = statistics.mean(times)
+        print(
+            f"{name:8} {engine:5} p50={statistics.median(times) * 1000:7.2f}ms "
+            f"mean={means[engine] * 1000:7.2f}ms per page"
+        )
+    print(f"{name:8} speedup {means['bs4'] / means['lxml']:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scraper HTML parsers.")
+    parser.add_argument("--courses", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--sections", nargs="*", help="Saved section pages.")
+    parser.add_argument("--catalog", nargs="*", help="Saved catalog pages.")
+    args = parser.parse_args()
+
+    sections = [read(p) for p in args.sections or []] or [
+        synthetic_sections(args.courses)
+    ]
+    catalog = [read(p) for p in args.catalog or []] or [synthetic_catalog(args.courses)]
+    compare("sections", sections, parse_sections_html, args.repeat)
+    compare("catalog", catalog, parse_catalog_html, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
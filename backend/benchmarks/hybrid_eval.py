@@ -0,0 +1,123 @@
+"""
+Offline comparison of embedding-only and hybrid (BM25 + embeddings, fused by reciprocal
+rank fusion) candidate search for course_query.
+
+    python -m backend.benchmarks.hybrid_eval --sample 200
+    python -m backend.benchmarks.hybrid_eval --sample 200 --rerank
+
+Queries are built from the catalog, each with the courses it should find:
+
+- code:    "cs341" -> CS 341
+- title:   the lowercased course title -> that course
+- keyword: a distinctive word of titles ("capstone", "python") -> every course whose
+           title contains it
+
+For both paths it reports recall@k of the candidate pool (and of the reranked results
+with --rerank), the pool size and p50/p95 latency of candidate search.
+"""
+
+import argparse
+import random
+import statistics
+import time
+from typing import Dict, List, Set, Tuple
+
+KEYWORDS = ["capstone", "python", "java", "seminar", "laboratory", "calculus", "ethics"]
+
+
+def labeled_queries(sample: int, seed: int) -> List[Tuple[str, str, Set[str]]]:
+    from backend.constants import COURSE_DATA
+    from backend.lexical_index import tokenize
+
+    rng = random.Random(seed)
+    course_ids = sorted(COURSE_DATA)
+    picked = rng.sample(course_ids, min(sample, len(course_ids)))
+    queries = []
+    for course_id in picked:
+        queries.append(("code", course_id.replace(" ", "").lower(), {course_id}))
+        queries.append(("title", COURSE_DATA[course_id].title.lower(), {course_id}))
+    for keyword in KEYWORDS:
+        expected = {
+            i for i in course_ids if keyword in tokenize(COURSE_DATA[i].title or "")
+        }
+        if expected:
+            queries.append(("keyword", keyword, expected))
+    return queries
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[int(round(p / 100 * (len(values) - 1)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate hybrid course search.")
+    parser.add_argument("--term", type=str, default="202610")
+    parser.add_argument("--sample", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 10])
+    parser.add_argument("--rerank", action="store_true")
+    args = parser.parse_args()
+
+    from backend import constants as c
+    from backend.functions import (
+        available_mask,
+        construct_term_courses,
+        initialize_database,
+        search_candidates,
+        set_local_data,
+        sync_lexical_index,
+    )
+    from backend.inference import embed_query
+    from backend.reranker import rerank
+    from backend.types import UserFulfilled
+
+    c.get_redis()
+    set_local_data()
+    construct_term_courses()
+    sync_lexical_index()
+    c.get_chroma_collection()
+    initialize_database()
+    if args.rerank:
+        c.get_cross_encoder()
+
+    queries = labeled_queries(args.sample, args.seed)
+    mask = available_mask(UserFulfilled(), False, False, args.term)
+    top_n = max(args.k)
+
+    for hybrid in (False, True):
+        times: List[float] = []
+        pool_sizes: List[int] = []
+        # (kind, stage, k) -> recalls
+        recalls: Dict[Tuple[str, str, int], List[float]] = {}
+        for kind, query, expected in queries:
+            embedding = embed_query(query)
+            start = time.perf_counter()
+            candidates = search_candidates(query, embedding, mask, top_n, hybrid)
+            times.append(time.perf_counter() - start)
+            pool_sizes.append(len(candidates))
+
+            stages = {"pool": [item["id"] for item in candidates]}
+            if args.rerank:
+                stages["reranked"] = [
+                    item["id"] for item in rerank(query, candidates, top_n)
+                ]
+            for stage, ids in stages.items():
+                for k in args.k:
+                    limit = len(ids) if stage == "pool" else k
+                    found = len(expected & set(ids[:limit]))
+                    recall = found / min(len(expected), k)
+                    recalls.setdefault((kind, stage, k), []).append(min(1.0, recall))
+
+        print(f"{'hybrid' if hybrid else 'embeddings only'}:")
+        print(
+            f"  candidate search p50={statistics.median(times) * 1000:.2f}ms "
+            f"p95={percentile(times, 95) * 1000:.2f}ms "
+            f"pool={statistics.mean(pool_sizes):.0f}"
+        )
+        for (kind, stage, k), values in sorted(recalls.items()):
+            print(f"  {kind:8} {stage:9} recall@{k:<3} {statistics.mean(values):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Latency, throughput and memory of the INFERENCE_BACKENDs, each in a fresh process so
+the memory is what one worker would hold.
+
+    python -m backend.benchmarks.inference_backends
+    python -m backend.benchmarks.inference_backends --backends torch onnx --pairs 50
+
+Per backend it reports the time to load both models, the resident memory afterwards,
+p50/p95 latency of embedding one query and of scoring one rerank batch, and the
+throughput of scoring pairs.
+"""
+
+import argparse
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from typing import List
+
+DOCUMENT = (
+    "Data Structures and Algorithms Abstract data types, lists, stacks, queues, "
+    "trees, graphs, sorting and searching, with an introduction to complexity."
+)
+
+
+def max_rss_mb() -> float:
+    # kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentiles(times: List[float]) -> str:
+    times = sorted(times)
+    p95 = times[int(round(0.95 * (len(times) - 1)))]
+    return f"p50={statistics.median(times) * 1000:.1f}ms p95={p95 * 1000:.1f}ms"
+
+
+def measure(backend: str, pairs: int, repeat: int) -> dict:
+    from backend.inference_backends import load_cross_encoder, load_embedding_function
+
+    start = time.perf_counter()
+    ef = load_embedding_function(backend)
+    cross_encoder = load_cross_encoder(backend)
+    load_seconds = time.perf_counter() - start
+
+    batch = [["intro to data structures", f"{DOCUMENT} {i}"] for i in range(pairs)]
+    ef(["warm up"])
+    cross_encoder.predict(batch)
+
+    embed_times, rerank_times = [], []
+    for i in range(repeat):
+        start = time.perf_counter()
+        ef([f"intro machine learning {i}"])
+        embed_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        cross_encoder.predict(batch)
+        rerank_times.append(time.perf_counter() - start)
+
+    return {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 2),
+        "rss_mb": round(max_rss_mb(), 1),
+        "embed": percentiles(embed_times),
+        "rerank": percentiles(rerank_times),
+        "pairs_per_second": round(pairs * repeat / sum(rerank_times), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inference backends.")
+    parser.add_argument("--backends", nargs="+", default=["torch", "int8", "onnx"])
+    parser.add_argument("--pairs", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.backends[0], args.pairs, args.repeat)))
+        return
+
+    for backend in args.backends:
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "backend.benchmarks.inference_backends",
+                "--worker",
+                "--backends",
+                backend,
+                "--pairs",
+                str(args.pairs),
+                "--repeat",
+                str(args.repeat),
+            ],
+            capture_output=True,
+            text=True,
+        )
+        if output.returncode != 0:
+            print(f"{backend:6} failed: {output.stderr.strip().splitlines()[-1:]}")
+            continue
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        print(
+            f"{backend:6} load={result['load_seconds']}s rss={result['rss_mb']}MB "
+            f"embed {result['embed']}  rerank({args.pairs}) {result['rerank']} "
+            f"{result['pairs_per_second']} pairs/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Throughput of cross-encoder scoring from concurrent searches, one forward pass per
+request against micro-batched passes.
+
+    python -m backend.benchmarks.inference_batching --threads 16
+    python -m backend.benchmarks.inference_batching --fake --threads 16
+
+--fake replaces the model with a stand-in costing --call-ms per forward pass plus
+--pair-ms per pair, roughly the shape of a small model on CPU, so it runs without
+sentence-transformers.
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from typing import Callable, List
+
+from backend.inference import MicroBatcher
+
+QUERY = "intro machine learning"
+
+
+def fake_scorer(
+    call_ms: float, pair_ms: float
+) -> Callable[[List[List[str]]], List[float]]:
+    lock = threading.Lock()
+
+    def score(pairs):
+        # one forward pass at a time, like a model saturating the CPU
+        with lock:
+            time.sleep((call_ms + pair_ms * len(pairs)) / 1000)
+        return [float(len(d)) for _, d in pairs]
+
+    return score
+
+
+def run(name: str, score, threads: int, requests: int, pairs: int) -> None:
+    batch = [[QUERY, f"course description {i}"] for i in range(pairs)]
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(requests):
+            start = time.perf_counter()
+            score(batch)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p95 = latencies[int(round(0.95 * (len(latencies) - 1)))]
+    print(
+        f"{name:24} {len(latencies) / elapsed:8.1f} req/s  "
+        f"p50={statistics.median(latencies) * 1000:.1f}ms p95={p95 * 1000:.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inference micro-batching.")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--pairs", type=int, default=32)
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--fake", action="store_true")
+    parser.add_argument("--call-ms", type=float, default=8)
+    parser.add_argument("--pair-ms", type=float, default=0.4)
+    args = parser.parse_args()
+
+    if args.fake:
+        score = fake_scorer(args.call_ms, args.pair_ms)
+    else:
+        from backend import constants as c
+
+        model = c.get_cross_encoder()
+
+        def score(pairs):
+            return [float(s) for s in model.predict(pairs)]
+
+    run("unbatched", score, args.threads, args.requests, args.pairs)
+    batcher = MicroBatcher(
+        "bench", score, window=args.window_ms / 1000, max_batch=args.max_batch
+    )
+    run("micro-batched", batcher, args.threads, args.requests, args.pairs)
+
+
+if __name__ == "__main__":
+    main()
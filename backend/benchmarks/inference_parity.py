@@ -0,0 +1,108 @@
+"""
+Checks that an INFERENCE_BACKEND ranks courses like the full precision torch models.
+
+    python -m backend.benchmarks.inference_parity --backend int8
+    python -m backend.benchmarks.inference_parity --backend onnx --sample 1000
+
+Embeds a sample of catalog documents and the benchmark queries with both backends and
+reports:
+
+- cosine similarity of the embeddings of the same text
+- overlap@k of the vector search results of each query
+- overlap@k and Spearman correlation of the cross-encoder ranking of each query's
+  candidates
+"""
+
+import argparse
+import random
+import statistics
+from typing import List
+
+import numpy as np
+
+from backend.benchmarks.rerank_eval import MORE_QUERIES
+from backend.benchmarks.vector_search import QUERIES
+
+
+def spearman(a: np.ndarray, b: np.ndarray) -> float:
+    rank_a = np.argsort(np.argsort(a))
+    rank_b = np.argsort(np.argsort(b))
+    return float(np.corrcoef(rank_a, rank_b)[0, 1])
+
+
+def normalized(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def overlap(a: List[int], b: List[int]) -> float:
+    return len(set(a) & set(b)) / len(a)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare inference backends.")
+    parser.add_argument("--backend", choices=["int8", "onnx"], required=True)
+    parser.add_argument("--sample", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--candidates", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from backend import constants as c
+    from backend.functions import generate_hash, set_local_data
+    from backend.inference_backends import load_cross_encoder, load_embedding_function
+
+    c.get_redis()
+    set_local_data()
+    rng = random.Random(args.seed)
+    ids = rng.sample(sorted(c.COURSE_DATA), min(args.sample, len(c.COURSE_DATA)))
+    documents = [
+        generate_hash(c.COURSE_DATA[i].title, c.COURSE_DATA[i].desc)[1] for i in ids
+    ]
+    queries = QUERIES + MORE_QUERIES
+
+    reference_ef = load_embedding_function("torch")
+    candidate_ef = load_embedding_function(args.backend)
+    reference_docs = normalized(reference_ef(documents))
+    candidate_docs = normalized(candidate_ef(documents))
+    reference_queries = normalized(reference_ef(queries))
+    candidate_queries = normalized(candidate_ef(queries))
+
+    cosines = (reference_docs * candidate_docs).sum(axis=1)
+    print(
+        f"document embedding cosine: mean={cosines.mean():.5f} min={cosines.min():.5f}"
+    )
+
+    search_overlap = []
+    candidate_lists = []
+    for reference_q, candidate_q in zip(reference_queries, candidate_queries):
+        reference_rank = np.argsort(-(reference_docs @ reference_q))
+        candidate_rank = np.argsort(-(candidate_docs @ candidate_q))
+        search_overlap.append(
+            overlap(list(reference_rank[: args.k]), list(candidate_rank[: args.k]))
+        )
+        candidate_lists.append(list(reference_rank[: args.candidates]))
+    print(f"vector search overlap@{args.k}: {statistics.mean(search_overlap):.3f}")
+
+    reference_ce = load_cross_encoder("torch")
+    candidate_ce = load_cross_encoder(args.backend)
+    rerank_overlap, correlations, score_diffs = [], [], []
+    for query, rows in zip(queries, candidate_lists):
+        pairs = [[query, documents[i]] for i in rows]
+        reference = np.asarray(reference_ce.predict(pairs), dtype=np.float32)
+        candidate = np.asarray(candidate_ce.predict(pairs), dtype=np.float32)
+        rerank_overlap.append(
+            overlap(
+                list(np.argsort(-reference)[: args.k]),
+                list(np.argsort(-candidate)[: args.k]),
+            )
+        )
+        correlations.append(spearman(reference, candidate))
+        score_diffs.append(float(np.abs(reference - candidate).max()))
+    print(f"rerank overlap@{args.k}: {statistics.mean(rerank_overlap):.3f}")
+    print(f"rerank spearman: mean={statistics.mean(correlations):.4f}")
+    print(f"rerank max score difference: {max(score_diffs):.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Coverage and parity of the rule-based prerequisite parser on the catalog.
+
+    python -m backend.benchmarks.prereq_rules
+    python -m backend.benchmarks.prereq_rules --show 20
+    python -m backend.benchmarks.prereq_rules --file backend/data/graph.json
+
+For every course in Redis, or in a course data file written by write_course_data_file,
+it runs the rules on the description and reports the fraction they parse (the model
+calls saved on a rebuild), how many of those agree with the stored model output (same
+prerequisite tree up to child order, no corequisites and no restrictions) and the
+disagreements, to be checked by hand.
+"""
+
+import argparse
+import json
+import time
+
+from backend.scrapers.prereq_rules import canonical_tree, parse_description
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prerequisite rules on the catalog.")
+    parser.add_argument("--show", type=int, default=10, help="Disagreements to print.")
+    parser.add_argument("--file", help="Course data file to use instead of Redis.")
+    args = parser.parse_args()
+
+    if args.file:
+        from backend.types import CourseStructureModel
+
+        with open(args.file, "r", encoding="utf-8") as f:
+            courses = CourseStructureModel.model_validate(json.load(f)).root
+    else:
+        from backend import constants as c
+        from backend.functions import set_local_data
+
+        c.get_redis()
+        set_local_data()
+        courses = c.COURSE_DATA
+
+    parsed = agree = 0
+    disagreements = []
+    start = time.perf_counter()
+    for course_id, course in sorted(courses.items()):
+        result = parse_description(course.desc)
+        if result is None:
+            continue
+        parsed += 1
+        stored = (
+            canonical_tree(course.prereq_tree),
+            canonical_tree(course.coreq_tree),
+            len(course.restrictions),
+        )
+        if stored == (canonical_tree(result["prereq_tree"]), None, 0):
+            agree += 1
+        else:
+            disagreements.append((course_id, course.desc, result, course))
+    seconds = time.perf_counter() - start
+
+    total = len(courses)
+    print(
+        f"rules parsed {parsed} of {total} descriptions ({parsed / max(total, 1):.1%}) "
+        f"in {seconds:.2f}s"
+    )
+    print(
+        f"agree with the stored trees: {agree} of {parsed} ({agree / max(parsed, 1):.1%})"
+    )
+    for course_id, desc, result, course in disagreements[: args.show]:
+        print(f"\n{course_id}: {desc}")
+        print(f"  rules:  {result['prereq_tree']}")
+        print(
+            f"  stored: {course.prereq_tree and course.prereq_tree.model_dump()} "
+            f"coreq={course.coreq_tree is not None} "
+            f"restrictions={len(course.restrictions)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
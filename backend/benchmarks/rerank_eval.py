@@ -0,0 +1,118 @@
+"""
+Recall and latency of staged reranking against reranking all RERANK_MAX_CANDIDATES
+bi-encoder candidates with the cross-encoder, which is what course_query used to do.
+
+    python -m backend.benchmarks.rerank_eval --top-n 5 10
+    python -m backend.benchmarks.rerank_eval --stop-margins 1 2 3 --min-candidates 30 50
+
+For every setting it reports recall@top_n of the staged results against the full
+rerank, cross-encoder pairs scored per query and the p50 reranking time. The score
+cache is disabled so every query pays for its pairs.
+"""
+
+import argparse
+import itertools
+import statistics
+import time
+from typing import Dict, List
+
+from backend.benchmarks.vector_search import QUERIES
+
+MORE_QUERIES = [
+    "classes about ethics in engineering",
+    "calculus 2",
+    "something with music",
+    "cybersecurity",
+    "intro to biology for non majors",
+    "how to build web apps",
+]
+
+
+def load_candidates(term: str, k: int) -> Dict[str, List[dict]]:
+    from backend import constants as c
+    from backend.functions import (
+        construct_term_courses,
+        initialize_database,
+        set_local_data,
+    )
+    from backend.vector_index import COURSE_INDEX
+
+    c.get_redis()
+    set_local_data()
+    construct_term_courses()
+    c.get_chroma_collection()
+    initialize_database()
+    c.get_cross_encoder()
+
+    candidates = {}
+    for query in QUERIES + MORE_QUERIES:
+        embedding = c.get_ef()([query])[0]
+        candidates[query] = [
+            {"id": cid, "document": document, "init_distance": distance}
+            for cid, document, distance in COURSE_INDEX.query(embedding, None, k)
+        ]
+    return candidates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate staged reranking.")
+    parser.add_argument("--term", type=str, default="202610")
+    parser.add_argument("--k", type=int, default=500)
+    parser.add_argument("--top-n", type=int, nargs="+", default=[5, 10])
+    parser.add_argument("--min-candidates", type=int, nargs="+", default=[30, 50, 100])
+    parser.add_argument("--stop-margins", type=float, nargs="+", default=[1, 3])
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    from backend.inference import score_pairs
+    from backend.reranker import rerank, select_candidates
+
+    candidates = load_candidates(args.term, args.k)
+
+    # full rerank of every candidate, the reference ranking
+    reference = {}
+    full_times = []
+    for query, items in candidates.items():
+        start = time.perf_counter()
+        reference[query] = rerank(query, items, 1, stop_margin=None, cache=None)
+        full_times.append(time.perf_counter() - start)
+    print(f"full rerank of {args.k}: p50={statistics.median(full_times) * 1000:.1f}ms")
+
+    for top_n, min_candidates, stop_margin in itertools.product(
+        args.top_n, args.min_candidates, args.stop_margins
+    ):
+        recalls, pairs, times = [], [], []
+        for query, items in candidates.items():
+            scored = 0
+
+            def counting(batch):
+                nonlocal scored
+                scored += len(batch)
+                return score_pairs(batch)
+
+            start = time.perf_counter()
+            selected = select_candidates(items, top_n, min_candidates=min_candidates)
+            results = rerank(
+                query,
+                selected,
+                top_n,
+                batch_size=args.batch_size,
+                stop_margin=stop_margin,
+                cache=None,
+                score_fn=counting,
+            )
+            times.append(time.perf_counter() - start)
+            expected = {item["id"] for item in reference[query][:top_n]}
+            found = {item["id"] for item in results[:top_n]}
+            recalls.append(len(expected & found) / len(expected))
+            pairs.append(scored)
+        print(
+            f"top_n={top_n:<3} min_candidates={min_candidates:<4} "
+            f"stop_margin={stop_margin:<4} recall={statistics.mean(recalls):.3f} "
+            f"pairs={statistics.mean(pairs):.0f} "
+            f"p50={statistics.median(times) * 1000:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Search quality and latency suite for course_query.
+
+    python -m backend.benchmarks.search_suite build
+    python -m backend.benchmarks.search_suite run --label baseline
+    RERANK_MIN_CANDIDATES=30 python -m backend.benchmarks.search_suite run \\
+        --label min30 --compare backend/benchmarks/results/<baseline>.json
+
+build writes a labeled query set (query -> expected course ids) generated from the
+catalog in Redis to backend/benchmarks/data/search_queries.json:
+
+- code:  "cs341" -> CS 341
+- title: the lowercased title -> that course
+- topic: a natural query -> every course whose title contains one of its phrases
+
+run loads the catalog, the local Chroma directory and the local models like the server,
+calls the course_query tool end to end for every query and reports recall@k, MRR,
+p50/p95 of each stage (filter, embed, candidates, rerank, total) from the search.* and
+rerank.* timings, and the memory of the process. Unless --warm is given, the tool cache
+is bypassed and the embedding and score caches are cleared before every query. Results
+are saved to backend/benchmarks/results/ together with the search settings, --compare
+prints the differences to an earlier run.
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import time
+from typing import Any, Dict, List
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+QUERIES_FILE = os.path.join(BENCHMARKS_DIR, "data", "search_queries.json")
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+
+# natural queries and the title phrases of the courses they should find
+TOPICS = {
+    "intro machine learning": ["machine learning"],
+    "databases": ["database"],
+    "computer networks": ["network"],
+    "operating systems": ["operating system"],
+    "data structures": ["data structure"],
+    "linear algebra": ["linear algebra"],
+    "calculus": ["calculus"],
+    "organic chemistry lab": ["organic chemistry"],
+    "public speaking": ["public speaking", "speech"],
+    "senior capstone project": ["capstone"],
+    "cybersecurity": ["security"],
+    "technical writing": ["technical writing"],
+}
+
+# timings recorded by course_query and the reranker, in pipeline order
+STAGES = {
+    "filter": "search.filter_seconds",
+    "embed": "search.embed_seconds",
+    "candidates": "search.candidates_seconds",
+    "rerank": "rerank.seconds",
+    "total": "search.seconds",
+}
+
+# settings saved with every run
+SETTINGS = [
+    "INFERENCE_BACKEND",
+    "HYBRID_SEARCH",
+    "HYBRID_LEXICAL_CANDIDATES",
+    "RERANK_MIN_CANDIDATES",
+    "RERANK_CANDIDATES_PER_RESULT",
+    "RERANK_MAX_CANDIDATES",
+    "RERANK_SIMILARITY_MARGIN",
+    "RERANK_BATCH_SIZE",
+    "RERANK_STOP_MARGIN",
+    "INFERENCE_BATCH_SECONDS",
+]
+
+
+def rss_mb() -> float:
+    # peak resident memory, kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def build(sample: int, seed: int) -> None:
+    from backend import constants as c
+    from backend.functions import set_local_data
+
+    c.get_redis()
+    set_local_data()
+    rng = random.Random(seed)
+    course_ids = sorted(c.COURSE_DATA)
+    queries: List[Dict[str, Any]] = []
+    for course_id in rng.sample(course_ids, min(sample, len(course_ids))):
+        title = c.COURSE_DATA[course_id].title
+        queries.append(
+            {
+                "kind": "code",
+                "query": course_id.replace(" ", "").lower(),
+                "expected": [course_id],
+            }
+        )
+        if title:
+            queries.append(
+                {"kind": "title", "query": title.lower(), "expected": [course_id]}
+            )
+    for query, phrases in TOPICS.items():
+        expected = [
+            i
+            for i in course_ids
+            if any(p in (c.COURSE_DATA[i].title or "").lower() for p in phrases)
+        ]
+        if expected:
+            queries.append({"kind": "topic", "query": query, "expected": expected})
+
+    os.makedirs(os.path.dirname(QUERIES_FILE), exist_ok=True)
+    with open(QUERIES_FILE, "w", encoding="utf-8") as f:
+        json.dump(queries, f, indent=2)
+    print(f"Wrote {len(queries)} labeled queries to {QUERIES_FILE}")
+
+
+def score(results: List[str], expected: List[str], ks: List[int]) -> Dict[str, float]:
+    expected_set = set(expected)
+    scores = {}
+    for k in ks:
+        found = len(expected_set & set(results[:k]))
+        scores[f"recall@{k}"] = found / min(len(expected_set), k)
+    first = next((rank for rank, i in enumerate(results, 1) if i in expected_set), None)
+    scores["mrr"] = 1 / first if first else 0.0
+    return scores
+
+
+def run(args) -> Dict[str, Any]:
+    from backend import constants as c
+    from backend import metrics
+    from backend.functions import (
+        construct_term_courses,
+        get_tools,
+        initialize_database,
+        set_local_data,
+        sync_lexical_index,
+    )
+    from backend.inference import QUERY_EMBEDDINGS
+    from backend.reranker import SCORE_CACHE
+    from backend.types import CourseQueryFormat, UserFulfilled
+
+    with open(QUERIES_FILE, "r", encoding="utf-8") as f:
+        queries = json.load(f)
+
+    start = time.perf_counter()
+    c.get_redis()
+    set_local_data()
+    construct_term_courses()
+    sync_lexical_index()
+    c.get_chroma_collection()
+    initialize_database()
+    c.get_cross_encoder()
+    load_seconds = time.perf_counter() - start
+    memory_loaded = rss_mb()
+
+    tool = get_tools(UserFulfilled(), args.term)[0]
+    # cold runs skip the shared tool cache, the term and prerequisite masks stay cached
+    course_query = tool if args.warm else tool.__wrapped__
+    top_n = max(args.k)
+    per_kind: Dict[str, Dict[str, List[float]]] = {}
+    errors = 0
+    for repeat in range(args.repeat):
+        for item in queries:
+            if not args.warm:
+                QUERY_EMBEDDINGS.clear()
+                SCORE_CACHE.clear()
+            result = course_query(
+                CourseQueryFormat(
+                    query=item["query"],
+                    top_n=top_n,
+                    only_prereqs_fulfilled=False,
+                    only_current_semester=args.current_term,
+                )
+            )
+            if "error" in result:
+                errors += 1
+                continue
+            if repeat:
+                continue
+            ids = [r["id"] for r in result.get("search_result", [])]
+            for name, value in score(ids, item["expected"], args.k).items():
+                per_kind.setdefault(item["kind"], {}).setdefault(name, []).append(value)
+                per_kind.setdefault("all", {}).setdefault(name, []).append(value)
+
+    timings = metrics.snapshot()["timings"]
+    return {
+        "label": args.label,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {name: getattr(c, name) for name in SETTINGS},
+        "queries": len(queries),
+        "repeat": args.repeat,
+        "warm": args.warm,
+        "errors": errors,
+        "quality": {
+            kind: {name: round(statistics.mean(v), 4) for name, v in values.items()}
+            for kind, values in per_kind.items()
+        },
+        "latency_ms": {
+            stage: {
+                p: round(timings[name][p] * 1000, 2) for p in ("p50", "p95", "mean")
+            }
+            for stage, name in STAGES.items()
+            if name in timings
+        },
+        "memory_mb": {
+            "after_load": round(memory_loaded, 1),
+            "peak": round(rss_mb(), 1),
+        },
+        "load_seconds": round(load_seconds, 2),
+    }
+
+
+def print_report(report: Dict[str, Any], baseline: Dict[str, Any] = None) -> None:
+    def delta(section: str, key: str, name: str) -> str:
+        if not baseline:
+            return ""
+        old = baseline.get(section, {}).get(key, {}).get(name)
+        if old is None:
+            return ""
+        new = report[section][key][name]
+        return f" ({new - old:+.4g})"
+
+    print(f"{report['label']}: {report['queries']} queries, {report['errors']} errors")
+    for kind, values in report["quality"].items():
+        line = " ".join(
+            f"{name}={value:.3f}{delta('quality', kind, name)}"
+            for name, value in values.items()
+        )
+        print(f"  {kind:6} {line}")
+    for stage, values in report["latency_ms"].items():
+        line = " ".join(
+            f"{p}={v:.1f}ms{delta('latency_ms', stage, p)}" for p, v in values.items()
+        )
+        print(f"  {stage:10} {line}")
+    print(
+        f"  memory after load={report['memory_mb']['after_load']}MB "
+        f"peak={report['memory_mb']['peak']}MB, load {report['load_seconds']}s"
+    )
+    if baseline:
+        changed = {
+            name: (baseline["settings"].get(name), value)
+            for name, value in report["settings"].items()
+            if baseline["settings"].get(name) != value
+        }
+        print(f"  settings changed since {baseline['label']}: {changed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="course_query benchmark suite.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="Generate the labeled queries.")
+    build_parser.add_argument("--sample", type=int, default=100)
+    build_parser.add_argument("--seed", type=int, default=0)
+    run_parser = commands.add_parser("run", help="Run the suite.")
+    run_parser.add_argument("--label", type=str, default="run")
+    run_parser.add_argument("--term", type=str, default="202610")
+    run_parser.add_argument("--k", type=int, nargs="+", default=[1, 5, 10])
+    run_parser.add_argument("--repeat", type=int, default=1)
+    run_parser.add_argument("--warm", action="store_true")
+    run_parser.add_argument("--current-term", action="store_true")
+    run_parser.add_argument("--compare", type=str, help="Earlier results file.")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build(args.sample, args.seed)
+        return
+
+    report = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(
+        RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{report['label']}.json"
+    )
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {path}")
+
+
+if __name__ == "__main__":
+    main()
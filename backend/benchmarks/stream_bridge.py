@@ -0,0 +1,110 @@
+"""
+Compares the old queue-polling stream consumer with the AsyncBridge consumer.
+
+Each simulated stream produces chunks from a worker thread with a fixed gap between
+them. Reports time-to-first-byte, per-chunk forwarding delay and the CPU time used
+per stream while many streams are open at once.
+
+    python -m backend.benchmarks.stream_bridge --streams 50 --chunks 40 --gap-ms 20
+"""
+
+import argparse
+import asyncio
+import queue
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Tuple
+
+from backend.streaming import iterate_in_thread
+
+
+def fake_model_stream(chunks: int, gap: float) -> Iterator[float]:
+    """Stands in for send_message_stream: yields the time each chunk was produced."""
+    for _ in range(chunks):
+        time.sleep(gap)
+        yield time.perf_counter()
+
+
+async def polling_consumer(iterator: Iterator[float]):
+    """The consumer gemini_call_stream used before, kept here as the baseline."""
+    loop = asyncio.get_running_loop()
+    text_queue = queue.Queue()
+
+    def iter_proc():
+        try:
+            for chunk in iterator:
+                text_queue.put(chunk)
+        finally:
+            text_queue.put(None)
+
+    future = loop.run_in_executor(None, iter_proc)
+    while True:
+        try:
+            chunk = text_queue.get_nowait()
+            if chunk is None:
+                break
+            yield chunk
+        except queue.Empty:
+            await asyncio.sleep(0.01)
+    await future
+
+
+async def bridge_consumer(iterator: Iterator[float]):
+    async for chunk in iterate_in_thread(iterator):
+        yield chunk
+
+
+async def consume(consumer, chunks: int, gap: float) -> Tuple[float, List[float]]:
+    start = time.perf_counter()
+    ttfb = None
+    delays = []
+    async for produced_at in consumer(fake_model_stream(chunks, gap)):
+        received_at = time.perf_counter()
+        if ttfb is None:
+            ttfb = received_at - start
+        delays.append(received_at - produced_at)
+    return ttfb, delays
+
+
+async def run(consumer, streams: int, chunks: int, gap: float):
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(streams))
+    cpu_start = time.process_time()
+    results = await asyncio.gather(
+        *(consume(consumer, chunks, gap) for _ in range(streams))
+    )
+    cpu = time.process_time() - cpu_start
+
+    ttfbs = [r[0] for r in results]
+    delays = [d for r in results for d in r[1]]
+    delays.sort()
+    return {
+        "ttfb_ms": statistics.mean(ttfbs) * 1000,
+        "delay_p50_ms": delays[len(delays) // 2] * 1000,
+        "delay_p95_ms": delays[int(len(delays) * 0.95)] * 1000,
+        "cpu_ms_per_stream": cpu / streams * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the stream consumer used by gemini_call_stream."
+    )
+    parser.add_argument("--streams", type=int, default=50)
+    parser.add_argument("--chunks", type=int, default=40)
+    parser.add_argument("--gap-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    gap = args.gap_ms / 1000
+    for name, consumer in (("polling", polling_consumer), ("bridge", bridge_consumer)):
+        stats = asyncio.run(run(consumer, args.streams, args.chunks, gap))
+        print(
+            f"{name:8} ttfb={stats['ttfb_ms']:.2f}ms "
+            f"delay p50={stats['delay_p50_ms']:.2f}ms p95={stats['delay_p95_ms']:.2f}ms "
+            f"cpu/stream={stats['cpu_ms_per_stream']:.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
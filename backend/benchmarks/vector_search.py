@@ -0,0 +1,139 @@
+"""
+Compares candidate selection for course_query: Chroma's query(ids=..., n_results=500)
+against the in-memory COURSE_INDEX with cached row masks. The query is embedded once
+up front, so only candidate selection is timed. Also reports how many of Chroma's
+candidates the index returns.
+
+    python -m backend.benchmarks.vector_search --term 202610
+    python -m backend.benchmarks.vector_search --synthetic 4000
+
+--synthetic times the index alone on random vectors, without Redis, Chroma or models.
+"""
+
+import argparse
+import statistics
+import time
+from typing import Callable, List
+
+import numpy as np
+
+QUERIES = [
+    "intro machine learning",
+    "easy gen ed classes",
+    "databases",
+    "data structures in python",
+    "organic chemistry lab",
+    "public speaking",
+    "computer architecture",
+    "linear algebra",
+]
+
+
+def timed(fn: Callable[[], object], repeat: int) -> List[float]:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def report(name: str, times: List[float]) -> None:
+    times = sorted(times)
+    p95 = times[int(round(0.95 * (len(times) - 1)))]
+    print(
+        f"{name:32} p50={statistics.median(times) * 1000:.3f}ms p95={p95 * 1000:.3f}ms"
+    )
+
+
+def run_synthetic(n: int, dim: int, k: int, repeat: int) -> None:
+    from backend.vector_index import VectorIndex
+
+    rng = np.random.default_rng(0)
+    ids = [f"C {i}" for i in range(n)]
+    index = VectorIndex()
+    index.upsert(ids, rng.normal(size=(n, dim)), ids)
+    term_ids = [i for i in ids if rng.random() < 0.4]
+    satisfied = [i for i in ids if rng.random() < 0.7]
+    query = rng.normal(size=dim)
+
+    # a mask built from the id list on every call, like passing ids to Chroma
+    report(
+        "index, mask per call",
+        timed(
+            lambda: index.query(query, index.mask(term_ids) & index.mask(satisfied), k),
+            repeat,
+        ),
+    )
+    mask = index.mask(term_ids) & index.mask(satisfied)
+    report("index, cached mask", timed(lambda: index.query(query, mask, k), repeat))
+
+
+def run_catalog(term: str, k: int, repeat: int) -> None:
+    from backend import constants as c
+    from backend.functions import (
+        available_mask,
+        get_available_courses,
+        initialize_database,
+        set_local_data,
+        construct_term_courses,
+    )
+    from backend.types import UserFulfilled
+    from backend.vector_index import COURSE_INDEX
+
+    c.get_redis()
+    set_local_data()
+    construct_term_courses()
+    c.get_chroma_collection()
+    initialize_database()
+
+    profile = UserFulfilled()
+    for only_prereqs, only_term in ((False, False), (False, True), (True, True)):
+        print(
+            f"only_prereqs_fulfilled={only_prereqs} only_current_semester={only_term}"
+        )
+        chroma_times, index_times, overlap = [], [], []
+        for query in QUERIES:
+            embedding = c.get_ef()([query])[0]
+
+            def chroma():
+                return c._CHROMA_COLLECTION.query(
+                    ids=get_available_courses(profile, only_prereqs, only_term, term),
+                    query_embeddings=[embedding],
+                    n_results=k,
+                )
+
+            def index():
+                return COURSE_INDEX.query(
+                    embedding,
+                    available_mask(profile, only_prereqs, only_term, term),
+                    k,
+                )
+
+            chroma_times += timed(chroma, repeat)
+            index_times += timed(index, repeat)
+            chroma_ids = set(chroma()["ids"][0])
+            index_ids = {r[0] for r in index()}
+            overlap.append(len(chroma_ids & index_ids) / max(1, len(chroma_ids)))
+        report("  chroma", chroma_times)
+        report("  index", index_times)
+        print(f"  candidate overlap: {statistics.mean(overlap):.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark course candidate search.")
+    parser.add_argument("--term", type=str, default="202610")
+    parser.add_argument("--k", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--synthetic", type=int, help="Number of random courses.")
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        run_synthetic(args.synthetic, args.dim, args.k, args.repeat * 10)
+    else:
+        run_catalog(args.term, args.k, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 from backend.types import LecturerRatingType
 from backend.types import CourseDataType
 import os
-from typing import List, Dict, Set
+import threading
+from typing import List, Dict, Set, Any, Tuple
 import dotenv
 from backend.types import CourseInfoModel, LecturerRating
 
@@ -21,8 +22,126 @@ CHATBOT_PROMPT_FILE = os.path.join(BASE_PROMPTS_DIR, "chatbot_prompt.txt")
 
 REDIS_LECTURERS_KEY = "lecturers"
 REDIS_COURSES_KEY = "courses"
+# one CourseInfo JSON per course id, so the scraper can write only the changed courses
+REDIS_COURSE_RECORDS_KEY = "course_records"
 CHROMA_COLLECTION_NAME = "njit_courses"
 
+# /chat admission control
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "8"))
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "32"))
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "20"))
+# "reject" answers overlapping messages for a session with 429, "queue" waits for the first
+CHAT_SESSION_POLICY = os.getenv("CHAT_SESSION_POLICY", "reject")
+
+# Chat model backend: "gemini", or "fake" for the scripted local stand-in used in load tests
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+CHAT_MODEL = "gemini-2.5-flash"
+FAKE_LLM_SCRIPT_FILE = os.getenv("FAKE_LLM_SCRIPT_FILE")
+FAKE_LLM_TOKEN_DELAY = float(os.getenv("FAKE_LLM_TOKEN_DELAY", "0.02"))
+FAKE_LLM_FIRST_TOKEN_DELAY = float(os.getenv("FAKE_LLM_FIRST_TOKEN_DELAY", "0.3"))
+
+# Model calls: deadlines (seconds), retries before the first chunk, hedging (a second
+# request on a copy of the chat once the first chunk is later than the observed p95) and a
+# circuit breaker that fails fast after consecutive failures
+MODEL_FIRST_CHUNK_TIMEOUT = float(os.getenv("MODEL_FIRST_CHUNK_TIMEOUT", "20"))
+MODEL_STREAM_IDLE_TIMEOUT = float(os.getenv("MODEL_STREAM_IDLE_TIMEOUT", "30"))
+MODEL_CALL_TIMEOUT = float(os.getenv("MODEL_CALL_TIMEOUT", "120"))
+MODEL_MAX_RETRIES = int(os.getenv("MODEL_MAX_RETRIES", "2"))
+MODEL_RETRY_BACKOFF = float(os.getenv("MODEL_RETRY_BACKOFF", "0.5"))
+MODEL_HEDGE = os.getenv("MODEL_HEDGE", "1") == "1"
+# hedge delay until enough first-chunk timings were observed, and its lower bound
+MODEL_HEDGE_DEFAULT_DELAY = float(os.getenv("MODEL_HEDGE_DEFAULT_DELAY", "4"))
+MODEL_HEDGE_MIN_DELAY = float(os.getenv("MODEL_HEDGE_MIN_DELAY", "1"))
+MODEL_BREAKER_FAILURES = int(os.getenv("MODEL_BREAKER_FAILURES", "5"))
+MODEL_BREAKER_RESET_SECONDS = float(os.getenv("MODEL_BREAKER_RESET_SECONDS", "30"))
+
+# Shared executors: blocking tool work and model I/O (each open stream holds a model worker)
+TOOL_EXECUTOR_WORKERS = int(os.getenv("TOOL_EXECUTOR_WORKERS", "8"))
+MODEL_EXECUTOR_WORKERS = int(
+    os.getenv("MODEL_EXECUTOR_WORKERS", str(2 * CHAT_MAX_CONCURRENCY))
+)
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+# scraper requests are retried on connection errors, 429 and 5xx with exponential backoff
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.5"))
+# scraper HTML parsing: "lxml", or "bs4" for BeautifulSoup with html.parser (also used
+# when lxml is not installed or cannot read a page)
+SCRAPER_HTML_PARSER = os.getenv("SCRAPER_HTML_PARSER", "lxml")
+
+# Chat sessions: history is capped in turns and approximate tokens, tool outputs of older
+# turns are shrunk, and sessions expire after SESSION_TTL_SECONDS without a message
+MAX_CHAT_HISTORY_TOKENS = int(os.getenv("MAX_CHAT_HISTORY_TOKENS", "8000"))
+MAX_TOOL_OUTPUT_CHARS = int(os.getenv("MAX_TOOL_OUTPUT_CHARS", "1000"))
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+# Parsed sessions kept in memory per worker
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "256"))
+
+# /chat attachments: base64 gzip PDFs, limits on the upload and on the decompressed PDF
+MAX_ATTACHMENTS = int(os.getenv("MAX_ATTACHMENTS", "3"))
+MAX_ATTACHMENT_UPLOAD_BYTES = int(
+    os.getenv("MAX_ATTACHMENT_UPLOAD_BYTES", str(8 * 1024 * 1024))
+)
+MAX_ATTACHMENT_BYTES = int(os.getenv("MAX_ATTACHMENT_BYTES", str(16 * 1024 * 1024)))
+
+# /chat stream framing: text chunks after the first are merged into one NDJSON line for
+# up to STREAM_COALESCE_SECONDS or STREAM_COALESCE_CHARS, 0 seconds sends every chunk
+STREAM_COALESCE_SECONDS = float(os.getenv("STREAM_COALESCE_SECONDS", "0.05"))
+STREAM_COALESCE_CHARS = int(os.getenv("STREAM_COALESCE_CHARS", "2048"))
+
+# Course index sync: stored hashes are read CHROMA_PAGE_SIZE at a time, changes are
+# embedded and written CHROMA_WRITE_BATCH at a time
+CHROMA_PAGE_SIZE = int(os.getenv("CHROMA_PAGE_SIZE", "5000"))
+CHROMA_WRITE_BATCH = int(os.getenv("CHROMA_WRITE_BATCH", "1000"))
+
+# course_query reranking: the cross-encoder scores max(RERANK_MIN_CANDIDATES,
+# RERANK_CANDIDATES_PER_RESULT * top_n) candidates, more while their cosine similarity is
+# within RERANK_SIMILARITY_MARGIN of the top_n-th, at most RERANK_MAX_CANDIDATES. Batches
+# stop once a batch scores RERANK_STOP_MARGIN below the current top_n-th score.
+RERANK_MIN_CANDIDATES = int(os.getenv("RERANK_MIN_CANDIDATES", "50"))
+RERANK_CANDIDATES_PER_RESULT = int(os.getenv("RERANK_CANDIDATES_PER_RESULT", "10"))
+RERANK_MAX_CANDIDATES = int(os.getenv("RERANK_MAX_CANDIDATES", "500"))
+RERANK_SIMILARITY_MARGIN = float(os.getenv("RERANK_SIMILARITY_MARGIN", "0.1"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+RERANK_STOP_MARGIN = float(os.getenv("RERANK_STOP_MARGIN", "3"))
+# (query, course) -> cross-encoder score
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "50000"))
+
+# course_query fuses the vector candidates with the HYBRID_LEXICAL_CANDIDATES best BM25
+# matches (at least top_n) before reranking, HYBRID_SEARCH=0 searches by embeddings only
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"
+HYBRID_LEXICAL_CANDIDATES = int(os.getenv("HYBRID_LEXICAL_CANDIDATES", "20"))
+
+# Model inference: "torch" (full precision), "int8" (PyTorch with int8 quantized linear
+# layers, CPU) or "onnx" (onnxruntime, without torch). The ONNX files come from the
+# models' Hugging Face repos, their onnx/model_q*.onnx graphs are int8 quantized. Course
+# embeddings are recomputed when the embedding variant changes.
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+ONNX_EMBEDDING_FILE = os.getenv("ONNX_EMBEDDING_FILE", "onnx/model.onnx")
+ONNX_CROSS_ENCODER_FILE = os.getenv("ONNX_CROSS_ENCODER_FILE", "onnx/model.onnx")
+# onnxruntime threads per session, 0 lets it decide
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+# stored with every course embedding
+EMBEDDING_VARIANT = (
+    f"onnx:{ONNX_EMBEDDING_FILE}" if INFERENCE_BACKEND == "onnx" else INFERENCE_BACKEND
+)
+
+# Query embeddings and cross-encoder scores requested within INFERENCE_BATCH_SECONDS of
+# each other run as one batch, 0 runs every request on its own
+INFERENCE_BATCH_SECONDS = float(os.getenv("INFERENCE_BATCH_SECONDS", "0.005"))
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "64"))
+CROSS_ENCODER_MAX_BATCH = int(os.getenv("CROSS_ENCODER_MAX_BATCH", "256"))
+# normalized query -> embedding
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+
+# Results of the read-only tools shared across sessions, dropped when course data changes
+TOOL_CACHE_SIZE = int(os.getenv("TOOL_CACHE_SIZE", "2048"))
+TOOL_CACHE_TTL_SECONDS = float(os.getenv("TOOL_CACHE_TTL_SECONDS", str(60 * 60)))
+# the scraper publishes here after writing new course data to Redis: "refresh" after a
+# full write, or a JSON change message listing the changed courses and section events
+COURSE_UPDATES_CHANNEL = "course_updates"
+
 STANDINGS = ["FRESHMAN", "SOPHOMORE", "JUNIOR", "SENIOR", "GRAD"]
 SEMESTERS = {
     "10": "Spring",
@@ -36,6 +155,8 @@ COURSE_DATA: CourseDataType = {}
 VALID_COURSE_NAMES: Set[str] = set()
 LECTURER_DATA: LecturerRatingType = {}
 term_courses: Dict[str, List[str]] = {}
+# stage name -> {"status", "seconds", "error"}, filled in by run_startup_stages
+STARTUP_STATE: Dict[str, Dict[str, Any]] = {}
 MAX_CHAT_HISTORY_LEN = 5
 
 # Internal state for lazy loading
@@ -45,67 +166,232 @@ _CROSS_ENCODER = None
 _CHROMA_CLIENT = None
 _CHROMA_COLLECTION = None
 _REDIS = None
+_ASYNC_REDIS = None
+_GENAI_CLIENT = None
+_MODEL_BACKEND = None
+_HTTP_SESSION = None
+_TOOL_EXECUTOR = None
+_MODEL_EXECUTOR = None
+# startup stages and the course_updates listener call the getters from several threads,
+# each singleton is created under its own lock so only one copy is ever built, without
+# one slow model load holding up the others
+_INIT_LOCKS: Dict[str, threading.Lock] = {
+    "_device": threading.Lock(),
+    "_ef": threading.Lock(),
+    "_CROSS_ENCODER": threading.Lock(),
+    "_CHROMA_CLIENT": threading.Lock(),
+    "_CHROMA_COLLECTION": threading.Lock(),
+    "_REDIS": threading.Lock(),
+    "_ASYNC_REDIS": threading.Lock(),
+    "_GENAI_CLIENT": threading.Lock(),
+    "_MODEL_BACKEND": threading.Lock(),
+    "_HTTP_SESSION": threading.Lock(),
+    "_TOOL_EXECUTOR": threading.Lock(),
+    "_MODEL_EXECUTOR": threading.Lock(),
+}
+# prompt path -> (mtime, text)
+_PROMPTS: Dict[str, Tuple[float, str]] = {}
 
 
 def get_device():
     global _device
     if _device is None:
-        from torch.cuda import is_available
+        with _INIT_LOCKS["_device"]:
+            if _device is None:
+                from torch.cuda import is_available
 
-        _device = "cuda" if is_available() else "cpu"
+                _device = "cuda" if is_available() else "cpu"
     return _device
 
 
+def _inference_device() -> str:
+    # the onnx backend runs on the CPU and must not import torch
+    return "cpu" if INFERENCE_BACKEND == "onnx" else get_device()
+
+
 def get_ef():
     global _ef
     if _ef is None:
-        from chromadb.utils import embedding_functions
+        with _INIT_LOCKS["_ef"]:
+            if _ef is None:
+                from backend.inference_backends import load_embedding_function
 
-        _ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="all-MiniLM-L6-v2", device=get_device()
-        )
+                _ef = load_embedding_function(INFERENCE_BACKEND, _inference_device())
     return _ef
 
 
 def get_cross_encoder():
     global _CROSS_ENCODER
     if _CROSS_ENCODER is None:
-        from sentence_transformers import CrossEncoder
+        with _INIT_LOCKS["_CROSS_ENCODER"]:
+            if _CROSS_ENCODER is None:
+                from backend.inference_backends import load_cross_encoder
 
-        _CROSS_ENCODER = CrossEncoder(
-            "cross-encoder/ms-marco-MiniLM-L-6-v2", device=get_device()
-        )
+                _CROSS_ENCODER = load_cross_encoder(
+                    INFERENCE_BACKEND, _inference_device()
+                )
     return _CROSS_ENCODER
 
 
 def get_chroma_client():
     global _CHROMA_CLIENT
     if _CHROMA_CLIENT is None:
-        import chromadb
+        with _INIT_LOCKS["_CHROMA_CLIENT"]:
+            if _CHROMA_CLIENT is None:
+                import chromadb
 
-        _CHROMA_CLIENT = chromadb.PersistentClient(path="./chromadb")
+                _CHROMA_CLIENT = chromadb.PersistentClient(path="./chromadb")
     return _CHROMA_CLIENT
 
 
 def get_chroma_collection():
     global _CHROMA_COLLECTION
     if _CHROMA_COLLECTION is None:
-        client = get_chroma_client()
-        _CHROMA_COLLECTION = client.get_or_create_collection(
-            name=CHROMA_COLLECTION_NAME, embedding_function=get_ef()
-        )
+        with _INIT_LOCKS["_CHROMA_COLLECTION"]:
+            if _CHROMA_COLLECTION is None:
+                client = get_chroma_client()
+                _CHROMA_COLLECTION = client.get_or_create_collection(
+                    name=CHROMA_COLLECTION_NAME, embedding_function=get_ef()
+                )
     return _CHROMA_COLLECTION
 
 
 def get_redis():
     global _REDIS
     if _REDIS is None:
-        import redis
+        with _INIT_LOCKS["_REDIS"]:
+            if _REDIS is None:
+                import redis
 
-        _REDIS = redis.Redis(host="localhost", port=6379, db=0, decode_responses=True)
+                _REDIS = redis.Redis(
+                    host="localhost", port=6379, db=0, decode_responses=True
+                )
     return _REDIS
 
 
+def get_async_redis():
+    global _ASYNC_REDIS
+    if _ASYNC_REDIS is None:
+        with _INIT_LOCKS["_ASYNC_REDIS"]:
+            if _ASYNC_REDIS is None:
+                import redis.asyncio
+
+                _ASYNC_REDIS = redis.asyncio.Redis(
+                    host="localhost", port=6379, db=0, decode_responses=True
+                )
+    return _ASYNC_REDIS
+
+
+def get_genai_client():
+    global _GENAI_CLIENT
+    if _GENAI_CLIENT is None:
+        with _INIT_LOCKS["_GENAI_CLIENT"]:
+            if _GENAI_CLIENT is None:
+                from google import genai
+                from google.genai import types
+
+                # bounds how long an abandoned (timed out or hedged) request holds its thread
+                _GENAI_CLIENT = genai.Client(
+                    api_key=GEMINI_API_KEY,
+                    http_options=types.HttpOptions(
+                        timeout=int(MODEL_CALL_TIMEOUT * 1000)
+                    ),
+                )
+    return _GENAI_CLIENT
+
+
+def get_model_backend():
+    global _MODEL_BACKEND
+    if _MODEL_BACKEND is None:
+        with _INIT_LOCKS["_MODEL_BACKEND"]:
+            if _MODEL_BACKEND is None:
+                from backend.models import GeminiBackend, FakeBackend
+
+                if LLM_BACKEND == "fake":
+                    _MODEL_BACKEND = FakeBackend.from_file(FAKE_LLM_SCRIPT_FILE)
+                else:
+                    _MODEL_BACKEND = GeminiBackend()
+    return _MODEL_BACKEND
+
+
+def get_http_session():
+    """
+    A requests.Session with a keep-alive connection pool shared by the scrapers, retrying
+    transient failures.
+    """
+    global _HTTP_SESSION
+    if _HTTP_SESSION is None:
+        with _INIT_LOCKS["_HTTP_SESSION"]:
+            if _HTTP_SESSION is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                # published once configured, callers outside the lock only check for None
+                session = requests.Session()
+                retry = Retry(
+                    total=HTTP_RETRIES,
+                    backoff_factor=HTTP_RETRY_BACKOFF,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=("GET", "HEAD"),
+                    # the callers check the status themselves
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_POOL_SIZE,
+                    pool_maxsize=HTTP_POOL_SIZE,
+                    max_retries=retry,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+
+                from backend.metrics import register_gauge
+
+                def connections_in_use():
+                    pools = adapter.poolmanager.pools
+                    conns = [pools[key] for key in pools.keys()]
+                    # each pool's queue starts with maxsize slots, checked out connections leave it
+                    return sum(p.pool.maxsize - p.pool.qsize() for p in conns if p.pool)
+
+                register_gauge("http.pool_size", lambda: HTTP_POOL_SIZE)
+                register_gauge("http.connections_in_use", connections_in_use)
+                _HTTP_SESSION = session
+    return _HTTP_SESSION
+
+
+def get_tool_executor():
+    global _TOOL_EXECUTOR
+    if _TOOL_EXECUTOR is None:
+        with _INIT_LOCKS["_TOOL_EXECUTOR"]:
+            if _TOOL_EXECUTOR is None:
+                from backend.metrics import InstrumentedExecutor
+
+                _TOOL_EXECUTOR = InstrumentedExecutor("tools", TOOL_EXECUTOR_WORKERS)
+    return _TOOL_EXECUTOR
+
+
+def get_model_executor():
+    global _MODEL_EXECUTOR
+    if _MODEL_EXECUTOR is None:
+        with _INIT_LOCKS["_MODEL_EXECUTOR"]:
+            if _MODEL_EXECUTOR is None:
+                from backend.metrics import InstrumentedExecutor
+
+                _MODEL_EXECUTOR = InstrumentedExecutor("model", MODEL_EXECUTOR_WORKERS)
+    return _MODEL_EXECUTOR
+
+
+def read_prompt(path: str) -> str:
+    """Returns the prompt file's text, re-reading it only when its mtime changes."""
+    mtime = os.path.getmtime(path)
+    cached = _PROMPTS.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = (mtime, f.read())
+        _PROMPTS[path] = cached
+    return cached[1]
+
+
 def __getattr__(name):
     if name == "device":
         return get_device()
@@ -119,12 +405,17 @@ def __getattr__(name):
         return get_chroma_collection()
     if name == "REDIS":
         return get_redis()
+    if name == "ASYNC_REDIS":
+        return get_async_redis()
+    if name == "GENAI_CLIENT":
+        return get_genai_client()
+    if name == "HTTP_SESSION":
+        return get_http_session()
     raise AttributeError(f"module {__name__} has no attribute {name}")
 
 
 def warmup_constants():
     """Accesses all lazy properties to force initialization."""
-    _ = get_device()
     _ = get_redis()
     _ = get_chroma_collection()
     _ = get_cross_encoder()
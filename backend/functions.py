@@ -10,6 +10,16 @@ from backend.constants import (
     REDIS_LECTURERS_KEY,
     LECTURER_DATA,
     COURSE_DATA_FILE,
+    STARTUP_STATE,
+    COURSE_UPDATES_CHANNEL,
+    CHROMA_PAGE_SIZE,
+    CHROMA_WRITE_BATCH,
+    RERANK_MAX_CANDIDATES,
+    HYBRID_SEARCH,
+    HYBRID_LEXICAL_CANDIDATES,
+    EMBEDDING_VARIANT,
+    REDIS_COURSES_KEY,
+    REDIS_COURSE_RECORDS_KEY,
 )
 from backend.types import (
     CourseQueryFormat,
@@ -27,28 +37,64 @@ from backend.types import (
 )
 import hashlib
 from typing import List, Tuple, Dict, Any, Optional, Callable, Awaitable
-from google import genai
 from google.genai import types
 import json
 import itertools
 import asyncio
-import queue
 from concurrent.futures import ThreadPoolExecutor
-from backend.types import StreamChunk
+from backend.streaming import AsyncBridge
+from backend import metrics
+from backend.attachments import (
+    drop_expired_files,
+    prepare_message_parts,
+    shared_file_uris,
+)
+from backend.inference import embed_query
+from backend.lexical_index import LEXICAL_INDEX, reciprocal_rank_fusion
+from backend.reranker import rerank, select_candidates
+from backend.resilience import ModelUnavailable, ResilientChat
+from backend.tool_cache import TOOL_CACHE, normalize_text, profile_hash
+from backend.vector_index import COURSE_INDEX, MaskCache, RowMask, StaleMaskError
+from backend.sessions import (
+    SESSION_STORE,
+    load_history,
+    load_prereqs,
+    load_session_sync,
+    save_session_sync,
+)
 import random
 import re
-import gzip
-import base64
-import io
+import time
+import threading
+
+
+# request threads read COURSE_DATA, VALID_COURSE_NAMES and term_courses while the
+# course_updates listener replaces them. Writers take this lock and swap in new values
+# key by key, so a reader never sees them empty, and readers that iterate take a copy
+# first (list(), dict() and set() copies are atomic under the GIL).
+_COURSE_DATA_LOCK = threading.Lock()
+
+
+def _replace_dict(target: Dict[str, Any], new: Dict[str, Any]) -> None:
+    """Gives target the contents of new without it ever being empty in between."""
+    target.update(new)
+    for key in [key for key in list(target) if key not in new]:
+        target.pop(key, None)
+
+
+def _replace_set(target: set, new: set) -> None:
+    target.update(new)
+    target.difference_update(target - new)
 
 
 def construct_term_courses():
-    for course, course_info in COURSE_DATA.items():
-        for term in course_info.sections.keys():
-            if term not in term_courses:
-                term_courses[term] = list()
-            else:
-                term_courses[term].append(course)
+    # rebuilt aside and swapped in, this also runs when course data is refreshed
+    with _COURSE_DATA_LOCK:
+        rebuilt: Dict[str, List[str]] = {}
+        for course, course_info in COURSE_DATA.items():
+            for term in course_info.sections.keys():
+                rebuilt.setdefault(term, []).append(course)
+        _replace_dict(term_courses, rebuilt)
 
 
 def get_redis_lecturers_data():
@@ -69,22 +115,85 @@ def get_redis_lecturers_data():
 
 def get_redis_course_data():
     try:
-        raw_courses_string = c._REDIS.get("courses")
-        if not raw_courses_string:
+        records = c._REDIS.hgetall(REDIS_COURSE_RECORDS_KEY)
+        if not records and migrate_redis_course_data():
+            records = c._REDIS.hgetall(REDIS_COURSE_RECORDS_KEY)
+        if not records:
             return None
-        raw_json = json.loads(raw_courses_string)
-        parsed = CourseStructureModel.model_validate(raw_json)
-        return parsed.root
+        return {
+            course_id: CourseInfoModel.model_validate_json(raw)
+            for course_id, raw in records.items()
+        }
     except Exception as e:
         print("Error in loading course_data:", e)
         return None
 
 
+def migrate_redis_course_data() -> bool:
+    """
+    Moves course data written as one blob, before course records were stored one by one,
+    into the records hash. Records already in the hash were written since and are kept.
+    Returns whether there was a blob.
+    """
+    raw_courses_string = c._REDIS.get(REDIS_COURSES_KEY)
+    if not raw_courses_string:
+        return False
+    parsed = CourseStructureModel.model_validate(json.loads(raw_courses_string))
+    pipe = c._REDIS.pipeline()
+    for course_id, record in _course_records(parsed.root).items():
+        pipe.hsetnx(REDIS_COURSE_RECORDS_KEY, course_id, record)
+    pipe.delete(REDIS_COURSES_KEY)
+    pipe.execute()
+    print(f"Migrated {len(parsed.root)} courses to {REDIS_COURSE_RECORDS_KEY}.")
+    return True
+
+
+def get_redis_course_records(course_ids: List[str]) -> Dict[str, CourseInfoModel]:
+    """The stored records of the given courses, courses without one are left out."""
+    if not course_ids:
+        return {}
+    values = c._REDIS.hmget(REDIS_COURSE_RECORDS_KEY, course_ids)
+    return {
+        course_id: CourseInfoModel.model_validate_json(raw)
+        for course_id, raw in zip(course_ids, values)
+        if raw is not None
+    }
+
+
+def _course_records(course_data: CourseDataType) -> Dict[str, str]:
+    return {
+        course_id: CourseInfoModel.model_validate(info).model_dump_json()
+        for course_id, info in course_data.items()
+    }
+
+
 def set_redis_course_data(course_data: CourseDataType):
-    c._REDIS.set("courses", CourseStructureModel(course_data).model_dump_json())
+    records = _course_records(course_data)
+    pipe = c._REDIS.pipeline()
+    pipe.delete(REDIS_COURSE_RECORDS_KEY, REDIS_COURSES_KEY)
+    if records:
+        pipe.hset(REDIS_COURSE_RECORDS_KEY, mapping=records)
+    pipe.execute()
     return course_data
 
 
+def update_redis_course_data(
+    changed: CourseDataType, removed: Optional[List[str]] = None
+) -> None:
+    """Writes only the records of the changed courses and deletes the removed ones."""
+    records = _course_records(changed)
+    # the other courses may still be in the old blob, which readers ignore once the
+    # records hash exists
+    if not c._REDIS.exists(REDIS_COURSE_RECORDS_KEY):
+        migrate_redis_course_data()
+    pipe = c._REDIS.pipeline()
+    if records:
+        pipe.hset(REDIS_COURSE_RECORDS_KEY, mapping=records)
+    if removed:
+        pipe.hdel(REDIS_COURSE_RECORDS_KEY, *removed)
+    pipe.execute()
+
+
 def set_redis_lecturer_data(lecturer_data: LecturerRatingType):
     c._REDIS.set("lecturers", LecturerStructureModel(lecturer_data).model_dump_json())
     return lecturer_data
@@ -93,21 +202,123 @@ def set_redis_lecturer_data(lecturer_data: LecturerRatingType):
 def set_local_data():
     course_data = get_redis_course_data()
     if course_data:
-        COURSE_DATA.clear()
-        COURSE_DATA.update(course_data)
-        VALID_COURSE_NAMES.clear()
-        VALID_COURSE_NAMES.update(course_data.keys())
+        with _COURSE_DATA_LOCK:
+            _replace_dict(COURSE_DATA, course_data)
+            _replace_set(VALID_COURSE_NAMES, set(course_data))
     else:
         print("Warning: Redis course data is empty.")
 
     lecturers_data = get_redis_lecturers_data()
     if lecturers_data:
-        LECTURER_DATA.clear()
-        LECTURER_DATA.update(lecturers_data)
+        with _COURSE_DATA_LOCK:
+            _replace_dict(LECTURER_DATA, lecturers_data)
     else:
         print("Warning: Redis lecturer data is empty.")
 
 
+def refresh_course_data() -> None:
+    """
+    Reloads course and lecturer data from Redis, syncs the course index with it and
+    drops the cached tool results.
+    """
+    start = time.perf_counter()
+    set_local_data()
+    construct_term_courses()
+    sync_lexical_index()
+    _sync_course_index_if_loaded()
+    TOOL_CACHE.invalidate()
+    print(
+        f"Course data refreshed (version {TOOL_CACHE.data_version}) "
+        f"in {time.perf_counter() - start:.3f}s"
+    )
+
+
+def apply_course_updates(update: Dict[str, Any]) -> None:
+    """
+    Applies a change message from the scraper: reloads only the listed courses from Redis
+    and, when titles or descriptions changed, syncs the search indexes with them.
+    """
+    start = time.perf_counter()
+    course_ids = update.get("courses", [])
+    records = get_redis_course_records(course_ids)
+    texts_changed = False
+    with _COURSE_DATA_LOCK:
+        for course_id in course_ids:
+            old = COURSE_DATA.get(course_id)
+            new = records.get(course_id)
+            if (
+                old is None
+                or new is None
+                or (old.title, old.desc) != (new.title, new.desc)
+            ):
+                texts_changed = True
+            if new is None:
+                COURSE_DATA.pop(course_id, None)
+                VALID_COURSE_NAMES.discard(course_id)
+            else:
+                COURSE_DATA[course_id] = new
+                VALID_COURSE_NAMES.add(course_id)
+
+    construct_term_courses()
+    if texts_changed:
+        sync_lexical_index()
+        _sync_course_index_if_loaded()
+    TOOL_CACHE.invalidate()
+    print(
+        f"Applied updates of {len(course_ids)} courses, "
+        f"{len(update.get('events', []))} section events "
+        f"(version {TOOL_CACHE.data_version}) in {time.perf_counter() - start:.3f}s"
+    )
+
+
+# set when course data changed while the startup sync of the search index was running
+_INDEX_SYNC_PENDING = threading.Event()
+
+
+def _sync_course_index_if_loaded() -> None:
+    """
+    Syncs the course index once the startup sync is done. Until then the embedding model
+    and collection may not be loaded, and a sync that is running may already be past the
+    changed courses, so it is asked to sync again when it finishes.
+    """
+    status = STARTUP_STATE.get("search", {}).get("status")
+    if status == "running":
+        _INDEX_SYNC_PENDING.set()
+    elif status == "ready":
+        try:
+            sync_course_index()
+        except Exception as e:
+            print(f"Error syncing course index: {e}")
+
+
+def handle_course_update(data: str) -> None:
+    try:
+        update = json.loads(data)
+    except (TypeError, ValueError):
+        update = None
+    if isinstance(update, dict) and "courses" in update:
+        apply_course_updates(update)
+    else:
+        refresh_course_data()
+
+
+def listen_for_course_updates() -> None:
+    """
+    Applies the scraper's messages on the course_updates channel: change messages
+    update the listed courses, anything else ("refresh") reloads all course data.
+    Runs forever in a daemon thread, resubscribing if the Redis connection drops.
+    """
+    while True:
+        try:
+            pubsub = c.get_redis().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(COURSE_UPDATES_CHANNEL)
+            for message in pubsub.listen():
+                handle_course_update(message.get("data"))
+        except Exception as e:
+            print(f"Error listening for course updates: {e}")
+            time.sleep(5)
+
+
 def lcs_length(a: str, b: str) -> int:
     """Compute length of longest common subsequence (order preserved)."""
     a = a.replace(" ", "").lower()
@@ -131,7 +342,7 @@ def best_course_matches(query: str) -> List[str]:
     scores = []
     max_score = 0
 
-    for s in VALID_COURSE_NAMES:
+    for s in list(VALID_COURSE_NAMES):
         score = lcs_length(query, s)
         scores.append((s, score))
         max_score = max(max_score, score)
@@ -198,9 +409,93 @@ def generate_hash(title: str, description: str) -> Tuple[str, str]:
     return (hashlib.md5(combined_text.encode("utf-8")).hexdigest(), combined_text)
 
 
+def _stored_hashes(
+    page_size: int = CHROMA_PAGE_SIZE,
+) -> Dict[str, Tuple[Optional[str], str]]:
+    """
+    Course id -> (content hash, embedding variant) of everything in the collection, in
+    paged reads. Courses stored before variants were recorded have torch embeddings.
+    """
+    stored: Dict[str, Tuple[Optional[str], str]] = {}
+    offset = 0
+    while True:
+        page = c._CHROMA_COLLECTION.get(
+            include=["metadatas"], limit=page_size, offset=offset
+        )
+        for course_id, meta in zip(page["ids"], page["metadatas"] or []):
+            meta = meta or {}
+            stored[course_id] = (
+                meta.get("hash"),
+                meta.get("embedding_variant", "torch"),
+            )
+        if len(page["ids"]) < page_size:
+            return stored
+        offset += page_size
+
+
+# the startup sync and syncs triggered by course_updates must not interleave
+_SYNC_LOCK = threading.Lock()
+
+
+def sync_course_index(batch_size: int = CHROMA_WRITE_BATCH) -> Dict[str, Any]:
+    """
+    Brings the collection and COURSE_INDEX in line with COURSE_DATA: courses whose hash
+    changed are re-embedded and upserted, courses no longer in COURSE_DATA are deleted.
+    Returns counts and timings of the sync.
+    """
+    with _SYNC_LOCK:
+        start = time.perf_counter()
+        stored = _stored_hashes()
+        read_seconds = time.perf_counter() - start
+
+        changed: List[Tuple[str, str, CourseMetadata]] = []
+        for course_id, info in list(COURSE_DATA.items()):
+            computed_hash, combined_text = generate_hash(info.title, info.desc)
+            # new embeddings also when the inference backend changed
+            if stored.get(course_id) != (computed_hash, EMBEDDING_VARIANT):
+                metadata: CourseMetadata = {
+                    "title": info.title,
+                    "description": info.desc,
+                    "hash": computed_hash,
+                    "embedding_variant": EMBEDDING_VARIANT,
+                }
+                changed.append((course_id, combined_text, metadata))
+        deleted = [course_id for course_id in stored if course_id not in COURSE_DATA]
+
+        for i in range(0, len(changed), batch_size):
+            ids, documents, metadatas = map(list, zip(*changed[i : i + batch_size]))
+            embeddings = c.get_ef()(documents)
+            c._CHROMA_COLLECTION.upsert(
+                ids=ids,
+                embeddings=embeddings,
+                documents=documents,
+                metadatas=metadatas,  # type: ignore
+            )
+            COURSE_INDEX.upsert(ids, embeddings, documents)
+            print(f"Upserted {i + len(ids)}/{len(changed)} courses...")
+
+        for i in range(0, len(deleted), batch_size):
+            c._CHROMA_COLLECTION.delete(ids=deleted[i : i + batch_size])
+        COURSE_INDEX.delete(deleted)
+
+        seconds = time.perf_counter() - start
+        metrics.observe("course_sync.seconds", seconds)
+        print(
+            f"Course index synced in {seconds:.3f}s (read {len(stored)} in "
+            f"{read_seconds:.3f}s): {len(changed)} upserted, {len(deleted)} deleted, "
+            f"{len(COURSE_INDEX)} indexed."
+        )
+        return {
+            "stored": len(stored),
+            "upserted": len(changed),
+            "deleted": len(deleted),
+            "seconds": round(seconds, 3),
+        }
+
+
 def initialize_database() -> None:
     """
-    initializes chromadb and populates it with course data.
+    initializes chromadb, loads the course index from it and syncs both with course data.
     """
     print("Initializing ChromaClient...")
 
@@ -213,64 +508,127 @@ def initialize_database() -> None:
 
     print(f"Getting or creating collection '{CHROMA_COLLECTION_NAME}'...")
 
-    ids_to_upsert: List[str] = []
-    documents_to_upsert: List[str] = []
-    metadatas_to_upsert: List[CourseMetadata] = []
+    # course_query searches the in-memory index, keep it in step with the collection
+    COURSE_INDEX.load(c._CHROMA_COLLECTION)
 
     print("Checking for updates in graph data...")
+    sync_course_index()
 
-    for course_id, info in COURSE_DATA.items():
-        title = info.title
-        description = info.desc
 
-        computed_hash, combined_text = generate_hash(title, description)
+def _load_data_stage() -> None:
+    c.get_redis()
+    set_local_data()
+    construct_term_courses()
+    sync_lexical_index()
 
-        # retrieve specific item to check hash
-        result = c._CHROMA_COLLECTION.get(ids=[course_id], include=["metadatas"])
 
-        needs_upsert = False
-        if not result["ids"]:
-            needs_upsert = True
-        else:
-            existing_metas = result.get("metadatas")
-            existing_meta = existing_metas[0] if existing_metas else None
-
-            if not existing_meta or existing_meta.get("hash") != computed_hash:
-                print(f"Course {course_id} changed, re-indexing...")
-                needs_upsert = True
-
-        if needs_upsert:
-            ids_to_upsert.append(course_id)
-            documents_to_upsert.append(combined_text)
-            metadata: CourseMetadata = {
-                "title": title,
-                "description": description,
-                "hash": computed_hash,
-            }
-            metadatas_to_upsert.append(metadata)
+def _load_embeddings_stage() -> None:
+    c.get_ef()
+
+
+def _load_reranker_stage() -> None:
+    c.get_cross_encoder()
+
+
+def _load_clients_stage() -> None:
+    c.get_model_backend()
+    c.get_async_redis()
+    c.get_tool_executor()
+    c.get_model_executor()
+    c.read_prompt(CHATBOT_PROMPT_FILE)
+
+
+def _sync_search_stage() -> None:
+    c.get_chroma_collection()
+    _INDEX_SYNC_PENDING.clear()
+    initialize_database()
+    # course data changed during the sync
+    while _INDEX_SYNC_PENDING.is_set():
+        _INDEX_SYNC_PENDING.clear()
+        sync_course_index()
+
+
+# stage name -> (function, stages it depends on). Dependencies must be listed first.
+STARTUP_STAGES: Dict[str, Tuple[Callable[[], None], Tuple[str, ...]]] = {
+    "data": (_load_data_stage, ()),
+    "embeddings": (_load_embeddings_stage, ()),
+    "reranker": (_load_reranker_stage, ()),
+    "clients": (_load_clients_stage, ()),
+    "search": (_sync_search_stage, ("data", "embeddings")),
+}
+
+# capability -> stages that must be ready before it can be served
+CAPABILITIES: Dict[str, Tuple[str, ...]] = {
+    "courses": ("data",),
+    "profs": ("data",),
+    "chat": ("data", "embeddings", "reranker", "clients", "search"),
+}
+
+
+def _run_stage(name: str, deps: Tuple[str, ...], fn: Callable[[], None]) -> None:
+    state = STARTUP_STATE[name]
+    failed_deps = [d for d in deps if STARTUP_STATE[d]["status"] != "ready"]
+    if failed_deps:
+        state["status"] = "skipped"
+        state["error"] = f"Dependencies not ready: {', '.join(failed_deps)}"
+        print(f"Startup stage '{name}' skipped: {state['error']}")
+        return
+
+    state["status"] = "running"
+    start = time.perf_counter()
+    try:
+        fn()
+        state["status"] = "ready"
+    except Exception as e:
+        state["status"] = "failed"
+        state["error"] = str(e)
+        print(f"Startup stage '{name}' failed: {e}")
+    finally:
+        state["seconds"] = round(time.perf_counter() - start, 3)
+        print(f"Startup stage '{name}' {state['status']} in {state['seconds']}s")
+
+
+def run_startup_stages() -> None:
+    """
+    Runs the startup stages concurrently. Each stage starts as soon as the stages it
+    depends on are done, so data loading does not wait for the models.
+    """
+    for name in STARTUP_STAGES:
+        STARTUP_STATE[name] = {"status": "pending", "seconds": None, "error": None}
+
+    start = time.perf_counter()
+    futures = {}
+    with ThreadPoolExecutor(max_workers=len(STARTUP_STAGES)) as executor:
+        for name, (fn, deps) in STARTUP_STAGES.items():
+            dep_futures = [futures[d] for d in deps]
+
+            def stage(name=name, fn=fn, deps=deps, dep_futures=dep_futures):
+                for dep in dep_futures:
+                    dep.result()
+                _run_stage(name, deps, fn)
+
+            futures[name] = executor.submit(stage)
+
+    print(f"Startup complete in {time.perf_counter() - start:.3f}s")
+
+
+def is_ready(capability: str) -> bool:
+    return all(
+        STARTUP_STATE.get(stage, {}).get("status") == "ready"
+        for stage in CAPABILITIES[capability]
+    )
 
-        # batch upsert
-        if len(ids_to_upsert) >= 100:
-            c._CHROMA_COLLECTION.upsert(
-                ids=ids_to_upsert,
-                documents=documents_to_upsert,
-                metadatas=metadatas_to_upsert,
-            )
-            print(f"Upserted {len(ids_to_upsert)} courses...")
-            ids_to_upsert = []
-            documents_to_upsert = []
-            metadatas_to_upsert = []
-
-    # final batch
-    if len(ids_to_upsert) > 0:
-        c._CHROMA_COLLECTION.upsert(
-            ids=ids_to_upsert,
-            documents=documents_to_upsert,
-            metadatas=metadatas_to_upsert,  # type: ignore
-        )
-        print(f"Final update for {len(ids_to_upsert)} courses complete.")
 
-    print("Database synchronization complete.")
+def get_readiness() -> Dict[str, Any]:
+    """
+    Reports which capabilities can be served and the state of each startup stage.
+    """
+    capabilities = {name: is_ready(name) for name in CAPABILITIES}
+    return {
+        "ready": all(capabilities.values()),
+        "capabilities": capabilities,
+        "stages": STARTUP_STATE,
+    }
 
 
 def is_grade_sufficient(user_grade: str, min_grade: Optional[str]) -> bool:
@@ -376,6 +734,10 @@ def check_prereq_tree(node: Any, user_prereqs: UserFulfilled) -> bool | str:
     return f"Special requirement needed: {node_type} ({name})"
 
 
+# row masks of COURSE_INDEX for course_query, per term and per profile
+COURSE_MASKS = MaskCache(COURSE_INDEX)
+
+
 def get_available_courses(
     user_prereqs: UserFulfilled,
     only_prereqs_fulfilled: bool,
@@ -397,16 +759,111 @@ def get_available_courses(
             if course_name in user_prereqs.courses.keys():
                 continue
 
-            if (
-                check_prereq_tree(COURSE_DATA[course_name].prereq_tree, user_prereqs)
-                is True
-            ):
+            # removed by a course update since the names were read
+            course_info = COURSE_DATA.get(course_name)
+            if course_info is None:
+                continue
+            if check_prereq_tree(course_info.prereq_tree, user_prereqs) is True:
                 satisfied_courses.append(course_name)
         return satisfied_courses
     else:
         return course_names
 
 
+def available_mask(
+    user_prereqs: UserFulfilled,
+    only_prereqs_fulfilled: bool,
+    only_current_term: bool,
+    term: str,
+) -> RowMask:
+    """
+    Same selection as get_available_courses, as a row mask of COURSE_INDEX. Term masks
+    and per-profile prerequisite masks are cached until the data or the index changes.
+    """
+    # the index may be synced between the term and the prerequisite mask, the masks
+    # are then rebuilt once for the new version
+    for attempt in range(2):
+        data_version = TOOL_CACHE.data_version
+        if only_current_term:
+            mask = COURSE_MASKS.get(
+                ("term", term, data_version),
+                lambda: COURSE_INDEX.mask(term_courses.get(term, [])),
+            )
+        else:
+            mask = COURSE_MASKS.get(
+                ("all", data_version), lambda: COURSE_INDEX.mask(list(COURSE_DATA))
+            )
+        if not only_prereqs_fulfilled:
+            return mask
+
+        try:
+            return mask & COURSE_MASKS.get(
+                ("prereqs", profile_hash(user_prereqs), data_version),
+                lambda: COURSE_INDEX.mask(
+                    get_available_courses(user_prereqs, True, False, term)
+                ),
+            )
+        except StaleMaskError:
+            if attempt:
+                raise
+            metrics.incr("search.stale_masks")
+
+
+def sync_lexical_index() -> None:
+    """Re-tokenizes the courses whose title or description changed since the last sync."""
+    start = time.perf_counter()
+    changed, removed = LEXICAL_INDEX.sync(
+        {
+            course_id: generate_hash(info.title, info.desc)[1]
+            for course_id, info in list(COURSE_DATA.items())
+        }
+    )
+    print(
+        f"Lexical index synced in {time.perf_counter() - start:.3f}s: "
+        f"{changed} indexed, {removed} removed."
+    )
+
+
+def search_candidates(
+    query_text: str,
+    query_embedding: Any,
+    mask: RowMask,
+    top_n: int,
+    hybrid: bool = HYBRID_SEARCH,
+) -> List[Dict[str, Any]]:
+    """
+    Candidates for reranking in mask, best first. The vector candidates sized by
+    select_candidates are fused with the best BM25 matches by reciprocal rank fusion,
+    so courses named by code or by an exact keyword are reranked too.
+    """
+    vector = select_candidates(
+        [
+            {"id": cid, "document": document, "init_distance": distance}
+            for cid, document, distance in COURSE_INDEX.query(
+                query_embedding, mask, RERANK_MAX_CANDIDATES
+            )
+        ],
+        top_n,
+    )
+    if not hybrid:
+        return vector
+
+    lexical = LEXICAL_INDEX.query(
+        query_text,
+        max(HYBRID_LEXICAL_CANDIDATES, top_n),
+        allowed=lambda ids: COURSE_INDEX.filter(ids, mask),
+    )
+    candidates = {item["id"]: item for item in vector}
+    for cid, document, distance in COURSE_INDEX.lookup(
+        query_embedding, [cid for cid, _ in lexical if cid not in candidates], mask
+    ):
+        candidates[cid] = {"id": cid, "document": document, "init_distance": distance}
+    fused = reciprocal_rank_fusion(
+        [[item["id"] for item in vector], [cid for cid, _ in lexical]]
+    )
+    return [candidates[cid] for cid, _ in fused if cid in candidates]
+
+
 def parse_time_str(time_str: str) -> Tuple[int, int]:
     """Parse time string like '11:30 AM - 12:50 PM' into (start_minutes, end_minutes)."""
     try:
@@ -500,60 +957,40 @@ def get_tools(
         query_text = args.query
         n = args.top_n
 
-        # Fetch significantly more candidates for the cross-encoder to re-rank
-        # This ensures we don't miss relevant items that have lower vector scores
-        fetch_k = 500
-
         try:
-            results = c._CHROMA_COLLECTION.query(
-                ids=get_available_courses(
+            # stage timings, reranking is timed as rerank.seconds
+            start = time.perf_counter()
+            mask = available_mask(
+                user_prereqs,
+                args.only_prereqs_fulfilled,
+                args.only_current_semester,
+                term,
+            )
+            filtered = time.perf_counter()
+            metrics.observe("search.filter_seconds", filtered - start)
+            query_embedding = embed_query(query_text)
+            embedded = time.perf_counter()
+            metrics.observe("search.embed_seconds", embedded - filtered)
+            try:
+                candidates = search_candidates(query_text, query_embedding, mask, n)
+            except StaleMaskError:
+                # the index was synced since the mask was built, rebuild it once
+                metrics.incr("search.stale_masks")
+                mask = available_mask(
                     user_prereqs,
                     args.only_prereqs_fulfilled,
                     args.only_current_semester,
                     term,
-                ),
-                query_texts=[query_text],
-                n_results=fetch_k,
-            )
+                )
+                candidates = search_candidates(query_text, query_embedding, mask, n)
+            metrics.observe("search.candidates_seconds", time.perf_counter() - embedded)
 
-            if not results["ids"]:
+            if not candidates:
                 return {"response": []}
 
-            flat_results: List[Dict[str, Any]] = []
-            ids_list = results["ids"][0]
-            distances_list = (
-                results["distances"][0]
-                if results["distances"]
-                else [None] * len(ids_list)
-            )
-            metadatas_list = (
-                results["metadatas"][0]
-                if results["metadatas"]
-                else [None] * len(ids_list)
-            )
-            documents_list = (
-                results["documents"][0]
-                if results["documents"]
-                else [None] * len(ids_list)
-            )
-
-            for i, cid in enumerate(ids_list):
-                flat_results.append(
-                    {
-                        "id": cid,
-                        "document": documents_list[i],
-                        "init_distance": distances_list[i],
-                    }
-                )
-
             # rerank with cross encoder
-            if flat_results:
-                pairs = [[query_text, item["document"]] for item in flat_results]
-                scores = c._CROSS_ENCODER.predict(pairs)
-                for i, item in enumerate(flat_results):
-                    item["score"] = float(scores[i])
-
-                flat_results.sort(key=lambda x: x["score"], reverse=True)
+            flat_results = rerank(query_text, candidates, n)
+            metrics.observe("search.seconds", time.perf_counter() - start)
 
             return {
                 "search_result": flat_results[:n],
@@ -563,7 +1000,7 @@ def get_tools(
             }
 
         except Exception as e:
-            print("Error querying ChromaDB:", e)
+            print("Error querying course index:", e)
             return {"error": "error"}
 
     def update_user_profile(args: UpdateUserProfile):
@@ -902,108 +1339,123 @@ def get_tools(
         """
         return {"response": f"{term[:-2]} {SEMESTERS[term[-2:]]}"}
 
+    # the read-only tools share results across sessions, keyed on what they depend on
+    def course_query_key(args: CourseQueryFormat):
+        return (
+            normalize_text(args.query),
+            args.top_n,
+            args.only_prereqs_fulfilled,
+            term if args.only_current_semester else None,
+            # the profile is read when the call runs, it can change within a turn
+            profile_hash(user_prereqs) if args.only_prereqs_fulfilled else None,
+        )
+
+    def course_description_key(args: CourseSearchFormat):
+        return " ".join(args.course_name.upper().split())
+
     return [
-        course_query,
+        TOOL_CACHE.wrap(course_query, course_query_key),
         update_user_profile,
-        get_course_description,
+        TOOL_CACHE.wrap(get_course_description, course_description_key),
         can_take_course,
         make_schedule,
-        get_term,
+        TOOL_CACHE.wrap(get_term, lambda: term),
     ]
 
 
-def dump_history(history: List[types.Content]):
-    clean_history = []
+TOOL_ARG_MODELS = {
+    "course_query": CourseQueryFormat,
+    "update_user_profile": UpdateUserProfile,
+    "get_course_description": CourseSearchFormat,
+    "can_take_course": CourseSearchFormat,
+    "make_schedule": MakeScheduleFormat,
+}
+# tools that change the session's profile, these never run alongside other tools
+MUTATING_TOOLS = {"update_user_profile"}
+# tools that stream results through on_data, at most one per batch so schedules don't interleave
+STREAMING_TOOLS = {"make_schedule"}
 
-    for h in history:
-        # Convert the Content object to a dictionary
-        data = h.model_dump(exclude_none=True)
 
-        # Iterate through parts to remove 'thought' and 'thought_signature'
-        if "parts" in data:
-            parts = []
-            for part in data["parts"]:
-                curr_part = {}
-                if "text" in part:
-                    curr_part['text'] = part["text"]
-                if "function_call" in part:
-                    curr_part['function_call'] = part["function_call"]
-                if "function_response" in part:
-                    curr_part['function_response'] = part["function_response"]
-                if curr_part:
-                    parts.append(curr_part)
-            data["parts"] = parts
-
-        clean_history.append(data)
-
-    return json.dumps(clean_history)
-
-
-def load_history(history_str: str) -> List[types.Content]:
+def batch_tool_calls(function_calls: List[types.FunctionCall]) -> List[List[int]]:
     """
-    Loads a JSON string back into a list of Gemini Content objects.
+    Groups the indices of a turn's function calls into batches that can run concurrently.
+    Read-only calls share a batch, a mutating call gets a batch of its own, so every
+    call still sees the profile as it would if the calls ran one after another.
     """
-    if not history_str:
-        return []
-    try:
-        data = json.loads(history_str)
-        return [types.Content.model_validate(h) for h in data]
-    except Exception as e:
-        print(f"Error loading history: {e}")
-        return []
+    batches: List[List[int]] = []
+    for i, call in enumerate(function_calls):
+        current = batches[-1] if batches else None
+        starts_batch = (
+            current is None
+            or call.name in MUTATING_TOOLS
+            or function_calls[current[0]].name in MUTATING_TOOLS
+            or (
+                call.name in STREAMING_TOOLS
+                and any(function_calls[j].name in STREAMING_TOOLS for j in current)
+            )
+        )
+        if starts_batch:
+            batches.append([i])
+        else:
+            current.append(i)
+    return batches
 
 
-def dump_prereqs(prereqs: UserFulfilled) -> str:
+async def execute_tool_call(
+    call: types.FunctionCall, tool_map: Dict[str, Callable]
+) -> Any:
     """
-    Converts a UserFulfilled object to a JSON string.
+    Validates the arguments of a function call and runs the tool in the executor.
+    Errors are returned as the tool result so the model can relay them.
     """
-    return prereqs.model_dump_json()
+    fn_name = call.name
+    fn_args = call.args or {}
+    fn_args_dict = dict(fn_args)
 
+    # Check for the 'args' wrapper and unwrap it
+    if "args" in fn_args_dict and len(fn_args_dict) == 1:
+        fn_args = fn_args_dict["args"]
 
-def load_prereqs(prereqs_str: str) -> UserFulfilled:
-    """
-    Loads a JSON string back into a UserFulfilled object.
-    """
-    if not prereqs_str:
-        return UserFulfilled()
+    target_func = tool_map.get(fn_name)
+    if not target_func:
+        return {"error": f"Tool {fn_name} not found"}
+
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
     try:
-        return UserFulfilled.model_validate_json(prereqs_str)
+        if fn_name in TOOL_ARG_MODELS:
+            args_obj = TOOL_ARG_MODELS[fn_name](**fn_args)
+            return await loop.run_in_executor(
+                c.get_tool_executor(), target_func, args_obj
+            )
+        return await loop.run_in_executor(c.get_tool_executor(), target_func)
     except Exception as e:
-        print(f"Error loading prereqs: {e}")
-        return UserFulfilled(courses={})
+        print(f"Error executing {fn_name}: {e}")
+        return {"error": str(e)}
+    finally:
+        metrics.observe(f"tool.{fn_name}.seconds", time.perf_counter() - start)
 
 
 def gemini_call(input_text: str, session_id: str, term: TERMS):
-    client = genai.Client()
-
-    history_raw = c._REDIS.get(f"{session_id}:history")
-    prereqs_raw = c._REDIS.get(f"{session_id}:prereqs")
+    history_raw, prereqs_raw = load_session_sync(session_id)
     history = load_history(history_raw)
     parsed_userprereqs = load_prereqs(prereqs_raw)
     tools = get_tools(parsed_userprereqs, term)
 
-    # move to constants as global var
-    with open(CHATBOT_PROMPT_FILE, "r", encoding="utf-8") as f:
-        prompt = f.read()
+    prompt = c.read_prompt(CHATBOT_PROMPT_FILE)
 
     sys_instruction = f"User's current profile: {prereqs_raw}." + prompt
 
-    chat = client.chats.create(
-        model="gemini-2.5-flash",
-        config=types.GenerateContentConfig(
-            system_instruction=sys_instruction,
-            tools=tools,
-            automatic_function_calling=types.AutomaticFunctionCallingConfig(
-                disable=False
-            ),
-        ),
+    chat = c.get_model_backend().create_chat(
+        system_instruction=sys_instruction,
+        tools=tools,
         history=history,
+        automatic_function_calling=True,
     )
 
     response = chat.send_message(input_text)
 
-    c._REDIS.set(f"{session_id}:history", dump_history(chat._curated_history))
-    c._REDIS.set(f"{session_id}:prereqs", dump_prereqs(parsed_userprereqs))
+    save_session_sync(session_id, chat._curated_history, parsed_userprereqs)
     return response.text
 
 
@@ -1013,173 +1465,92 @@ async def gemini_call_stream(
     term: TERMS,
     attachments: Optional[List[str]] = None,
 ):
-    client = genai.Client()
-
-    history_raw = c._REDIS.get(f"{session_id}:history")
-    prereqs_raw = c._REDIS.get(f"{session_id}:prereqs")
-    history = load_history(history_raw)
-    parsed_userprereqs = load_prereqs(prereqs_raw)
+    session = await SESSION_STORE.load(session_id)
+    session.files, history = drop_expired_files(session.files, session.history)
+    parsed_userprereqs = session.prereqs
+    prereqs_raw = session.prereqs_raw
 
-    data_queue = queue.Queue()
-
-    def on_data(data):
-        data_queue.put(data)
-
-    tools = get_tools(parsed_userprereqs, term, on_data=on_data)
+    schedule_updates = AsyncBridge()
+    tools = get_tools(parsed_userprereqs, term, on_data=schedule_updates.put)
     tool_map = {f.__name__: f for f in tools}
 
-    with open(CHATBOT_PROMPT_FILE, "r", encoding="utf-8") as f:
-        prompt = f.read()
+    prompt = c.read_prompt(CHATBOT_PROMPT_FILE)
 
     sys_instruction = f"User's current profile: {prereqs_raw}." + prompt
 
-    chat = client.chats.create(
-        model="gemini-2.5-flash",
-        config=types.GenerateContentConfig(
+    chat = ResilientChat(
+        lambda chat_history: c.get_model_backend().create_chat(
             system_instruction=sys_instruction,
             tools=tools,
-            automatic_function_calling=types.AutomaticFunctionCallingConfig(
-                disable=True
-            ),
+            history=chat_history,
+            automatic_function_calling=False,
         ),
-        history=history,
+        history,
     )
 
     loop = asyncio.get_running_loop()
 
-    # Helper to consume stream in thread
-    async def consume_stream_and_yield(response_iterator):
-        text_queue = queue.Queue()
-
-        def iter_proc():
-            try:
-                for chunk in response_iterator:
-                    text_queue.put(chunk)
-            except Exception as e:
-                print(f"Stream error: {e}")
-            finally:
-                text_queue.put(None)
-
-        future = loop.run_in_executor(None, iter_proc)
-
-        while True:
+    async def stream_text(message):
+        async for chunk in chat.send_message_stream(message):
             try:
-                chunk = text_queue.get_nowait()
-                if chunk is None:
-                    break
-
-                try:
-                    if chunk.text:
-                        yield StreamChunk(type="text", content=chunk.text).model_dump()
-                except ValueError:
-                    pass
-            except queue.Empty:
-                await asyncio.sleep(0.01)
-
-        await future
-        return
+                if chunk.text:
+                    yield {"type": "text", "content": chunk.text}
+            except ValueError:
+                pass
 
     # Initial Request
     message_parts = [input_text]
     if attachments:
-        for att in attachments:
-            try:
-                # Decompress gzip
-                compressed_data = base64.b64decode(att)
-                with gzip.GzipFile(fileobj=io.BytesIO(compressed_data)) as f:
-                    pdf_data = f.read()
-                message_parts.append(
-                    types.Part.from_bytes(data=pdf_data, mime_type="application/pdf")
-                )
-            except Exception as e:
-                print(f"Error processing attachment: {e}")
-
-    response_stream = await loop.run_in_executor(
-        None, lambda: chat.send_message_stream(message_parts)
-    )
-
-    async for chunk_out in consume_stream_and_yield(response_stream):
-        yield chunk_out
-
-    # Since we can't easily get the aggregated response from the iterator wrapper in the consume function
-    # unless we return it, and we did return response_iterator which IS the response object.
-    while True:
-        last_msg = chat._curated_history[-1]
-        function_calls = [
-            part.function_call for part in (last_msg.parts or []) if part.function_call
-        ]
-
-        if not function_calls:
-            break
-
-        parts = []
-        for call in function_calls:
-            fn_name = call.name
-            fn_args = call.args
-            fn_args_dict = dict(fn_args)
-
-            # 2. THE FIX: Check for the 'args' wrapper and unwrap it
-            if "args" in fn_args_dict and len(fn_args_dict) == 1:
-                fn_args = fn_args_dict["args"]
-
-            target_func = tool_map.get(fn_name)
-            result = None
-
-            if not target_func:
-                result = {"error": f"Tool {fn_name} not found"}
-            else:
-                try:
-                    args_obj = None
-                    if fn_name == "course_query":
-                        args_obj = CourseQueryFormat(**fn_args)
-                    elif fn_name == "update_user_profile":
-                        args_obj = UpdateUserProfile(**fn_args)
-                    elif fn_name == "get_course_description":
-                        args_obj = CourseSearchFormat(**fn_args)
-                    elif fn_name == "can_take_course":
-                        args_obj = CourseSearchFormat(**fn_args)
-                    elif fn_name == "make_schedule":
-                        args_obj = MakeScheduleFormat(**fn_args)
-
-                    if fn_name == "make_schedule":
-                        with ThreadPoolExecutor() as executor:
-                            future = executor.submit(target_func, args_obj)
-                            while not future.done():
-                                while not data_queue.empty():
-                                    item = data_queue.get()
-                                    yield StreamChunk(
-                                        type="schedule", content=item
-                                    ).model_dump()
-                                await asyncio.sleep(0.05)
-                            while not data_queue.empty():
-                                item = data_queue.get()
-                                yield StreamChunk(
-                                    type="schedule", content=item
-                                ).model_dump()
-                            result = future.result()
-                    else:
-                        if args_obj:
-                            result = await loop.run_in_executor(
-                                None, target_func, args_obj
-                            )
-                        else:
-                            result = await loop.run_in_executor(None, target_func)
-
-                except Exception as e:
-                    print(f"Error executing {fn_name}: {e}")
-                    result = {"error": str(e)}
-
-            parts.append(
-                types.Part.from_function_response(name=fn_name, response=result)
-            )
-
-        # Send function response
-        response_stream = await loop.run_in_executor(
-            None, lambda: chat.send_message_stream(parts)
+        # decoding and uploading are blocking, keep them off the event loop
+        message_parts, new_files = await loop.run_in_executor(
+            c.get_tool_executor(),
+            prepare_message_parts,
+            input_text,
+            attachments,
+            session.files,
+            shared_file_uris(history),
+            c.get_model_backend().upload_file,
         )
+        session.files.update(new_files)
 
-        async for chunk_out in consume_stream_and_yield(response_stream):
+    try:
+        async for chunk_out in stream_text(message_parts):
             yield chunk_out
 
-    c._REDIS.set(f"{session_id}:history", dump_history(chat._curated_history))
-    c._REDIS.set(f"{session_id}:prereqs", dump_prereqs(parsed_userprereqs))
+        while True:
+            last_msg = chat.history[-1]
+            function_calls = [
+                part.function_call
+                for part in (last_msg.parts or [])
+                if part.function_call
+            ]
+
+            if not function_calls:
+                break
+
+            results: List[Any] = [None] * len(function_calls)
+            for batch in batch_tool_calls(function_calls):
+                pending = asyncio.gather(
+                    *(execute_tool_call(function_calls[i], tool_map) for i in batch)
+                )
+                async for item in schedule_updates.until(pending):
+                    yield {"type": "schedule", "content": item}
+                for i, result in zip(batch, await pending):
+                    results[i] = result
+
+            parts = [
+                types.Part.from_function_response(name=call.name, response=result)
+                for call, result in zip(function_calls, results)
+            ]
+
+            # Send function response
+            async for chunk_out in stream_text(parts):
+                yield chunk_out
+    except ModelUnavailable as e:
+        # the turn is incomplete, keep the stored session as it was
+        yield {"type": "text", "content": str(e)}
+        return
+
+    await SESSION_STORE.save(
+        session_id, chat.history, parsed_userprereqs, session.files
+    )
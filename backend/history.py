@@ -0,0 +1,129 @@
+"""
+Bounded chat history for sessions stored in Redis.
+
+History entries are the dicts produced by dump_history (Gemini Content objects with only
+text, function_call and function_response parts). Before they are stored, only the last
+MAX_CHAT_HISTORY_LEN turns are kept, the history is trimmed to MAX_CHAT_HISTORY_TOKENS,
+and tool outputs from earlier turns are shrunk to what the model needs to refer back
+to them. The result is stored zlib-compressed.
+"""
+
+import base64
+import json
+import zlib
+from typing import Any, Dict, List
+
+from backend.constants import (
+    MAX_CHAT_HISTORY_LEN,
+    MAX_CHAT_HISTORY_TOKENS,
+    MAX_TOOL_OUTPUT_CHARS,
+)
+
+HistoryEntry = Dict[str, Any]
+
+# prefix marking compressed history, older sessions were stored as plain JSON
+COMPRESSED_PREFIX = "z:"
+
+
+def is_user_message(entry: HistoryEntry) -> bool:
+    """A turn starts at a user entry with text, function responses also have role user."""
+    return entry.get("role") == "user" and any(
+        "text" in part for part in entry.get("parts", [])
+    )
+
+
+def split_turns(entries: List[HistoryEntry]) -> List[List[HistoryEntry]]:
+    turns: List[List[HistoryEntry]] = []
+    for entry in entries:
+        if is_user_message(entry) or not turns:
+            turns.append([])
+        turns[-1].append(entry)
+    return turns
+
+
+def estimate_tokens(entries: List[HistoryEntry]) -> int:
+    # ~4 characters per token is close enough for budgeting
+    return len(json.dumps(entries)) // 4
+
+
+def compact_tool_output(name: str, response: Any) -> Any:
+    """Shrinks a tool output to what later turns need to refer back to it."""
+    if not isinstance(response, dict):
+        return response
+
+    if name == "course_query" and "search_result" in response:
+        return {"course_ids": [item.get("id") for item in response["search_result"]]}
+
+    schedules = response.get("schedules")
+    if name == "make_schedule" and schedules and isinstance(schedules[0], dict):
+        return {
+            "schedules": [
+                [
+                    f"{section['course']} {section['section_id']}"
+                    for section in schedule["sections"]
+                ]
+                for schedule in schedules
+            ],
+            "errors": response.get("errors"),
+        }
+
+    if len(json.dumps(response)) > MAX_TOOL_OUTPUT_CHARS:
+        return {"omitted": "Large tool output removed from history."}
+    return response
+
+
+def compact_turn(turn: List[HistoryEntry]) -> List[HistoryEntry]:
+    compacted = []
+    for entry in turn:
+        parts = []
+        for part in entry.get("parts", []):
+            if "function_response" in part:
+                fn = part["function_response"]
+                part = {
+                    "function_response": {
+                        **fn,
+                        "response": compact_tool_output(
+                            fn.get("name"), fn.get("response")
+                        ),
+                    }
+                }
+            parts.append(part)
+        compacted.append({**entry, "parts": parts})
+    return compacted
+
+
+def compact_history(
+    entries: List[HistoryEntry],
+    max_turns: int = MAX_CHAT_HISTORY_LEN,
+    max_tokens: int = MAX_CHAT_HISTORY_TOKENS,
+) -> List[HistoryEntry]:
+    """
+    Keeps the last max_turns turns, compacts tool outputs of all but the latest turn and
+    drops the oldest turns until the history fits max_tokens. The latest turn is always
+    kept whole. Turns are only cut at user messages so function calls stay paired with
+    their responses.
+    """
+    turns = split_turns(entries)[-max_turns:]
+    if not turns:
+        return []
+
+    turns = [compact_turn(turn) for turn in turns[:-1]] + [turns[-1]]
+    sizes = [estimate_tokens(turn) for turn in turns]
+    total = sum(sizes)
+    while len(turns) > 1 and total > max_tokens:
+        total -= sizes.pop(0)
+        turns.pop(0)
+
+    return [entry for turn in turns for entry in turn]
+
+
+def encode_history(entries: List[HistoryEntry]) -> str:
+    raw = json.dumps(entries, separators=(",", ":")).encode("utf-8")
+    return COMPRESSED_PREFIX + base64.b64encode(zlib.compress(raw)).decode("ascii")
+
+
+def decode_history(history_str: str) -> List[HistoryEntry]:
+    if history_str.startswith(COMPRESSED_PREFIX):
+        raw = zlib.decompress(base64.b64decode(history_str[len(COMPRESSED_PREFIX) :]))
+        return json.loads(raw)
+    return json.loads(history_str)
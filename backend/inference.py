@@ -0,0 +1,187 @@
+"""
+Query embeddings and cross-encoder scores for course_query, cached and micro-batched.
+
+Every course_query embeds its query and scores a few batches of pairs on CPU. Concurrent
+searches from different sessions each paid for a forward pass of their own, so a
+MicroBatcher collects the requests arriving within INFERENCE_BATCH_SECONDS and runs them
+as one. Query embeddings are also cached by normalized query, most searches are
+variations of a few topics.
+"""
+
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+from backend import constants as c
+from backend import metrics
+from backend.constants import (
+    CROSS_ENCODER_MAX_BATCH,
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_MAX_BATCH,
+    INFERENCE_BATCH_SECONDS,
+)
+from backend.tool_cache import normalize_text
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Runs fn over the items of all calls made within `window` seconds of each other, up
+    to max_batch items, in one worker thread. fn maps a list of items to a list of
+    results of the same length. Callers block until their results are ready. The worker
+    only waits for the window while other calls are in flight, a lone call runs at once.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[List[T]], Sequence[R]],
+        window: float = INFERENCE_BATCH_SECONDS,
+        max_batch: int = 64,
+    ):
+        self.name = name
+        self.fn = fn
+        self.window = window
+        self.max_batch = max_batch
+        self._requests: "queue.Queue[Tuple[List[T], Future]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        # calls waiting for results, a lone caller does not wait for the window
+        self._callers = 0
+
+    def __call__(self, items: Sequence[T]) -> List[R]:
+        items = list(items)
+        if not items:
+            return []
+        if self.window <= 0:
+            return list(self.fn(items))
+        future: Future = Future()
+        with self._lock:
+            self._callers += 1
+        try:
+            self._requests.put((items, future))
+            self._ensure_worker()
+            return future.result()
+        finally:
+            with self._lock:
+                self._callers -= 1
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name=f"batcher-{self.name}", daemon=True
+                )
+                self._worker.start()
+
+    def _collect(self) -> List[Tuple[List[T], Future]]:
+        requests = [self._requests.get()]
+        size = len(requests[0][0])
+        deadline = time.monotonic() + self.window
+        while size < self.max_batch:
+            timeout = deadline - time.monotonic()
+            # without other calls in flight, only take what is already queued
+            wait = timeout > 0 and self._callers > len(requests)
+            try:
+                request = self._requests.get(
+                    block=wait, timeout=timeout if wait else None
+                )
+            except queue.Empty:
+                break
+            requests.append(request)
+            size += len(request[0])
+        return requests
+
+    def _run(self) -> None:
+        while True:
+            requests = self._collect()
+            items = [item for request_items, _ in requests for item in request_items]
+            metrics.incr(f"{self.name}.batches")
+            metrics.incr(f"{self.name}.batched_items", len(items))
+            try:
+                start = time.perf_counter()
+                results = list(self.fn(items))
+                metrics.observe(f"{self.name}.seconds", time.perf_counter() - start)
+            except Exception as e:
+                for _, future in requests:
+                    future.set_exception(e)
+                continue
+            offset = 0
+            for request_items, future in requests:
+                future.set_result(results[offset : offset + len(request_items)])
+                offset += len(request_items)
+
+
+def _embed(texts: List[str]) -> List[np.ndarray]:
+    return [np.asarray(e, dtype=np.float32) for e in c.get_ef()(texts)]
+
+
+def _score(pairs: List[List[str]]) -> List[float]:
+    return [float(s) for s in c.get_cross_encoder().predict(pairs)]
+
+
+EMBEDDING_BATCHER = MicroBatcher("embedding", _embed, max_batch=EMBEDDING_MAX_BATCH)
+CROSS_ENCODER_BATCHER = MicroBatcher(
+    "cross_encoder", _score, max_batch=CROSS_ENCODER_MAX_BATCH
+)
+
+
+class EmbeddingCache:
+    """Thread-safe LRU of normalized query -> read-only embedding."""
+
+    def __init__(self, max_entries: int = EMBEDDING_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._embeddings: OrderedDict[str, np.ndarray] = OrderedDict()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            embedding = self._embeddings.get(key)
+            if embedding is not None:
+                self._embeddings.move_to_end(key)
+            return embedding
+
+    def put(self, key: str, embedding: np.ndarray) -> None:
+        embedding.setflags(write=False)
+        with self._lock:
+            self._embeddings[key] = embedding
+            self._embeddings.move_to_end(key)
+            while len(self._embeddings) > self.max_entries:
+                self._embeddings.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._embeddings.clear()
+
+
+QUERY_EMBEDDINGS = EmbeddingCache()
+
+
+def embed_query(
+    text: str,
+    cache: Optional[EmbeddingCache] = QUERY_EMBEDDINGS,
+    embed: Callable[[List[str]], List[np.ndarray]] = EMBEDDING_BATCHER,
+) -> np.ndarray:
+    """Embedding of a search query, the same for queries differing in case or spacing."""
+    key = normalize_text(text)
+    embedding = cache.get(key) if cache else None
+    if embedding is not None:
+        metrics.incr("embedding.cache_hits")
+        return embedding
+    metrics.incr("embedding.cache_misses")
+    embedding = np.asarray(embed([key])[0], dtype=np.float32)
+    if cache:
+        cache.put(key, embedding)
+    return embedding
+
+
+def score_pairs(pairs: List[List[str]]) -> List[float]:
+    """Cross-encoder scores of [query, document] pairs, batched with concurrent calls."""
+    return CROSS_ENCODER_BATCHER(pairs)
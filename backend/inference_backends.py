@@ -0,0 +1,153 @@
+"""
+Loaders of the bi-encoder and cross-encoder for each INFERENCE_BACKEND.
+
+- torch: full precision sentence-transformers models, as before
+- int8:  the same models with their linear layers dynamically quantized to int8 (CPU)
+- onnx:  the ONNX graphs published in the models' Hugging Face repos, run by onnxruntime
+         with the tokenizers library, torch is never imported. The onnx/model_q*.onnx
+         graphs are int8 quantized.
+
+All of them return an embedding function usable by Chroma and a cross-encoder with
+predict(pairs), so the rest of the backend does not depend on the choice.
+backend/benchmarks/inference_parity.py checks that rankings agree with torch and
+backend/benchmarks/inference_backends.py compares latency and memory.
+"""
+
+from typing import Sequence
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+from backend.constants import (
+    CROSS_ENCODER_MODEL,
+    EMBEDDING_MODEL,
+    ONNX_CROSS_ENCODER_FILE,
+    ONNX_EMBEDDING_FILE,
+    ONNX_THREADS,
+)
+
+INFERENCE_BACKENDS = ("torch", "int8", "onnx")
+# max_seq_length of the sentence-transformers models
+EMBEDDING_MAX_TOKENS = 256
+CROSS_ENCODER_MAX_TOKENS = 512
+
+
+def _quantize(module):
+    import torch
+
+    return torch.quantization.quantize_dynamic(
+        module, {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+def _onnx_session(repo: str, file_name: str):
+    import onnxruntime
+    from huggingface_hub import hf_hub_download
+
+    options = onnxruntime.SessionOptions()
+    if ONNX_THREADS:
+        options.intra_op_num_threads = ONNX_THREADS
+    return onnxruntime.InferenceSession(
+        hf_hub_download(repo, file_name),
+        sess_options=options,
+        providers=["CPUExecutionProvider"],
+    )
+
+
+def _tokenizer(repo: str, max_tokens: int):
+    from huggingface_hub import hf_hub_download
+    from tokenizers import Tokenizer
+
+    tokenizer = Tokenizer.from_file(hf_hub_download(repo, "tokenizer.json"))
+    tokenizer.enable_truncation(max_length=max_tokens)
+    tokenizer.enable_padding()
+    return tokenizer
+
+
+def _model_inputs(session, encodings) -> dict:
+    inputs = {
+        "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+        "attention_mask": np.array([e.attention_mask for e in encodings], np.int64),
+        "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+    }
+    names = {i.name for i in session.get_inputs()}
+    return {name: value for name, value in inputs.items() if name in names}
+
+
+class OnnxEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Mean pooled, normalized sentence embeddings, like the sentence-transformers model."""
+
+    def __init__(
+        self, model_name: str = EMBEDDING_MODEL, file_name=ONNX_EMBEDDING_FILE
+    ):
+        repo = (
+            model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+        )
+        self.session = _onnx_session(repo, file_name)
+        self.tokenizer = _tokenizer(repo, EMBEDDING_MAX_TOKENS)
+
+    def __call__(self, input: Documents) -> Embeddings:
+        if not input:
+            return []
+        inputs = _model_inputs(self.session, self.tokenizer.encode_batch(list(input)))
+        hidden = self.session.run(None, inputs)[0]
+        mask = inputs["attention_mask"][:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return list(pooled.astype(np.float32))
+
+
+class OnnxCrossEncoder:
+    """Relevance logits of (query, document) pairs, like CrossEncoder.predict."""
+
+    def __init__(
+        self, model_name: str = CROSS_ENCODER_MODEL, file_name=ONNX_CROSS_ENCODER_FILE
+    ):
+        self.session = _onnx_session(model_name, file_name)
+        self.tokenizer = _tokenizer(model_name, CROSS_ENCODER_MAX_TOKENS)
+
+    def predict(self, pairs: Sequence[Sequence[str]]) -> np.ndarray:
+        if not len(pairs):
+            return np.zeros(0, dtype=np.float32)
+        encodings = self.tokenizer.encode_batch([(q, d) for q, d in pairs])
+        logits = self.session.run(None, _model_inputs(self.session, encodings))[0]
+        return logits[:, 0]
+
+
+def _check_backend(backend: str) -> None:
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(
+            f"Unknown inference backend {backend!r}, use one of {INFERENCE_BACKENDS}"
+        )
+
+
+def load_embedding_function(backend: str, device: str = "cpu"):
+    _check_backend(backend)
+    if backend == "onnx":
+        return OnnxEmbeddingFunction()
+
+    from chromadb.utils import embedding_functions
+
+    # quantized linear layers only run on the CPU
+    ef = embedding_functions.SentenceTransformerEmbeddingFunction(
+        model_name=EMBEDDING_MODEL, device="cpu" if backend == "int8" else device
+    )
+    if backend == "int8":
+        # Chroma's function encodes with _model, swap in a quantized copy
+        ef._model = _quantize(ef._model)
+    return ef
+
+
+def load_cross_encoder(backend: str, device: str = "cpu"):
+    _check_backend(backend)
+    if backend == "onnx":
+        return OnnxCrossEncoder()
+
+    from sentence_transformers import CrossEncoder
+
+    cross_encoder = CrossEncoder(
+        CROSS_ENCODER_MODEL, device="cpu" if backend == "int8" else device
+    )
+    if backend == "int8":
+        cross_encoder.model = _quantize(cross_encoder.model)
+    return cross_encoder
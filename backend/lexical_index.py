@@ -0,0 +1,141 @@
+"""
+In-process BM25 index over course codes, titles and descriptions.
+
+Embeddings are weak on exact tokens students type, like "CS 341", "python" or
+"capstone". course_query fuses the BM25 ranking with the vector ranking by reciprocal
+rank fusion, so those courses make it into the reranked candidates without fetching
+hundreds of vector candidates. The index is built from COURSE_DATA when it is loaded
+and only changed courses are re-tokenized on refresh.
+"""
+
+import math
+import re
+import threading
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+# standard BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+# constant of reciprocal rank fusion, damps the weight of the very first ranks
+RRF_K = 60
+
+_WORD = re.compile(r"[a-z]+|\d+")
+# frequent words that carry no meaning in a course search
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "class", "classes", "course",
+    "courses", "for", "from", "i", "in", "is", "it", "me", "of", "on", "or", "some",
+    "that", "the", "to", "want", "with",
+}  # fmt: skip
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased words and numbers. A subject followed by a number also yields the joined
+    code, so "CS 341", "cs341" and "CS-341" all match course CS 341.
+    """
+    words = _WORD.findall(text.lower())
+    tokens = [w for w in words if w not in STOPWORDS]
+    for first, second in zip(words, words[1:]):
+        if first.isalpha() and second.isdigit():
+            tokens.append(first + second)
+    return tokens
+
+
+class LexicalIndex:
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        # token -> course id -> term frequency
+        self._postings: Dict[str, Dict[str, int]] = {}
+        # course id -> (text it was built from, token counts)
+        self._docs: Dict[str, Tuple[str, Counter]] = {}
+        # course id -> number of tokens
+        self._lengths: Dict[str, int] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _remove(self, course_id: str) -> None:
+        _, counts = self._docs.pop(course_id)
+        self._total_length -= self._lengths.pop(course_id)
+        for token in counts:
+            postings = self._postings[token]
+            del postings[course_id]
+            if not postings:
+                del self._postings[token]
+
+    def sync(self, texts: Mapping[str, str]) -> Tuple[int, int]:
+        """
+        Makes the index cover exactly the given course id -> text. Returns how many
+        courses were (re)indexed and removed.
+        """
+        with self._lock:
+            removed = [i for i in self._docs if i not in texts]
+            for course_id in removed:
+                self._remove(course_id)
+            changed = 0
+            for course_id, text in texts.items():
+                old = self._docs.get(course_id)
+                if old is not None and old[0] == text:
+                    continue
+                if old is not None:
+                    self._remove(course_id)
+                counts = Counter(tokenize(f"{course_id} {text}"))
+                self._docs[course_id] = (text, counts)
+                self._lengths[course_id] = sum(counts.values())
+                self._total_length += self._lengths[course_id]
+                for token, tf in counts.items():
+                    self._postings.setdefault(token, {})[course_id] = tf
+                changed += 1
+            return changed, len(removed)
+
+    def query(
+        self,
+        text: str,
+        k: int,
+        allowed: Optional[Callable[[List[str]], List[str]]] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Returns up to k (course id, BM25 score) best matching the text. allowed filters
+        the matching course ids, e.g. to the term or the user's fulfilled prerequisites.
+        """
+        tokens = tokenize(text)
+        scores: Dict[str, float] = {}
+        with self._lock:
+            n = len(self._docs)
+            if not n or not tokens:
+                return []
+            average_length = self._total_length / n
+            for token in set(tokens):
+                postings = self._postings.get(token)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for course_id, tf in postings.items():
+                    length = self._lengths[course_id]
+                    norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                    scores[course_id] = scores.get(course_id, 0.0) + idf * tf * (
+                        self.k1 + 1
+                    ) / (tf + norm)
+        ids = list(scores)
+        if allowed is not None:
+            ids = allowed(ids)
+        ids.sort(key=lambda i: scores[i], reverse=True)
+        return [(i, scores[i]) for i in ids[:k]]
+
+
+def reciprocal_rank_fusion(
+    rankings: Iterable[List[str]], k: int = RRF_K
+) -> List[Tuple[str, float]]:
+    """Ids of several rankings ordered by the sum of 1 / (k + rank) over the rankings."""
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, course_id in enumerate(ranking, 1):
+            fused[course_id] = fused.get(course_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+LEXICAL_INDEX = LexicalIndex()
@@ -0,0 +1,130 @@
+"""
+In-process metrics for the backend, served as JSON by the /metrics endpoint.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict
+
+# Number of recent observations kept per timing for percentiles
+TIMING_WINDOW = 1000
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = {}
+_gauges: Dict[str, float] = {}
+_timings: Dict[str, Deque[float]] = {}
+_timing_totals: Dict[str, Dict[str, float]] = {}
+# gauges computed when a snapshot is taken
+_gauge_fns: Dict[str, Callable[[], float]] = {}
+
+
+def incr(name: str, value: float = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name: str, value: float) -> None:
+    with _lock:
+        _gauges[name] = value
+
+
+def register_gauge(name: str, fn: Callable[[], float]) -> None:
+    with _lock:
+        _gauge_fns[name] = fn
+
+
+def observe(name: str, seconds: float) -> None:
+    """Records a duration in seconds."""
+    with _lock:
+        if name not in _timings:
+            _timings[name] = deque(maxlen=TIMING_WINDOW)
+            _timing_totals[name] = {"count": 0, "sum": 0.0}
+        _timings[name].append(seconds)
+        _timing_totals[name]["count"] += 1
+        _timing_totals[name]["sum"] += seconds
+
+
+def _nearest_rank(ordered: list, p: float) -> float:
+    return ordered[int(round(p / 100 * (len(ordered) - 1)))]
+
+
+def timing_count(name: str) -> int:
+    """Number of recent observations kept for a timing."""
+    with _lock:
+        return len(_timings.get(name, ()))
+
+
+def percentile(name: str, p: float) -> float | None:
+    """Returns the p-th percentile (0-100) of the recent observations of a timing."""
+    with _lock:
+        values = sorted(_timings.get(name, ()))
+    if not values:
+        return None
+    return _nearest_rank(values, p)
+
+
+def snapshot() -> Dict[str, Any]:
+    with _lock:
+        timings = {}
+        for name, values in _timings.items():
+            ordered = sorted(values)
+            totals = _timing_totals[name]
+            timings[name] = {
+                "count": totals["count"],
+                "mean": totals["sum"] / totals["count"],
+                "p50": _nearest_rank(ordered, 50),
+                "p95": _nearest_rank(ordered, 95),
+                "max": ordered[-1],
+            }
+        gauges = dict(_gauges)
+        for name, fn in _gauge_fns.items():
+            gauges[name] = fn()
+        return {
+            "counters": dict(_counters),
+            "gauges": gauges,
+            "timings": timings,
+        }
+
+
+class InstrumentedExecutor(ThreadPoolExecutor):
+    """
+    A ThreadPoolExecutor that reports its size, busy workers, queued work and the time
+    tasks wait for a worker under executor.<name>.*.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        super().__init__(max_workers=max_workers, thread_name_prefix=name)
+        self.name = name
+        self._active = 0
+        self._pending = 0
+        self._counts_lock = threading.Lock()
+
+        prefix = f"executor.{name}"
+        register_gauge(f"{prefix}.workers", lambda: self._max_workers)
+        register_gauge(f"{prefix}.active", lambda: self._active)
+        register_gauge(f"{prefix}.queued", lambda: self._pending)
+        register_gauge(
+            f"{prefix}.utilization", lambda: self._active / self._max_workers
+        )
+
+    def submit(self, fn, /, *args, **kwargs):
+        submitted_at = time.perf_counter()
+        with self._counts_lock:
+            self._pending += 1
+
+        def run():
+            with self._counts_lock:
+                self._pending -= 1
+                self._active += 1
+            observe(
+                f"executor.{self.name}.wait_seconds", time.perf_counter() - submitted_at
+            )
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._counts_lock:
+                    self._active -= 1
+
+        return super().submit(run)
@@ -0,0 +1,277 @@
+"""
+Model backends for the chatbot.
+
+gemini_call and gemini_call_stream create their chats through get_model_backend(), which
+returns the Gemini backend in production. With LLM_BACKEND=fake a scripted local stand-in
+is used instead: it calls the real tools as scripted and streams canned text with
+configurable timing, so /chat can be load tested without Gemini.
+
+upload_file puts an attachment in the backend's file store once, later messages
+reference it by uri (see backend/attachments.py).
+"""
+
+import hashlib
+import io
+import json
+import random
+import re
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+from google.genai import types
+
+from backend import constants as c
+from backend.constants import (
+    CHAT_MODEL,
+    FAKE_LLM_FIRST_TOKEN_DELAY,
+    FAKE_LLM_TOKEN_DELAY,
+)
+
+Message = Union[str, types.Part, List[Union[str, types.Part]]]
+
+DEFAULT_FAKE_SCRIPT: Dict[str, Any] = {
+    # first rule whose pattern matches the user message decides the function calls
+    "rules": [
+        {
+            "match": "schedule",
+            "calls": [
+                {
+                    "name": "make_schedule",
+                    "args": {"courses": ["CS 100", "MATH 111"], "max_days": 5},
+                }
+            ],
+        },
+        {
+            "match": ".*",
+            "calls": [
+                {"name": "course_query", "args": {"query": "{message}", "top_n": 5}},
+                {"name": "get_term", "args": {}},
+            ],
+        },
+    ],
+    "reply": "Here are some courses that match what you are looking for. "
+    "Let me know if you want more details about any of them or a schedule.",
+    # fault injection for the model-call resilience layer: share of streams that fail
+    # before their first chunk, and of streams that stall for stall_seconds first
+    "error_rate": 0.0,
+    "stall_rate": 0.0,
+    "stall_seconds": 10.0,
+}
+
+
+class ModelBackend:
+    def create_chat(
+        self,
+        system_instruction: str,
+        tools: List[Callable],
+        history: List[types.Content],
+        automatic_function_calling: bool,
+    ):
+        """Returns a chat with send_message, send_message_stream and _curated_history."""
+        raise NotImplementedError
+
+    def upload_file(self, data: bytes, mime_type: str) -> Dict[str, Any]:
+        """Uploads data, returns its uri, mime_type and expires_at (epoch seconds or None)."""
+        raise NotImplementedError
+
+
+class GeminiBackend(ModelBackend):
+    def __init__(self, model: str = CHAT_MODEL):
+        self.model = model
+        self.client = c.get_genai_client()
+
+    def create_chat(
+        self, system_instruction, tools, history, automatic_function_calling
+    ):
+        return self.client.chats.create(
+            model=self.model,
+            config=types.GenerateContentConfig(
+                system_instruction=system_instruction,
+                tools=tools,
+                automatic_function_calling=types.AutomaticFunctionCallingConfig(
+                    disable=not automatic_function_calling
+                ),
+            ),
+            history=history,
+        )
+
+    def upload_file(self, data, mime_type):
+        file = self.client.files.upload(
+            file=io.BytesIO(data), config=types.UploadFileConfig(mime_type=mime_type)
+        )
+        return {
+            "uri": file.uri,
+            "mime_type": file.mime_type or mime_type,
+            "expires_at": (
+                file.expiration_time.timestamp() if file.expiration_time else None
+            ),
+        }
+
+
+class FakeChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeChat:
+    """
+    Mimics the parts of google.genai's Chat used by the chatbot. A user message is
+    answered with the scripted function calls, function responses and messages without
+    scripted calls with the reply text.
+    """
+
+    def __init__(
+        self,
+        script: Dict[str, Any],
+        tools: List[Callable],
+        history: List[types.Content],
+        automatic_function_calling: bool,
+        token_delay: float,
+        first_token_delay: float,
+    ):
+        self.script = script
+        self.tool_map = {f.__name__: f for f in tools}
+        self._curated_history = list(history)
+        self.automatic_function_calling = automatic_function_calling
+        self.token_delay = token_delay
+        self.first_token_delay = first_token_delay
+
+    def _user_content(self, message: Message) -> types.Content:
+        items = message if isinstance(message, list) else [message]
+        parts = [types.Part(text=i) if isinstance(i, str) else i for i in items]
+        return types.Content(role="user", parts=parts)
+
+    def _scripted_calls(self, text: str) -> List[types.Part]:
+        for rule in self.script["rules"]:
+            if re.search(rule["match"], text, re.IGNORECASE):
+                calls = json.loads(
+                    json.dumps(rule["calls"]).replace(
+                        "{message}", json.dumps(text)[1:-1]
+                    )
+                )
+                return [
+                    types.Part.from_function_call(name=call["name"], args=call["args"])
+                    for call in calls
+                ]
+        return []
+
+    def _inject_faults(self) -> None:
+        if random.random() < self.script.get("error_rate", 0):
+            raise ConnectionError("Fake model error")
+        if random.random() < self.script.get("stall_rate", 0):
+            time.sleep(self.script.get("stall_seconds", 10))
+
+    def _reply_tokens(self) -> Iterator[str]:
+        time.sleep(self.first_token_delay)
+        for i, word in enumerate(self.script["reply"].split(" ")):
+            if i:
+                time.sleep(self.token_delay)
+            yield word if i == 0 else " " + word
+
+    def send_message_stream(self, message: Message) -> Iterator[FakeChunk]:
+        user_content = self._user_content(message)
+        user_text = " ".join(p.text for p in user_content.parts if p.text)
+
+        # like the real chat, history is only recorded once the stream is consumed
+        def stream():
+            self._inject_faults()
+            # a message without scripted calls (or with function responses) gets the reply
+            model_parts = self._scripted_calls(user_text) if user_text else []
+            if model_parts:
+                time.sleep(self.first_token_delay)
+            else:
+                text = ""
+                for token in self._reply_tokens():
+                    text += token
+                    yield FakeChunk(token)
+                model_parts = [types.Part(text=text)]
+            self._curated_history += [
+                user_content,
+                types.Content(role="model", parts=model_parts),
+            ]
+
+        return stream()
+
+    def send_message(self, message: Message) -> FakeResponse:
+        """Non-streaming call, runs the scripted tools itself like automatic function calling."""
+        user_content = self._user_content(message)
+        user_text = " ".join(p.text for p in user_content.parts if p.text)
+        calls = self._scripted_calls(user_text)
+        if not calls:
+            text = "".join(self._reply_tokens())
+            self._curated_history += [
+                user_content,
+                types.Content(role="model", parts=[types.Part(text=text)]),
+            ]
+            return FakeResponse(text)
+
+        self._curated_history += [
+            user_content,
+            types.Content(role="model", parts=calls),
+        ]
+
+        responses = []
+        for part in calls:
+            call = part.function_call
+            responses.append(
+                types.Part.from_function_response(
+                    name=call.name, response=self._run_tool(call.name, call.args)
+                )
+            )
+        text = "".join(self._reply_tokens())
+        self._curated_history += [
+            types.Content(role="user", parts=responses),
+            types.Content(role="model", parts=[types.Part(text=text)]),
+        ]
+        return FakeResponse(text)
+
+    def _run_tool(self, name: str, args: Dict[str, Any]) -> Any:
+        from backend.functions import TOOL_ARG_MODELS
+
+        tool = self.tool_map[name]
+        if name in TOOL_ARG_MODELS:
+            return tool(TOOL_ARG_MODELS[name](**args))
+        return tool()
+
+
+class FakeBackend(ModelBackend):
+    def __init__(
+        self,
+        script: Optional[Dict[str, Any]] = None,
+        token_delay: float = FAKE_LLM_TOKEN_DELAY,
+        first_token_delay: float = FAKE_LLM_FIRST_TOKEN_DELAY,
+    ):
+        self.script = script or DEFAULT_FAKE_SCRIPT
+        self.token_delay = token_delay
+        self.first_token_delay = first_token_delay
+        # uploaded files by uri, they never expire
+        self.files: Dict[str, bytes] = {}
+
+    @classmethod
+    def from_file(cls, path: Optional[str]) -> "FakeBackend":
+        if not path:
+            return cls()
+        with open(path, "r", encoding="utf-8") as f:
+            return cls({**DEFAULT_FAKE_SCRIPT, **json.load(f)})
+
+    def create_chat(
+        self, system_instruction, tools, history, automatic_function_calling
+    ):
+        return FakeChat(
+            self.script,
+            tools,
+            history,
+            automatic_function_calling,
+            self.token_delay,
+            self.first_token_delay,
+        )
+
+    def upload_file(self, data, mime_type):
+        uri = f"fake://files/{hashlib.sha256(data).hexdigest()}"
+        self.files[uri] = data
+        return {"uri": uri, "mime_type": mime_type, "expires_at": None}
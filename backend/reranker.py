@@ -0,0 +1,147 @@
+"""
+Staged cross-encoder reranking for course_query.
+
+Scoring all 500 bi-encoder candidates with the cross-encoder dominates chat latency on
+CPU. Instead, select_candidates sizes the candidate set from top_n and from how close
+the candidates are to the top_n-th one, and rerank scores it in batches in bi-encoder
+order, stopping once a whole batch scores well below the current top_n. Scores are
+cached per (query, course), so repeated and paged searches skip the model.
+
+backend/benchmarks/rerank_eval.py measures recall against full reranking for these
+settings.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence
+
+from backend import metrics
+from backend.constants import (
+    RERANK_BATCH_SIZE,
+    RERANK_CACHE_SIZE,
+    RERANK_CANDIDATES_PER_RESULT,
+    RERANK_MAX_CANDIDATES,
+    RERANK_MIN_CANDIDATES,
+    RERANK_SIMILARITY_MARGIN,
+    RERANK_STOP_MARGIN,
+)
+from backend.inference import score_pairs
+from backend.tool_cache import normalize_text
+
+
+class ScoreCache:
+    """Thread-safe LRU of cross-encoder scores."""
+
+    def __init__(self, max_entries: int = RERANK_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._scores: OrderedDict[Hashable, float] = OrderedDict()
+
+    def get_many(self, keys: Sequence[Hashable]) -> List[Optional[float]]:
+        with self._lock:
+            scores = []
+            for key in keys:
+                score = self._scores.get(key)
+                if score is not None:
+                    self._scores.move_to_end(key)
+                scores.append(score)
+        return scores
+
+    def put_many(self, items: Dict[Hashable, float]) -> None:
+        with self._lock:
+            self._scores.update(items)
+            for key in items:
+                self._scores.move_to_end(key)
+            while len(self._scores) > self.max_entries:
+                self._scores.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._scores.clear()
+
+
+SCORE_CACHE = ScoreCache()
+
+
+def select_candidates(
+    candidates: List[Dict[str, Any]],
+    top_n: int,
+    min_candidates: int = RERANK_MIN_CANDIDATES,
+    per_result: int = RERANK_CANDIDATES_PER_RESULT,
+    max_candidates: int = RERANK_MAX_CANDIDATES,
+    similarity_margin: float = RERANK_SIMILARITY_MARGIN,
+) -> List[Dict[str, Any]]:
+    """
+    Picks the candidates worth reranking from bi-encoder results sorted by init_distance.
+    When many candidates are about as close as the top_n-th (a vague query), more of them
+    are kept, up to max_candidates.
+    """
+    count = min(max_candidates, max(min_candidates, per_result * top_n))
+    if len(candidates) <= count:
+        return candidates
+
+    # init_distance is 2 - 2 * cosine similarity
+    threshold = (
+        candidates[min(top_n, len(candidates)) - 1]["init_distance"]
+        + 2 * similarity_margin
+    )
+    while (
+        count < min(max_candidates, len(candidates))
+        and candidates[count]["init_distance"] <= threshold
+    ):
+        count += 1
+    return candidates[:count]
+
+
+def rerank(
+    query: str,
+    candidates: List[Dict[str, Any]],
+    top_n: int,
+    batch_size: int = RERANK_BATCH_SIZE,
+    stop_margin: Optional[float] = RERANK_STOP_MARGIN,
+    cache: Optional[ScoreCache] = SCORE_CACHE,
+    score_fn: Callable[[List[List[str]]], List[float]] = score_pairs,
+) -> List[Dict[str, Any]]:
+    """
+    Scores candidates (in bi-encoder order) with the cross-encoder batch by batch and
+    returns the scored ones, best first, each with a "score". Stops after a batch whose
+    best score is more than stop_margin below the top_n-th score so far, candidates
+    further down the bi-encoder ranking are unlikely to do better. A stop_margin of
+    None scores every candidate.
+    """
+    start = time.perf_counter()
+    query_key = normalize_text(query)
+    scored: List[Dict[str, Any]] = []
+    computed = 0
+
+    for offset in range(0, len(candidates), batch_size):
+        batch = candidates[offset : offset + batch_size]
+        keys = [(query_key, item["id"], hash(item["document"])) for item in batch]
+        scores = cache.get_many(keys) if cache else [None] * len(batch)
+
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            new_scores = score_fn([[query, batch[i]["document"]] for i in missing])
+            for i, score in zip(missing, new_scores):
+                scores[i] = score
+            if cache:
+                cache.put_many({keys[i]: scores[i] for i in missing})
+            computed += len(missing)
+
+        scored += [{**item, "score": score} for item, score in zip(batch, scores)]
+
+        is_last = offset + batch_size >= len(candidates)
+        if stop_margin is not None and not is_last and len(scored) >= top_n:
+            nth_best = sorted((item["score"] for item in scored), reverse=True)[
+                top_n - 1
+            ]
+            if max(scores) < nth_best - stop_margin:
+                metrics.incr("rerank.early_stops")
+                break
+
+    metrics.incr("rerank.pairs_scored", computed)
+    metrics.incr("rerank.pairs_cached", len(scored) - computed)
+    metrics.observe("rerank.seconds", time.perf_counter() - start)
+    scored.sort(key=lambda item: item["score"], reverse=True)
+    return scored
@@ -0,0 +1,266 @@
+"""
+Deadlines, retries, hedging and circuit breaking for model calls.
+
+ResilientChat wraps the chat of a backend from get_model_backend() and streams messages
+through it:
+
+- the first chunk has to arrive within MODEL_FIRST_CHUNK_TIMEOUT, later chunks within
+  MODEL_STREAM_IDLE_TIMEOUT of each other and the whole stream within MODEL_CALL_TIMEOUT
+- if the first chunk is later than the p95 of recent first chunks, the message is sent
+  again on a new chat created from the same history and the first to answer is used
+- transient errors before the first chunk are retried with jittered backoff
+- after MODEL_BREAKER_FAILURES failed calls in a row, calls fail fast for
+  MODEL_BREAKER_RESET_SECONDS, then a single trial call is let through
+
+Failures are raised as ModelUnavailable, whose message is meant for the user.
+"""
+
+import asyncio
+import random
+import time
+from concurrent.futures import Executor
+from typing import Any, AsyncIterator, Callable, List, Optional
+
+import httpx
+from google.genai import types
+
+from backend import constants as c
+from backend import metrics
+from backend.constants import (
+    MODEL_BREAKER_FAILURES,
+    MODEL_BREAKER_RESET_SECONDS,
+    MODEL_CALL_TIMEOUT,
+    MODEL_FIRST_CHUNK_TIMEOUT,
+    MODEL_HEDGE,
+    MODEL_HEDGE_DEFAULT_DELAY,
+    MODEL_HEDGE_MIN_DELAY,
+    MODEL_MAX_RETRIES,
+    MODEL_RETRY_BACKOFF,
+    MODEL_STREAM_IDLE_TIMEOUT,
+)
+from backend.streaming import iterate_in_thread
+
+# HTTP statuses worth retrying
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+# first-chunk timings needed before the hedge delay follows the observed p95
+HEDGE_MIN_SAMPLES = 20
+FIRST_CHUNK_TIMING = "model.first_chunk_seconds"
+
+UNAVAILABLE_MESSAGE = (
+    "Sorry, the assistant is temporarily unavailable. Please try again in a minute."
+)
+INTERRUPTED_MESSAGE = (
+    "\n\nSorry, the response was interrupted. Please send your message again."
+)
+
+_EMPTY = object()
+
+
+class ModelUnavailable(Exception):
+    pass
+
+
+def is_transient(error: BaseException) -> bool:
+    if isinstance(error, (TimeoutError, ConnectionError, httpx.TransportError)):
+        return True
+    # google.genai.errors.APIError carries the HTTP status as code
+    return getattr(error, "code", None) in TRANSIENT_STATUS_CODES
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` failures in a row. Used from the event loop only."""
+
+    def __init__(
+        self,
+        failure_threshold: int = MODEL_BREAKER_FAILURES,
+        reset_seconds: float = MODEL_BREAKER_RESET_SECONDS,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            # half open: let one call through, the next one waits another reset period
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                print(f"Model circuit opened after {self.failures} failures")
+                metrics.incr("model.circuit_opened")
+            self.opened_at = time.monotonic()
+
+
+MODEL_BREAKER = CircuitBreaker()
+metrics.register_gauge("model.circuit_open", lambda: int(MODEL_BREAKER.is_open))
+
+
+def hedge_delay() -> float:
+    if metrics.timing_count(FIRST_CHUNK_TIMING) < HEDGE_MIN_SAMPLES:
+        return MODEL_HEDGE_DEFAULT_DELAY
+    return max(MODEL_HEDGE_MIN_DELAY, metrics.percentile(FIRST_CHUNK_TIMING, 95))
+
+
+class _Attempt:
+    """One send of a message on one chat, consumed in a model executor thread."""
+
+    def __init__(self, chat: Any, message: Any, executor: Executor):
+        self.chat = chat
+        self.started = time.monotonic()
+
+        def stream():
+            yield from chat.send_message_stream(message)
+
+        self.chunks = iterate_in_thread(stream(), executor).__aiter__()
+        self.first = asyncio.ensure_future(self._first())
+
+    async def _first(self) -> Any:
+        try:
+            return await self.chunks.__anext__()
+        except StopAsyncIteration:
+            return _EMPTY
+
+    async def close(self) -> None:
+        # the worker thread stops at its next chunk
+        if not self.first.done():
+            self.first.cancel()
+            await asyncio.wait({self.first})
+        await self.chunks.aclose()
+
+
+class ResilientChat:
+    def __init__(
+        self,
+        create_chat: Callable[[List[types.Content]], Any],
+        history: List[types.Content],
+        breaker: CircuitBreaker = MODEL_BREAKER,
+        executor: Optional[Executor] = None,
+        hedge: bool = MODEL_HEDGE,
+        hedge_after: Optional[float] = None,
+        max_retries: int = MODEL_MAX_RETRIES,
+        first_chunk_timeout: float = MODEL_FIRST_CHUNK_TIMEOUT,
+        idle_timeout: float = MODEL_STREAM_IDLE_TIMEOUT,
+        call_timeout: float = MODEL_CALL_TIMEOUT,
+    ):
+        self.create_chat = create_chat
+        self.chat = create_chat(history)
+        self.breaker = breaker
+        self.executor = executor or c.get_model_executor()
+        self.hedge = hedge
+        # fixed hedge delay, by default it follows the observed first-chunk p95
+        self.hedge_after = hedge_after
+        self.max_retries = max_retries
+        self.first_chunk_timeout = first_chunk_timeout
+        self.idle_timeout = idle_timeout
+        self.call_timeout = call_timeout
+
+    @property
+    def history(self) -> List[types.Content]:
+        return self.chat._curated_history
+
+    async def _first_chunk(self, message: Any) -> _Attempt:
+        """Starts the message, hedging it if needed, and returns the first attempt to answer."""
+        loop = asyncio.get_running_loop()
+        # the chat only records the message once its stream is consumed
+        history = list(self.chat._curated_history)
+        primary = _Attempt(self.chat, message, self.executor)
+        attempts = [primary]
+        deadline = loop.time() + self.first_chunk_timeout
+        delay = self.hedge_after if self.hedge_after is not None else hedge_delay()
+        hedge_at = loop.time() + delay if self.hedge else float("inf")
+        error: Optional[BaseException] = None
+
+        try:
+            while attempts:
+                timeout = min(deadline, hedge_at) - loop.time()
+                done, _ = await asyncio.wait(
+                    {a.first for a in attempts},
+                    timeout=max(0.0, timeout),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    if loop.time() >= deadline:
+                        raise TimeoutError(
+                            f"No response within {self.first_chunk_timeout}s"
+                        )
+                    metrics.incr("model.hedged")
+                    attempts.append(
+                        _Attempt(self.create_chat(history), message, self.executor)
+                    )
+                    hedge_at = float("inf")
+                    continue
+
+                for attempt in [a for a in attempts if a.first in done]:
+                    if attempt.first.exception() is None:
+                        attempts.remove(attempt)
+                        if attempt is not primary:
+                            metrics.incr("model.hedge_won")
+                        return attempt
+                    error = attempt.first.exception()
+                    attempts.remove(attempt)
+                    await attempt.close()
+            raise error
+        finally:
+            for attempt in attempts:
+                await attempt.close()
+
+    async def send_message_stream(self, message: Any) -> AsyncIterator[Any]:
+        """Yields the chunks of the model's answer, raises ModelUnavailable on failure."""
+        for retry in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                metrics.incr("model.circuit_rejected")
+                raise ModelUnavailable(UNAVAILABLE_MESSAGE)
+            try:
+                attempt = await self._first_chunk(message)
+                break
+            except Exception as e:
+                print(f"Model call failed: {e!r}")
+                metrics.incr("model.errors")
+                if not is_transient(e):
+                    raise ModelUnavailable(UNAVAILABLE_MESSAGE) from e
+                self.breaker.record_failure()
+                if retry == self.max_retries:
+                    raise ModelUnavailable(UNAVAILABLE_MESSAGE) from e
+                metrics.incr("model.retries")
+                await asyncio.sleep(
+                    MODEL_RETRY_BACKOFF * 2**retry * random.uniform(0.5, 1.5)
+                )
+
+        metrics.observe(FIRST_CHUNK_TIMING, time.monotonic() - attempt.started)
+        self.chat = attempt.chat
+        deadline = attempt.started + self.call_timeout
+        try:
+            chunk = attempt.first.result()
+            while chunk is not _EMPTY:
+                yield chunk
+                timeout = min(self.idle_timeout, deadline - time.monotonic())
+                try:
+                    chunk = await asyncio.wait_for(
+                        attempt.chunks.__anext__(), max(0.0, timeout)
+                    )
+                except StopAsyncIteration:
+                    break
+        except Exception as e:
+            print(f"Model stream failed: {e!r}")
+            metrics.incr("model.errors")
+            if is_transient(e):
+                self.breaker.record_failure()
+            raise ModelUnavailable(INTERRUPTED_MESSAGE) from e
+        finally:
+            await attempt.close()
+        self.breaker.record_success()
@@ -1,7 +1,9 @@
 import os
+import json
 import threading
 import time
-from backend.scrapers.courses import scrape_courses
+from backend.constants import COURSE_UPDATES_CHANNEL
+from backend.scrapers.courses import scrape_courses, write_course_data_file
 from backend.scrapers.rmp import check_all_lecturers
 from backend.scrapers.constants import (
     TERM_FILE_PATH,
@@ -9,8 +11,12 @@ from backend.scrapers.constants import (
     REDIS,
     LECTURER_DATA,
     COURSE_DATA,
+    COURSE_FILE_DUMP_SECONDS,
 )
 
+# set when Redis has course changes the JSON file doesn't have yet
+COURSE_FILE_STALE = threading.Event()
+
 
 
 def run_course_scraper():
@@ -26,8 +32,13 @@ def run_course_scraper():
 
                 if term:
                     logger.info(f"--- Starting course scrape for term: {term} ---")
-                    scrape_courses(term, sections=True)
-                    REDIS.publish("course_updates", "refresh")
+                    changes = scrape_courses(term, sections=True)
+                    if changes is None:
+                        REDIS.publish(COURSE_UPDATES_CHANNEL, "refresh")
+                        COURSE_FILE_STALE.set()
+                    elif changes["courses"]:
+                        REDIS.publish(COURSE_UPDATES_CHANNEL, json.dumps(changes))
+                        COURSE_FILE_STALE.set()
                     logger.info(
                         "--- Course scrape finished. Sleeping for 5 minutes. ---"
                     )
@@ -38,6 +49,21 @@ def run_course_scraper():
             logger.error(f"Error in Course Scraper: {e}")
 
 
+def run_course_file_dump():
+    print('starting course file dump')
+    while True:
+        time.sleep(COURSE_FILE_DUMP_SECONDS)
+        if not COURSE_FILE_STALE.is_set():
+            continue
+        try:
+            COURSE_FILE_STALE.clear()
+            write_course_data_file()
+            logger.info("--- Course data file written. ---")
+        except Exception as e:
+            COURSE_FILE_STALE.set()
+            logger.error(f"Error in Course File Dump: {e}")
+
+
 def run_lecturer_check():
     print('starting lecturer check')
     while True:
@@ -56,12 +82,14 @@ def start_background_scrapers():
     # Create the thread objects
     thread1 = threading.Thread(target=run_course_scraper, daemon=True)
     thread2 = threading.Thread(target=run_lecturer_check, daemon=True)
+    thread3 = threading.Thread(target=run_course_file_dump, daemon=True)
 
     # Start the threads
     thread1.start()
     thread2.start()
+    thread3.start()
 
-    logger.info("Both scrapers are running in the background...")
+    logger.info("Scrapers and the course file dump are running in the background...")
 
 
 if __name__ == "__main__":
@@ -47,3 +47,25 @@ DEFAULT_RATING = {
     "last_updated": 0,
 }
 CACHE_EXPIRATION_SECONDS = 5 * 60 * 60  # 5 hours
+
+# Section scraper: subjects are fetched by SECTION_SCRAPER_WORKERS threads that together
+# send at most SECTION_REQUESTS_PER_SECOND requests (0 disables the limit)
+SECTION_SCRAPER_WORKERS = int(os.getenv("SECTION_SCRAPER_WORKERS", "8"))
+SECTION_REQUESTS_PER_SECOND = float(os.getenv("SECTION_REQUESTS_PER_SECOND", "10"))
+SECTION_REQUEST_TIMEOUT = float(os.getenv("SECTION_REQUEST_TIMEOUT", "30"))
+# each response is parsed by SECTION_PARSER_WORKERS threads as soon as it arrives, at most
+# SECTION_PIPELINE_DEPTH subjects are fetched but not yet applied at any moment
+SECTION_PARSER_WORKERS = int(os.getenv("SECTION_PARSER_WORKERS", "2"))
+SECTION_PIPELINE_DEPTH = int(os.getenv("SECTION_PIPELINE_DEPTH", "16"))
+
+# Course descriptions are parsed into requisite trees by DESCRIPTION_PROCESS_MODEL, results
+# are cached in the DESCRIPTION_CACHE_KEY Redis hash by description and prompt version,
+# bulk runs send at most DESCRIPTION_PROCESS_WORKERS concurrent requests
+DESCRIPTION_PROCESS_MODEL = os.getenv("DESCRIPTION_PROCESS_MODEL", "gemini-2.5-pro")
+DESCRIPTION_PROCESS_WORKERS = int(os.getenv("DESCRIPTION_PROCESS_WORKERS", "4"))
+DESCRIPTION_CACHE_KEY = "description_cache"
+# descriptions with simple prerequisites are parsed by rules instead of the model
+PREREQ_RULES = os.getenv("PREREQ_RULES", "1") == "1"
+# the section scraper only writes changed courses to Redis, the JSON course data file is
+# rewritten at most this often
+COURSE_FILE_DUMP_SECONDS = int(os.getenv("COURSE_FILE_DUMP_SECONDS", str(60 * 60)))
@@ -5,20 +5,48 @@ import random
 import time
 import argparse
 import dotenv
-from google import genai
 from google.genai import types
 import os
 import base64
-from typing import Dict, List, Optional, Any, Union
+import copy
+import threading
+from typing import Dict, Iterable, List, Optional, Any, Union
 from backend.scrapers.rmp import sync_lecturer_rating
+from backend.scrapers.rate_limit import RateLimiter
+from backend.scrapers.pipeline import run_pipeline
+from backend.scrapers.parsing import parse_catalog_html, parse_sections_html
+from backend.scrapers.description_cache import (
+    DescriptionCache,
+    process_descriptions,
+    prompt_version,
+)
+from backend.scrapers.prereq_rules import parse_description
+from backend.scrapers.deltas import term_section_events
+from backend.functions import update_redis_course_data
 from backend.scrapers.constants import (
     DESCRIPTION_PROCESS_PROMPT_FILE,
     logger,
     COURSE_DATA,
     set_redis_course_data,
     CourseStructureModel,
+    SECTION_SCRAPER_WORKERS,
+    SECTION_REQUESTS_PER_SECOND,
+    SECTION_REQUEST_TIMEOUT,
+    SECTION_PARSER_WORKERS,
+    SECTION_PIPELINE_DEPTH,
+    DESCRIPTION_PROCESS_MODEL,
+    DESCRIPTION_PROCESS_WORKERS,
+    DESCRIPTION_CACHE_KEY,
+    PREREQ_RULES,
+)
+from backend.types import CourseInfoModel
+from pydantic import ValidationError
+from backend.constants import (
+    COURSE_DATA_FILE,
+    get_genai_client,
+    get_http_session,
+    read_prompt,
 )
-from backend.constants import COURSE_DATA_FILE
 
 dotenv.load_dotenv()
 
@@ -36,13 +64,16 @@ links = [
     "https://catalog.njit.edu/undergraduate/management/#coursestext",
 ]
 semesters = {"10": "Spring", "95": "Winter", "90": "Fall", "50": "Summer"}
+# held while a section scrape swaps a course record into COURSE_DATA and while the JSON
+# file dump copies it, never across network I/O
+COURSE_DATA_LOCK = threading.Lock()
 
 
 def get_individual_course(course_code: str) -> Dict[str, Any]:
     url = f"https://catalog.njit.edu/search/?P={course_code}"
     course_obj = {"desc": "No Description", "title": "Unkown"}
     try:
-        response = requests.get(url, timeout=5)
+        response = get_http_session().get(url, timeout=5)
         if response.status_code == 200:
             soup = BeautifulSoup(response.text, "html.parser")
             target_header = soup.find("div", class_="search-courseresult")
@@ -63,34 +94,35 @@ def get_individual_course(course_code: str) -> Dict[str, Any]:
         return course_obj
 
 
-def process_single_description(description: str) -> Union[Dict[str, Any], None, dict]:
+def no_requisites() -> Dict[str, Any]:
+    return {
+        "prereq_tree": None,
+        "coreq_tree": None,
+        "restrictions": [],
+    }
+
+
+def parse_description_with_model(
+    description: str,
+) -> Union[Dict[str, Any], None, dict]:
     """
     Takes a single course description, queries the Gemini model using the prompt template,
     and returns the parsed JSON output.
     """
 
-    if description.lower() in ("", "no description"):
-        return {
-            "prereq_tree": None,
-            "coreq_tree": None,
-            "restrictions": [],
-        }
-
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         logger.error("GEMINI_API_KEY environment variable is not set.")
         return None
 
-    client = genai.Client(api_key=api_key)
-
-    with open(DESCRIPTION_PROCESS_PROMPT_FILE, "r", encoding="utf-8") as f:
-        prompt_template = f.read()
+    client = get_genai_client()
+    prompt_template = read_prompt(DESCRIPTION_PROCESS_PROMPT_FILE)
 
     final_prompt = prompt_template + "\n INPUT: " + description
 
     try:
         response = client.models.generate_content(
-            model="gemini-2.5-pro",
+            model=DESCRIPTION_PROCESS_MODEL,
             contents=final_prompt,
             config=types.GenerateContentConfig(response_mime_type="application/json"),
         )
@@ -113,6 +145,57 @@ def process_single_description(description: str) -> Union[Dict[str, Any], None,
         return {}
 
 
+# parsed descriptions, shared by the scraper runs and processes
+DESCRIPTION_CACHE = DescriptionCache(DESCRIPTION_CACHE_KEY)
+
+
+def process_course_descriptions(
+    descriptions: Iterable[str],
+) -> Dict[str, Union[Dict[str, Any], None, dict]]:
+    """
+    Parses many descriptions: empty ones, ones the prerequisite rules understand and
+    cache hits skip the model, the distinct misses are sent to it
+    DESCRIPTION_PROCESS_WORKERS at a time.
+    """
+    descriptions = list(descriptions)
+    results = {
+        d: no_requisites()
+        for d in descriptions
+        if d.lower() in ("", "no description")
+    }
+    if PREREQ_RULES:
+        # simple requisites are parsed by rules, the rest falls back to the model
+        for d in descriptions:
+            if d not in results:
+                parsed = parse_description(d)
+                if parsed is not None:
+                    results[d] = parsed
+    version = prompt_version(
+        read_prompt(DESCRIPTION_PROCESS_PROMPT_FILE), DESCRIPTION_PROCESS_MODEL
+    )
+    misses = [d for d in descriptions if d not in results]
+    start = time.perf_counter()
+    results.update(
+        process_descriptions(
+            misses,
+            parse_description_with_model,
+            DESCRIPTION_CACHE,
+            version,
+            workers=DESCRIPTION_PROCESS_WORKERS,
+        )
+    )
+    if len(misses) > 1:
+        logger.info(
+            f"Processed {len(misses)} descriptions in {time.perf_counter() - start:.2f}s"
+        )
+    return results
+
+
+def process_single_description(description: str) -> Union[Dict[str, Any], None, dict]:
+    """Returns the parsed requisites of a description, from the cache when possible."""
+    return process_course_descriptions([description])[description]
+
+
 # ===== SECTION SCRAPER FUNCTIONS =====
 def pb_encode(s: str) -> str:
     """
@@ -168,7 +251,9 @@ def fetch_courses(
     }
 
     try:
-        response = requests.get(url, params=encoded_params, headers=headers)
+        response = get_http_session().get(
+            url, params=encoded_params, headers=headers, timeout=SECTION_REQUEST_TIMEOUT
+        )
         response.raise_for_status()
         # Parse JSON if successful
         return response.json()
@@ -216,7 +301,9 @@ def fetch_subj_list(
     }
 
     try:
-        response = requests.get(url, params=encoded_params, headers=headers)
+        response = get_http_session().get(
+            url, params=encoded_params, headers=headers, timeout=SECTION_REQUEST_TIMEOUT
+        )
         response.raise_for_status()
         # Parse JSON if successful
         return response.json()
@@ -227,173 +314,167 @@ def fetch_subj_list(
         return None
 
 
-def run_section_scraper(term: str) -> Dict[str, Any]:
-    """Run the section scraper to fetch course data from the API and return as dict"""
-    logger.info("STEP 1: Running Section Scraper")
+# shared by all requests of the section scraper
+SECTION_RATE_LIMIT = RateLimiter(SECTION_REQUESTS_PER_SECOND)
+
+
+def fetch_subject(subject: str, term: str) -> Optional[Any]:
+    """Fetches one subject's sections within the shared rate limit, logging the time."""
+    waited = SECTION_RATE_LIMIT.acquire()
+    start = time.perf_counter()
+    try:
+        response_data = fetch_courses(subject, term, max_results="500")
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error fetching courses for {subject}: {e}")
+        response_data = None
+    logger.info(
+        f"Fetched courses for {subject} in {time.perf_counter() - start:.2f}s "
+        f"(waited {waited:.2f}s for the rate limit)"
+    )
+    return response_data
 
-    # Load subjects
-    # fetch list of subjects from api
-    subjects_list = fetch_subj_list(term)
-    final_data = {}
 
-    for item in subjects_list:
-        subj = item.get("SUBJECT")
-        if subj:
-            logger.info(f"Fetching courses for {subj}...")
-            # fetch courses for specific subject
-            response_data = fetch_courses(subj, term, max_results="500")
+def fetch_subject_list(term: str) -> List[str]:
+    SECTION_RATE_LIMIT.acquire()
+    subjects_list = fetch_subj_list(term) or []
+    return [item.get("SUBJECT") for item in subjects_list if item.get("SUBJECT")]
 
-            final_data[subj] = response_data
 
-            time.sleep(0.2)
+def run_section_pipeline(term: str) -> Dict[str, int]:
+    """
+    Fetch, parse and apply the sections of every subject as a stream: each response is
+    parsed as soon as it arrives and its courses are applied to COURSE_DATA right away,
+    so only SECTION_PIPELINE_DEPTH responses are held in memory at once.
+    """
+    logger.info("Running section scraper and parser")
+    start = time.perf_counter()
+    subjects = fetch_subject_list(term)
+
+    def parse(subject: str, response_data: Any) -> List[Dict[str, Any]]:
+        parse_start = time.perf_counter()
+        parsed = parse_subject_sections(response_data)
+        logger.debug(
+            f"Parsed {len(parsed)} courses for {subject} "
+            f"in {time.perf_counter() - parse_start:.2f}s"
+        )
+        return parsed
 
-    logger.info(f"Section scraper complete. Fetched {len(final_data)} subjects")
-    return final_data
+    def apply(subject: str, parsed: List[Dict[str, Any]]) -> None:
+        if not parsed:
+            logger.warning(f"No section data for {subject}, skipping")
+            return
+        apply_sections(parsed, term)
+
+    def on_error(subject: str, error: BaseException) -> None:
+        logger.error(f"Error processing sections for {subject}: {error}")
+
+    stats = run_pipeline(
+        subjects,
+        fetch=lambda subject: fetch_subject(subject, term),
+        parse=parse,
+        apply=apply,
+        fetch_workers=SECTION_SCRAPER_WORKERS,
+        parse_workers=SECTION_PARSER_WORKERS,
+        depth=SECTION_PIPELINE_DEPTH,
+        on_error=on_error,
+    )
+    logger.info(
+        f"Section scraper complete. Processed {stats['applied']} of {len(subjects)} "
+        f"subjects in {time.perf_counter() - start:.2f}s"
+    )
+    return stats
 
 
 # ===== MAIN PARSER FUNCTIONS =====
 
 
-def extract_sections_from_html(html_content: str, term: str) -> None:
-    """Extract all course sections from HTML content by finding h4 elements and their following tables"""
-    try:
-        soup = BeautifulSoup(html_content, "html.parser")
+def parse_subject_sections(response_data: Any) -> List[Dict[str, Any]]:
+    """Parse the courses of one subject's section response"""
+    if not response_data:
+        return []
+    courses = []
+    # If it's already a dict, look for HTML content in values
+    for value in response_data[0].values():
+        if isinstance(value, str) and ("<h4" in value):
+            courses.extend(parse_sections_html(value))
+    return courses
+
+
+def apply_sections(courses: List[Dict[str, Any]], term: str) -> None:
+    """Apply parsed courses of a term to COURSE_DATA"""
+    for course in courses:
+        course_id = course["course_id"]
+        sections = course["sections"]
+        header = course["header"]
+
+        # edit a plain copy and swap it in, the file dump may hold the old record
+        existing = COURSE_DATA.get(course_id)
+        if isinstance(existing, CourseInfoModel):
+            existing = existing.model_dump()
+        elif existing is not None:
+            existing = copy.deepcopy(existing)
+
+        # Check for lecturer change or new section
+        existing_sections = (existing or {}).get("sections", {}).get(term, {})
+        for section_key, td_values in sections.items():
+            new_lecturer = td_values[8]
+            if new_lecturer:
+                # Get existing lecturer for this section if it exists
+                existing_lecturer = None
+                if section_key in existing_sections:
+                    existing_lecturer = existing_sections[section_key][8]
+
+                # if existing_lecturer != new_lecturer:
+                #     sync_lecturer_rating(new_lecturer)
+
+        if existing is None:
+            logger.info(f"New Course Found: {course_id}")
+            # fetch individual course details
+            course_obj = get_individual_course(course_id)
+
+            # process description with ai model
+            course_returns = process_single_description(course_obj["desc"])
+            course_obj.update(course_returns)
+
+            if course_obj["title"] in ("Unkown", ""):
+                course_obj["title"] = header
+            course_obj["sections"] = {}
+            course_obj["sections"][term] = sections
+            existing = course_obj
+        elif "sections" not in existing.keys():
+            existing["sections"] = {}
+
+        if course["honors"] and term in existing["sections"].keys():
+            existing["sections"][term].update(sections)
+        else:
+            existing["sections"][term] = sections
 
-        # Find all h4 elements (each represents a course)
-        h4_elements = soup.find_all("h4")
+        if existing["title"] in ("Unkown", ""):
+            existing["title"] = header
 
-        for h4 in h4_elements:
-            # Extract id from h4
-            course_id = h4.get("id")
-            if not course_id:
-                continue
+        existing["credits"] = course["credits"]
 
-            honors_sections = False
+        if not existing["sections"]:
+            logger.warning(f"{course_id} has no sections")
 
-            header: str = h4.get_text(strip=True)
-            if header.lower().endswith("honors"):
-                honors_sections = True
-                right_dash = header.rfind("-")
-                left_dash = header.find("-")
+        try:
+            record = CourseInfoModel.model_validate(existing)
+        except ValidationError as e:
+            logger.error(f"Invalid course data for {course_id}, not saved: {e}")
+            continue
+        with COURSE_DATA_LOCK:
+            COURSE_DATA[course_id] = record
 
-                header = header[left_dash + 1 : right_dash].strip()
-            else:
-                left_dash = header.find("-")
-                header = header[left_dash + 1 :].strip()
-
-            current = h4.next_sibling
-            table = None
-            num_credits = 0
-
-            while current:
-                if hasattr(current, "name"):
-                    if current.name == "table":
-                        table = current
-                        break
-                current = current.next_sibling
-
-            if table:
-                # Extract sections from this table
-                rows = table.find_all("tr")
-                sections = {}
-
-                # loop each section Skip the first row (header)
-                for row in rows[1:]:
-                    tds = row.find_all("td")
-
-                    # Extract section cloumn info
-                    td_values = []
-                    for i, td in enumerate(tds):
-                        text = ""
-                        # For links, extract the text content
-                        if td.find("a"):
-                            text = td.find("a").get_text(strip=True)
-                        else:
-                            text = td.get_text(strip=True)
-                            # Special handling for rooms column (4th index, 0-based)
-                        if (i == 4 or i == 3) and td.find("br"):
-                            text = td.get_text(separator=", ", strip=True)
-
-                        td_values.append(text)
-                    section_key = td_values[0]
-                    sections[section_key] = td_values
-
-                    # Check for lecturer change or new section
-                    new_lecturer = td_values[8]
-                    if new_lecturer:
-                        # Get existing lecturer for this section if it exists
-                        existing_sections = (
-                            COURSE_DATA.get(course_id, {})
-                            .get("sections", {})
-                            .get(term, {})
-                        )
-                        existing_lecturer = None
-                        if section_key in existing_sections:
-                            existing_lecturer = existing_sections[section_key][8]
-
-                        # if existing_lecturer != new_lecturer:
-                        #     sync_lecturer_rating(new_lecturer)
-
-                    try:
-                        num_credits = float(td_values[-3])
-                    except Exception as e:
-                        num_credits = None
-
-                course_id = course_id.replace("\u00a0", " ")
-                if course_id not in COURSE_DATA.keys():
-                    logger.info(f"New Course Found: {course_id}")
-                    # fetch individual course details
-                    course_obj = get_individual_course(course_id)
-
-                    # process description with ai model
-                    course_returns = process_single_description(course_obj["desc"])
-                    course_obj.update(course_returns)
-
-                    if course_obj["title"] in ("Unkown", ""):
-                        course_obj["title"] = header
-                    course_obj["sections"] = {}
-                    course_obj["sections"][term] = sections
-                    COURSE_DATA[course_id] = course_obj
-                elif "sections" not in COURSE_DATA[course_id].keys():
-                    COURSE_DATA[course_id]["sections"] = {}
-
-                if (
-                    honors_sections
-                    and term in COURSE_DATA[course_id]["sections"].keys()
-                ):
-                    COURSE_DATA[course_id]["sections"][term].update(sections)
-                else:
-                    COURSE_DATA[course_id]["sections"][term] = sections
-
-                if COURSE_DATA[course_id]["title"] in ("Unkown", ""):
-                    COURSE_DATA[course_id]["title"] = header
-
-                COURSE_DATA[course_id]["credits"] = num_credits
-
-                if not COURSE_DATA[course_id]["sections"]:
-                    logger.warning(f"{course_id} has no sections")
 
+def extract_sections_from_html(html_content: str, term: str) -> None:
+    """Extract all course sections from HTML content and apply them to COURSE_DATA"""
+    try:
+        apply_sections(parse_sections_html(html_content), term)
     except Exception as e:
         logger.error(f"Error parsing HTML: {e}")
         return None
 
 
-def run_parser(scraped_data: Dict[str, Any], term: str) -> None:
-    """Run the parser to extract sections from scraped data dict"""
-    logger.info("STEP 2: Running Section Parser")
-    logger.info(f"Extracting sections from {len(scraped_data)} subjects...")
-
-    for course_name, course_data in scraped_data.items():
-        logger.debug(f"Processing {course_name}...")
-        course_data = course_data[0]
-
-        # If it's already a dict, look for HTML content in values
-        for key, value in course_data.items():
-            if isinstance(value, str) and ("<h4" in value):
-                # extract sections from html content
-                extract_sections_from_html(value, term)
-
-
 # == SECTION END==
 
 
@@ -404,31 +485,15 @@ def scrape_undergrad_grad_catalog(url: str) -> None:
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
         }
-        response = requests.get(url, headers=headers, timeout=10)
+        response = get_http_session().get(url, headers=headers, timeout=10)
         response.raise_for_status()
 
-        # print(response.content)
-        soup = BeautifulSoup(response.content, "html.parser")
-        courses = {}
-
-        # Find all course blocks
-        course_blocks = soup.find_all("div", class_="courseblock")
-
-        for block in course_blocks:
-            # Extract title from courseblocktitle
-            title_elem = block.find("p", class_="courseblocktitle")
-            title = title_elem.get_text(strip=True).replace("\u00a0", " ").split(".")
-
-            # Extract description from courseblockdesc
-            desc_elem = block.find("p", class_="courseblockdesc")
-            description = (
-                desc_elem.get_text(strip=True).replace("\u00a0", " ")
-                if desc_elem
-                else ""
-            )
-
-            course_code = title[0].strip()
-            title = title[1].strip()
+        # courses whose description has to be (re)processed, processed together below
+        pending = []
+        for course in parse_catalog_html(response.content):
+            course_code = course["course_code"]
+            title = course["title"]
+            description = course["desc"]
 
             if course_code in COURSE_DATA:
                 course_obj = COURSE_DATA[course_code]
@@ -441,23 +506,67 @@ def scrape_undergrad_grad_catalog(url: str) -> None:
                     logger.info(f"Description changed for {course_code}")
                     course_obj["desc"] = description
                     # update existing course with ai data
-                    course_returns = process_single_description(course_obj["desc"])
-                    course_obj.update(course_returns)
+                    pending.append(course_obj)
             else:
                 course_obj = {"title": title, "desc": description}
                 # process new course description with ai
-                course_returns = process_single_description(description)
-                course_obj.update(course_returns)
+                pending.append(course_obj)
             if "sections" not in course_obj.keys():
                 course_obj["sections"] = {}
             COURSE_DATA[course_code] = course_obj
 
+        course_returns = process_course_descriptions(
+            course_obj["desc"] for course_obj in pending
+        )
+        for course_obj in pending:
+            course_obj.update(course_returns[course_obj["desc"]])
+
         logger.info(f"Found {len(COURSE_DATA)} courses")
 
     except Exception as e:
         logger.error(f"Error scraping {url}: {e}")
 
 
+def term_snapshot(term: str) -> Dict[str, Any]:
+    """(sections of the term, credits, title) of every course, to diff a scrape against"""
+    snapshot = {}
+    for course_id, course in COURSE_DATA.items():
+        if isinstance(course, CourseInfoModel):
+            course = {
+                "sections": course.sections,
+                "credits": course.credits,
+                "title": course.title,
+            }
+        sections = course.get("sections", {}).get(term, {})
+        snapshot[course_id] = (
+            {key: list(row) for key, row in sections.items()},
+            course.get("credits"),
+            course.get("title"),
+        )
+    return snapshot
+
+
+def section_changes(
+    term: str, before: Dict[str, Any], after: Dict[str, Any]
+) -> Dict[str, Any]:
+    """The change message of a section scrape: changed course ids and section events"""
+    changed = sorted(i for i in after if before.get(i) != after[i])
+    events = term_section_events(
+        term,
+        {i: before[i][0] for i in changed if i in before},
+        {i: after[i][0] for i in changed},
+    )
+    return {"term": term, "courses": changed, "events": events}
+
+
+def write_course_data_file(path: str = COURSE_DATA_FILE) -> None:
+    # records are replaced, not changed in place, so a shallow copy is a consistent view
+    with COURSE_DATA_LOCK:
+        data = dict(COURSE_DATA)
+    with open(path, "w") as f:
+        f.write(CourseStructureModel(data).model_dump_json())
+
+
 def scrape_courses(
     term: str = "202610",
     output_file: str = None,
@@ -466,6 +575,8 @@ def scrape_courses(
 ):
     """
     Main logic for scraping NJIT course catalog and section information.
+    A sections-only run saved to Redis writes just the changed courses and returns its
+    change message (see section_changes), other runs write everything and return None.
     """
     if not COURSE_DATA:
         logger.error("COURSE_DATA NOT LOADED!")
@@ -498,22 +609,28 @@ def scrape_courses(
             return
 
         logger.info(f"RUNNING SECTIONS SCRAPER FOR TERM: {term_text}")
-        # run scraper for course sections
-        scraped_data = run_section_scraper(term)
-        # parse scraped section data
-        run_parser(scraped_data, term)
-        logger.info("Section scraping and parsing complete.")
+        # this thread is the only writer, the snapshots need no lock
+        before = term_snapshot(term)
+        # fetch, parse and apply course sections subject by subject
+        run_section_pipeline(term)
+        changes = section_changes(term, before, term_snapshot(term))
+        logger.info(
+            f"Section scraping and parsing complete. {len(changes['courses'])} courses "
+            f"changed, {len(changes['events'])} section events."
+        )
 
     # Save to JSON and Redis
     if run_catalog or run_sections:
         if output_file:
-            with open(output_file, "w") as f:
-                json.dump(COURSE_DATA, f, indent=4)
-        else:
+            write_course_data_file(output_file)
+        elif run_catalog:
             set_redis_course_data(COURSE_DATA)
-            # for now update the file too
-            with open(COURSE_DATA_FILE, "w") as f:
-                json.dump(CourseStructureModel(COURSE_DATA).model_dump(), f, indent=4)
+        else:
+            # only the changed course records, the JSON file is written on its own schedule
+            update_redis_course_data(
+                {course_id: COURSE_DATA[course_id] for course_id in changes["courses"]}
+            )
+            return changes
     else:
         logger.warning(
             "No action performed. Use catalog=True, sections=True, or both=False to run."
@@ -0,0 +1,111 @@
+"""
+Section-level changes between two scrapes of a term.
+
+Sections are compared by CRN (column 1 of a section row) and reported as events that
+consumers of the course_updates channel can apply one by one:
+
+- section_added:      {"section": row}
+- section_removed:    {"section": old row}
+- instructor_changed: {"old": name, "new": name}
+- seats_changed:      {"old": {"status", "max", "now"}, "new": {...}}
+- section_updated:    {"fields": {column: [old, new]}} for the other columns
+
+Every event also carries "term", "course" and "crn".
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+# SectionEntries columns, see backend/types.py
+COLUMNS = (
+    "section",
+    "crn",
+    "days",
+    "times",
+    "location",
+    "status",
+    "max",
+    "now",
+    "instructor",
+    "delivery_mode",
+    "credits",
+    "info",
+    "comments",
+)
+INSTRUCTOR = 8
+SEATS = (5, 6, 7)
+
+Sections = Dict[str, Sequence[str]]
+
+
+def _by_crn(sections: Optional[Sections]) -> Dict[str, Sequence[str]]:
+    return {row[1]: row for row in (sections or {}).values() if len(row) > 1}
+
+
+def _column(row: Sequence[str], index: int) -> Optional[str]:
+    return row[index] if index < len(row) else None
+
+
+def section_events(
+    term: str, course: str, old: Optional[Sections], new: Optional[Sections]
+) -> List[Dict[str, Any]]:
+    """The changes of one course's sections in a term, by CRN."""
+    before, after = _by_crn(old), _by_crn(new)
+    events = []
+
+    def event(kind: str, crn: str, **fields) -> None:
+        events.append(
+            {"type": kind, "term": term, "course": course, "crn": crn, **fields}
+        )
+
+    for crn, row in after.items():
+        old_row = before.get(crn)
+        if old_row is None:
+            event("section_added", crn, section=list(row))
+            continue
+        if list(old_row) == list(row):
+            continue
+
+        if _column(old_row, INSTRUCTOR) != _column(row, INSTRUCTOR):
+            event(
+                "instructor_changed",
+                crn,
+                old=_column(old_row, INSTRUCTOR),
+                new=_column(row, INSTRUCTOR),
+            )
+        if any(_column(old_row, i) != _column(row, i) for i in SEATS):
+            event(
+                "seats_changed",
+                crn,
+                old={COLUMNS[i]: _column(old_row, i) for i in SEATS},
+                new={COLUMNS[i]: _column(row, i) for i in SEATS},
+            )
+        others = {
+            COLUMNS[i] if i < len(COLUMNS) else str(i): [
+                _column(old_row, i),
+                _column(row, i),
+            ]
+            for i in range(max(len(old_row), len(row)))
+            if i not in SEATS
+            and i != INSTRUCTOR
+            and _column(old_row, i) != _column(row, i)
+        }
+        if others:
+            event("section_updated", crn, fields=others)
+
+    for crn, row in before.items():
+        if crn not in after:
+            event("section_removed", crn, section=list(row))
+    return events
+
+
+def term_section_events(
+    term: str, old: Dict[str, Sections], new: Dict[str, Sections]
+) -> List[Dict[str, Any]]:
+    """The changes between two {course: sections of the term} snapshots."""
+    events = []
+    for course in sorted(set(old) | set(new)):
+        if old.get(course) != new.get(course):
+            events.extend(
+                section_events(term, course, old.get(course), new.get(course))
+            )
+    return events
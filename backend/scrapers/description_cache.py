@@ -0,0 +1,88 @@
+import hashlib
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from backend import constants as c
+
+
+def normalize_description(description: str) -> str:
+    """Whitespace-insensitive form of a description, so reformatting is not a change."""
+    # \s also matches non-breaking spaces
+    return re.sub(r"\s+", " ", description).strip()
+
+
+def prompt_version(prompt: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()[:16]
+
+
+def is_parsed(result: Any) -> bool:
+    # None, {} and {"error": ...} are failed model calls and are not cached
+    return bool(result) and "error" not in result
+
+
+class DescriptionCache:
+    """
+    Parsed course descriptions in a Redis hash, keyed by the hash of the normalized
+    description and the prompt version. Cross-listed courses with the same description
+    share an entry and a prompt or model change starts a new set of keys.
+    """
+
+    def __init__(self, key: str, redis=None):
+        self.key = key
+        self._redis = redis
+
+    @property
+    def redis(self):
+        return self._redis or c.get_redis()
+
+    @staticmethod
+    def digest(description: str, version: str) -> str:
+        text = f"{version}\0{normalize_description(description)}"
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, digests: List[str]) -> Dict[str, Any]:
+        if not digests:
+            return {}
+        values = self.redis.hmget(self.key, digests)
+        return {d: json.loads(v) for d, v in zip(digests, values) if v is not None}
+
+    def put(self, digest: str, result: Any) -> None:
+        self.redis.hset(self.key, digest, json.dumps(result))
+
+
+def process_descriptions(
+    descriptions: Iterable[str],
+    parse: Callable[[str], Any],
+    cache: DescriptionCache,
+    version: str,
+    workers: int = 4,
+) -> Dict[str, Any]:
+    """
+    Parses descriptions in bulk: cache hits skip the model, each distinct miss is parsed
+    once by at most `workers` concurrent calls, and successful results are cached.
+    Returns the result of every description.
+    """
+    by_digest: Dict[str, List[str]] = {}
+    for description in descriptions:
+        by_digest.setdefault(cache.digest(description, version), []).append(description)
+
+    results = cache.get_many(list(by_digest))
+    misses = [d for d in by_digest if d not in results]
+
+    def parse_miss(digest: str) -> Optional[Any]:
+        result = parse(by_digest[digest][0])
+        if is_parsed(result):
+            cache.put(digest, result)
+        return result
+
+    if misses:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            results.update(zip(misses, executor.map(parse_miss, misses)))
+
+    return {
+        description: results[digest]
+        for digest, group in by_digest.items()
+        for description in group
+    }
@@ -0,0 +1,217 @@
+"""
+HTML parsing of the section pages and catalog pages.
+
+Each page type has two engines behind the same output: lxml, used by default, and
+BeautifulSoup with html.parser, used when SCRAPER_HTML_PARSER=bs4, when lxml is not
+installed or when lxml cannot read a page. The engines only extract the raw strings,
+the records are built by shared code, and backend/tests/test_html_parsing.py checks
+that both give the same output on the saved pages in backend/tests/fixtures.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from bs4 import BeautifulSoup, UnicodeDammit
+
+from backend.constants import SCRAPER_HTML_PARSER
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+except ImportError:
+    lxml_html = None
+
+HTML_PARSERS = ("lxml", "bs4")
+
+# (course id, header text, cell texts of every row after the table header)
+SectionBlock = Tuple[str, str, List[List[str]]]
+# (title text, description text or None)
+CatalogBlock = Tuple[str, Optional[str]]
+
+
+def _engine(engine: Optional[str]) -> str:
+    engine = engine or SCRAPER_HTML_PARSER
+    if engine not in HTML_PARSERS:
+        raise ValueError(f"Unknown HTML parser {engine!r}, use one of {HTML_PARSERS}")
+    return "bs4" if lxml_html is None else engine
+
+
+# ===== SECTION PAGES =====
+
+
+def _section_blocks_bs4(html_content: str) -> Iterable[SectionBlock]:
+    soup = BeautifulSoup(html_content, "html.parser")
+
+    # Find all h4 elements (each represents a course)
+    for h4 in soup.find_all("h4"):
+        course_id = h4.get("id")
+        if not course_id:
+            continue
+
+        # the first table after the heading holds its sections
+        table = h4.find_next_sibling("table")
+        if not table:
+            continue
+
+        rows = []
+        # Skip the first row (header)
+        for row in table.find_all("tr")[1:]:
+            td_values = []
+            for i, td in enumerate(row.find_all("td")):
+                # For links, extract the text content
+                link = td.find("a")
+                if link:
+                    text = link.get_text(strip=True)
+                else:
+                    text = td.get_text(strip=True)
+                # Times and rooms (3rd and 4th index) list one line per meeting
+                if (i == 4 or i == 3) and td.find("br"):
+                    text = td.get_text(separator=", ", strip=True)
+                td_values.append(text)
+            rows.append(td_values)
+
+        yield course_id, h4.get_text(strip=True), rows
+
+
+def _text(element, separator: str = "") -> str:
+    # like BeautifulSoup's get_text(separator, strip=True)
+    return separator.join(s.strip() for s in element.itertext() if s.strip())
+
+
+def _section_blocks_lxml(html_content: str) -> Iterable[SectionBlock]:
+    root = lxml_html.document_fromstring(html_content)
+
+    for h4 in root.iter("h4"):
+        course_id = h4.get("id")
+        if not course_id:
+            continue
+
+        table = next(h4.itersiblings("table"), None)
+        if table is None:
+            continue
+
+        rows = []
+        for row in list(table.iter("tr"))[1:]:
+            td_values = []
+            for i, td in enumerate(row.iter("td")):
+                link = next(td.iter("a"), None)
+                if (i == 4 or i == 3) and next(td.iter("br"), None) is not None:
+                    text = _text(td, ", ")
+                elif link is not None:
+                    text = _text(link)
+                else:
+                    text = _text(td)
+                td_values.append(text)
+            rows.append(td_values)
+
+        yield course_id, _text(h4), rows
+
+
+def _course_sections(block: SectionBlock) -> Dict[str, Any]:
+    course_id, header, rows = block
+
+    honors_sections = False
+    if header.lower().endswith("honors"):
+        honors_sections = True
+        right_dash = header.rfind("-")
+        left_dash = header.find("-")
+
+        header = header[left_dash + 1 : right_dash].strip()
+    else:
+        left_dash = header.find("-")
+        header = header[left_dash + 1 :].strip()
+
+    sections = {}
+    num_credits = 0
+    for td_values in rows:
+        sections[td_values[0]] = td_values
+        try:
+            num_credits = float(td_values[-3])
+        except Exception as e:
+            num_credits = None
+
+    return {
+        "course_id": course_id.replace("\u00a0", " "),
+        "header": header,
+        "honors": honors_sections,
+        "sections": sections,
+        "credits": num_credits,
+    }
+
+
+def parse_sections_html(
+    html_content: str, engine: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Extract all course sections from a section page by finding h4 elements and their
+    following tables. Returns one record per course heading with its header text,
+    whether it lists honors sections, its sections by section number and its credits.
+    """
+    if _engine(engine) == "lxml":
+        try:
+            return [_course_sections(b) for b in _section_blocks_lxml(html_content)]
+        except (etree.ParserError, ValueError):
+            pass
+    return [_course_sections(b) for b in _section_blocks_bs4(html_content)]
+
+
+# ===== CATALOG PAGES =====
+
+
+def _catalog_blocks_bs4(content: Union[str, bytes]) -> Iterable[CatalogBlock]:
+    soup = BeautifulSoup(content, "html.parser")
+
+    # Find all course blocks
+    for block in soup.find_all("div", class_="courseblock"):
+        title_elem = block.find("p", class_="courseblocktitle")
+        if title_elem is None:
+            raise ValueError("course block without a title")
+        desc_elem = block.find("p", class_="courseblockdesc")
+        yield (
+            title_elem.get_text(strip=True),
+            desc_elem.get_text(strip=True) if desc_elem else None,
+        )
+
+
+def _has_class(class_name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+def _catalog_blocks_lxml(content: Union[str, bytes]) -> Iterable[CatalogBlock]:
+    if isinstance(content, bytes):
+        # decode like BeautifulSoup does
+        content = UnicodeDammit(content, is_html=True).unicode_markup
+    root = lxml_html.document_fromstring(content)
+
+    for block in root.xpath(f"//div[{_has_class('courseblock')}]"):
+        title_elem = next(
+            iter(block.xpath(f".//p[{_has_class('courseblocktitle')}]")), None
+        )
+        if title_elem is None:
+            raise ValueError("course block without a title")
+        desc_elem = next(
+            iter(block.xpath(f".//p[{_has_class('courseblockdesc')}]")), None
+        )
+        yield _text(title_elem), _text(desc_elem) if desc_elem is not None else None
+
+
+def _catalog_course(block: CatalogBlock) -> Dict[str, str]:
+    title_text, desc_text = block
+    title = title_text.replace("\u00a0", " ").split(".")
+    description = desc_text.replace("\u00a0", " ") if desc_text is not None else ""
+    return {
+        "course_code": title[0].strip(),
+        "title": title[1].strip(),
+        "desc": description,
+    }
+
+
+def parse_catalog_html(
+    content: Union[str, bytes], engine: Optional[str] = None
+) -> List[Dict[str, str]]:
+    """Extract the code, title and description of every course block of a catalog page."""
+    if _engine(engine) == "lxml":
+        try:
+            return [_catalog_course(b) for b in _catalog_blocks_lxml(content)]
+        except (etree.ParserError, ValueError):
+            pass
+    return [_catalog_course(b) for b in _catalog_blocks_bs4(content)]
@@ -0,0 +1,78 @@
+import queue
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def run_pipeline(
+    items: Iterable[T],
+    fetch: Callable[[T], Any],
+    parse: Callable[[T, Any], Any],
+    apply: Callable[[T, Any], None],
+    fetch_workers: int = 4,
+    parse_workers: int = 2,
+    depth: int = 8,
+    on_error: Optional[Callable[[T, BaseException], None]] = None,
+) -> Dict[str, int]:
+    """
+    Streams items through fetch -> parse -> apply. Fetches run in one pool and each result
+    is handed to the parse pool as soon as it arrives, parsed results are applied one at a
+    time on the calling thread in completion order, so apply needs no locking.
+
+    At most `depth` items are between fetch and apply at any moment, which bounds the
+    memory held by raw and parsed responses. An item whose fetch, parse or apply raises is
+    passed to on_error and skipped. Returns counts of applied and failed items.
+    """
+    done: "queue.Queue[tuple]" = queue.Queue()
+    items = iter(items)
+    in_flight = 0
+    exhausted = False
+    stats = {"applied": 0, "failed": 0, "max_in_flight": 0}
+
+    # fetchers shut down first, their callbacks may still hand work to the parsers
+    with ThreadPoolExecutor(
+        max_workers=parse_workers, thread_name_prefix="parse"
+    ) as parsers, ThreadPoolExecutor(
+        max_workers=fetch_workers, thread_name_prefix="fetch"
+    ) as fetchers:
+
+        def parse_stage(item: T, fetched: Future) -> None:
+            try:
+                done.put((item, parse(item, fetched.result()), None))
+            except BaseException as e:
+                done.put((item, None, e))
+
+        def on_fetched(item: T) -> Callable[[Future], None]:
+            return lambda fetched: parsers.submit(parse_stage, item, fetched)
+
+        while True:
+            # keep the pipeline full
+            while not exhausted and in_flight < depth:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                fetchers.submit(fetch, item).add_done_callback(on_fetched(item))
+                in_flight += 1
+                stats["max_in_flight"] = max(stats["max_in_flight"], in_flight)
+            if not in_flight:
+                break
+
+            item, parsed, error = done.get()
+            in_flight -= 1
+            if error is None:
+                try:
+                    apply(item, parsed)
+                    stats["applied"] += 1
+                except Exception as e:
+                    error = e
+            if error is not None:
+                stats["failed"] += 1
+                if on_error:
+                    on_error(item, error)
+            # drop the reference before waiting for the next result
+            parsed = None
+
+    return stats
@@ -0,0 +1,239 @@
+"""
+Rule-based parsing of simple course descriptions into requisite trees, ahead of the LLM.
+
+Handles descriptions whose only requisite is a "Prerequisite(s): ..." clause made of
+course codes, and/or, commas, parentheses, minimum grades ("with a grade of C or better")
+and class standing ("junior standing"), and descriptions without any requisite. The
+output follows the CourseInfo schema of the description prompt. Anything else, like
+corequisites, restrictions, permissions, placements, "or equivalent" or unusual wording,
+returns None so the description goes to the model.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+GRADES = ("A", "B+", "B", "C+", "C", "C-", "F")
+STANDINGS = {
+    "freshman": "FRESHMAN",
+    "sophomore": "SOPHOMORE",
+    "junior": "JUNIOR",
+    "senior": "SENIOR",
+    "graduate": "GRAD",
+}
+
+_CLAUSE = re.compile(r"\bPrerequisites?\s*:\s*(?P<clause>[^.]*)(?:\.|$)", re.I)
+# words anywhere outside the clause that the model would turn into requisites or
+# restrictions
+_TRIGGERS = re.compile(
+    r"requisite|pre-?req|co-?req|restrict|permission|approv|consent|standing|"
+    r"placement|equivalen|\bmajors?\b|\bonly\b|not open|credit|instructor|"
+    r"department|advisor|enroll|concurrent|\bmust\b|\brequire|\bprior\b|\bprevious|"
+    r"\bcompletion\b",
+    re.I,
+)
+# course codes are links on the catalog pages and their text is joined to the words
+# around them without spaces ("CS 114andMATH 111"), so tokens do not need word boundaries
+_COURSE = r"[A-Z]{2,4} ?\d{3}(?:[A-Z](?![a-z]))?(?!\d)"
+# a course mentioned outside the clause is a requisite in other words ("Prereq: CS 100")
+_COURSE_MENTION = re.compile(_COURSE)
+_TOKEN = re.compile(
+    r"\s*(?:"
+    r"(?P<course>" + _COURSE + r")"
+    r"|(?P<grade>\(?\s*(?i:with\s+(?:an?\s+)?(?:minimum\s+)?grade\s+of)\s+"
+    r"(?P<letter>[A-F][+-]?)(?:\s+(?i:or\s+(?:better|higher)))?\s*\)?)"
+    r"|(?P<short_grade>\(?\s*(?P<short_letter>[A-F][+-]?)\s+(?i:or\s+(?:better|higher))\s*\)?)"
+    r"|(?P<standing>(?P<level>(?i:freshman|sophomore|junior|senior|graduate))\s+(?i:standing))"
+    r"|(?P<op>(?i:and|or))(?![a-z])"
+    r"|(?P<sep>[,;])"
+    r"|(?P<lparen>\()"
+    r"|(?P<rparen>\))"
+    r")"
+)
+
+Token = Tuple[str, Any]
+
+
+def _tokenize(clause: str) -> Optional[List[Token]]:
+    tokens: List[Token] = []
+    position = 0
+    clause = clause.strip()
+    while position < len(clause):
+        match = _TOKEN.match(clause, position)
+        if not match or match.end() == position:
+            return None
+        position = match.end()
+        if match.group("course"):
+            subject, number = re.match(
+                r"([A-Z]+) ?(\w+)", match.group("course")
+            ).groups()
+            tokens.append(("item", _course(f"{subject} {number}")))
+        elif match.group("grade") or match.group("short_grade"):
+            grade = (match.group("letter") or match.group("short_letter")).upper()
+            # a grade belongs to the course right before it
+            if grade not in GRADES or not tokens or tokens[-1][0] != "item":
+                return None
+            node = tokens[-1][1]
+            if node["type"] != "COURSE" or node["min_grade"]:
+                return None
+            node["min_grade"] = grade
+        elif match.group("standing"):
+            tokens.append(
+                (
+                    "item",
+                    {
+                        "type": "STANDING",
+                        "standing": match.group("standing"),
+                        "normalized": STANDINGS[match.group("level").lower()],
+                        "semesters_left": None,
+                    },
+                )
+            )
+        elif match.group("op"):
+            tokens.append(("op", match.group("op").upper()))
+        elif match.group("sep"):
+            tokens.append(("sep", None))
+        elif match.group("lparen"):
+            tokens.append(("(", None))
+        else:
+            tokens.append((")", None))
+    return tokens
+
+
+def _course(code: str) -> Dict[str, Any]:
+    return {"type": "COURSE", "course": code, "min_grade": None}
+
+
+def _combine(op: str, left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+    children = []
+    for node in (left, right):
+        # flatten runs of the same operator
+        if node["type"] == op:
+            children.extend(node["children"])
+        else:
+            children.append(node)
+    return {"type": op, "children": children}
+
+
+class _Parser:
+    def __init__(self, tokens: List[Token]):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self) -> Optional[str]:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position][0]
+        return None
+
+    def take(self) -> Token:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def item(self) -> Optional[Dict[str, Any]]:
+        kind = self.peek()
+        if kind == "item":
+            return self.take()[1]
+        if kind == "(":
+            self.take()
+            node = self.group()
+            if node is None or self.peek() != ")":
+                return None
+            self.take()
+            return node
+        return None
+
+    def group(self) -> Optional[Dict[str, Any]]:
+        """
+        A list of items joined by and/or and commas. Commas take the operator of the list
+        ("A, B and C"), a list without operators is a conjunction, and mixed and/or
+        without commas group left to right like the prompt ("A or B and C" is
+        "(A or B) and C"). Commas together with both operators are ambiguous.
+        """
+        items = [self.item()]
+        joins: List[Optional[str]] = []
+        while self.peek() in ("op", "sep"):
+            join = None
+            commas = 0
+            while self.peek() in ("op", "sep"):
+                kind, value = self.take()
+                if kind == "sep":
+                    commas += 1
+                elif join is None:
+                    join = value
+                else:
+                    return None
+            if commas > 1:
+                return None
+            joins.append(join if join else ",")
+            items.append(self.item())
+        if any(node is None for node in items):
+            return None
+
+        ops = {j for j in joins if j != ","}
+        if len(ops) > 1 and "," in joins:
+            return None
+        default = ops.pop() if len(ops) == 1 else "AND"
+        node = items[0]
+        for join, item in zip(joins, items[1:]):
+            node = _combine(default if join == "," else join, node, item)
+        return node
+
+
+def parse_prerequisites(clause: str) -> Optional[Dict[str, Any]]:
+    """The AND/OR tree of a prerequisite clause, or None when it is not understood."""
+    tokens = _tokenize(clause)
+    if not tokens:
+        return None
+    parser = _Parser(tokens)
+    node = parser.group()
+    if node is None or parser.peek() is not None:
+        return None
+    # the schema's root is always an AND/OR node
+    if node["type"] not in ("AND", "OR"):
+        node = {"type": "AND", "children": [node]}
+    return node
+
+
+def parse_description(description: str) -> Optional[Dict[str, Any]]:
+    """
+    The requisites of a description when it is parsed with full confidence, else None.
+    """
+    description = re.sub(r"\s+", " ", description).strip()
+    clauses = list(_CLAUSE.finditer(description))
+    if len(clauses) > 1:
+        return None
+
+    prereq_tree = None
+    rest = description
+    if clauses:
+        match = clauses[0]
+        clause = match.group("clause").strip()
+        if clause.lower() not in ("none", "no prerequisites"):
+            prereq_tree = parse_prerequisites(clause)
+            if prereq_tree is None:
+                return None
+        rest = description[: match.start()] + " " + description[match.end() :]
+
+    if _TRIGGERS.search(rest) or _COURSE_MENTION.search(rest):
+        return None
+    return {"prereq_tree": prereq_tree, "coreq_tree": None, "restrictions": []}
+
+
+def canonical_tree(node: Any) -> Any:
+    """Order-insensitive form of a tree with runs of the same operator flattened."""
+    if not node:
+        return None
+    if hasattr(node, "model_dump"):
+        node = node.model_dump()
+    if node["type"] in ("AND", "OR"):
+        children = []
+        for child in node["children"]:
+            child = canonical_tree(child)
+            if isinstance(child, tuple) and child[0] == node["type"]:
+                children.extend(child[1])
+            else:
+                children.append(child)
+        if len(children) == 1:
+            return children[0]
+        return (node["type"], tuple(sorted(children, key=repr)))
+    return tuple(sorted((k, v) for k, v in node.items() if v is not None))
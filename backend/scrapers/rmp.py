@@ -1,5 +1,4 @@
 import json
-import requests
 import time
 from functools import cache
 from backend.scrapers.constants import (
@@ -11,7 +10,7 @@ from backend.scrapers.constants import (
     set_redis_lecturer_data,
     LecturerStructureModel,
 )
-from backend.constants import LECTURERS_DATA_FILE
+from backend.constants import LECTURERS_DATA_FILE, get_http_session
 
 
 @cache
@@ -38,7 +37,7 @@ def sync_lecturer_rating(lecturer_name: str, existing_data: dict = None):
         else:
             query = lecturer_name
 
-        response = requests.get(
+        response = get_http_session().get(
             f"https://backend-server-black-phi.vercel.app/prof?q={query}", timeout=10
         )
 
@@ -1,10 +1,20 @@
 from backend.types import CourseDataType
 from backend.constants import COURSE_DATA
-from backend.functions import construct_term_courses
-from backend.constants import LECTURER_DATA
+from backend.constants import (
+    LECTURER_DATA,
+    CHAT_MAX_CONCURRENCY,
+    CHAT_MAX_QUEUE,
+    CHAT_QUEUE_TIMEOUT,
+    CHAT_SESSION_POLICY,
+)
+from backend.admission import ChatAdmission, AdmissionRejected
+from backend import metrics
+from backend.streaming import frame_ndjson
 from backend.functions import (
-    initialize_database,
-    set_local_data,
+    run_startup_stages,
+    listen_for_course_updates,
+    is_ready,
+    get_readiness,
     gemini_call_stream,
 )
 from backend.types import (
@@ -12,13 +22,15 @@ from backend.types import (
     ProfsRequest,
     ChatRequest,
 )
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, JSONResponse
 import uvicorn
-import json
+import threading
+import time
+from typing import Callable
 
 
 app = FastAPI()
@@ -32,31 +44,93 @@ app.add_middleware(
 )
 app.add_middleware(GZipMiddleware, minimum_size=500, compresslevel=5)
 
+CHAT_ADMISSION = ChatAdmission(
+    max_active=CHAT_MAX_CONCURRENCY,
+    max_queue=CHAT_MAX_QUEUE,
+    queue_timeout=CHAT_QUEUE_TIMEOUT,
+    session_policy=CHAT_SESSION_POLICY,
+)
+
 
 @app.on_event("startup")
 def startup():
-    from backend.constants import warmup_constants
+    # stages run in the background so cheap endpoints can serve while models load
+    threading.Thread(target=run_startup_stages, daemon=True).start()
+    threading.Thread(target=listen_for_course_updates, daemon=True).start()
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    Runs on_close once the response is done, also when its body was never iterated
+    (the client disconnected or sending the response start failed), which a finally
+    in the body generator would miss.
+    """
+
+    def __init__(self, content, on_close: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
+
 
-    warmup_constants()
+def require_capability(capability: str):
+    if not is_ready(capability):
+        raise HTTPException(
+            status_code=503,
+            detail=f"Server is starting up, '{capability}' is not ready yet.",
+            headers={"Retry-After": "5"},
+        )
 
-    initialize_database()
-    set_local_data()
-    construct_term_courses()
+
+@app.get("/ready")
+async def ready_endpoint():
+    readiness = get_readiness()
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return metrics.snapshot()
 
 
 @app.post("/chat")
 async def chat_endpoint(request: ChatRequest):
+    require_capability("chat")
+
+    try:
+        await CHAT_ADMISSION.acquire(request.sessionID)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    start = time.monotonic()
+
+    def finish():
+        CHAT_ADMISSION.release(request.sessionID)
+        metrics.observe("chat.duration_seconds", time.monotonic() - start)
+
     async def generate():
-        async for chunk in gemini_call_stream(
+        chunks = gemini_call_stream(
             request.query, request.sessionID, request.term, request.attachments
-        ):
-            yield json.dumps(chunk) + "\n"
+        )
+        async for line in frame_ndjson(chunks):
+            yield line
 
-    return StreamingResponse(generate(), media_type="application/x-ndjson")
+    return ClosingStreamingResponse(
+        generate(), on_close=finish, media_type="application/x-ndjson"
+    )
 
 
 @app.post("/getprofs", response_model=ProfsResponse)
 async def prof_endpoint(request: ProfsRequest):
+    require_capability("profs")
     results = {}
     for prof in request.profs:
         results[prof] = None
@@ -67,7 +141,9 @@ async def prof_endpoint(request: ProfsRequest):
 
 @app.get("/getcourses", response_model=CourseDataType)
 async def course_endpoint():
-    return COURSE_DATA
+    require_capability("courses")
+    # a copy, course updates may change COURSE_DATA while the response is serialized
+    return dict(COURSE_DATA)
 
 
 def start():
@@ -0,0 +1,235 @@
+"""
+Chat session state: conversation history and the user's profile (prereqs).
+
+Sessions live in Redis under {session_id}:history, {session_id}:prereqs,
+{session_id}:files (references of the uploaded attachments by hash, see
+backend/attachments.py) and {session_id}:version. SessionStore keeps recently used
+sessions parsed in memory and checks them against the version stamp, which every save
+increments, so a session that was answered by another worker is reloaded.
+"""
+
+from collections import OrderedDict
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.genai import types
+
+from backend import constants as c
+from backend import metrics
+from backend.constants import SESSION_CACHE_SIZE, SESSION_TTL_SECONDS
+from backend.history import compact_history, decode_history, encode_history
+from backend.types import UserFulfilled
+
+
+def clean_history(history: List[types.Content]) -> List[Dict[str, Any]]:
+    """
+    Converts Content objects to dicts, keeping only text, function_call, function_response
+    and file_data (uploaded attachments) parts.
+    """
+    clean = []
+
+    for h in history:
+        # Convert the Content object to a dictionary
+        data = h.model_dump(exclude_none=True)
+
+        # Iterate through parts to remove 'thought' and 'thought_signature'
+        if "parts" in data:
+            parts = []
+            for part in data["parts"]:
+                curr_part = {}
+                if "text" in part:
+                    curr_part["text"] = part["text"]
+                if "function_call" in part:
+                    curr_part["function_call"] = part["function_call"]
+                if "function_response" in part:
+                    curr_part["function_response"] = part["function_response"]
+                if "file_data" in part:
+                    curr_part["file_data"] = part["file_data"]
+                if curr_part:
+                    parts.append(curr_part)
+            data["parts"] = parts
+
+        clean.append(data)
+
+    return clean
+
+
+def dump_history(history: List[types.Content]) -> str:
+    """
+    Converts the chat history to the compacted, compressed string stored in Redis.
+    """
+    return encode_history(compact_history(clean_history(history)))
+
+
+def load_history(history_str: str) -> List[types.Content]:
+    """
+    Loads a stored history string back into a list of Gemini Content objects.
+    """
+    if not history_str:
+        return []
+    try:
+        data = decode_history(history_str)
+        return [types.Content.model_validate(h) for h in data]
+    except Exception as e:
+        print(f"Error loading history: {e}")
+        return []
+
+
+def dump_prereqs(prereqs: UserFulfilled) -> str:
+    """
+    Converts a UserFulfilled object to a JSON string.
+    """
+    return prereqs.model_dump_json()
+
+
+def load_prereqs(prereqs_str: str) -> UserFulfilled:
+    """
+    Loads a JSON string back into a UserFulfilled object.
+    """
+    if not prereqs_str:
+        return UserFulfilled()
+    try:
+        return UserFulfilled.model_validate_json(prereqs_str)
+    except Exception as e:
+        print(f"Error loading prereqs: {e}")
+        return UserFulfilled(courses={})
+
+
+def queue_session_writes(
+    pipe,
+    session_id: str,
+    history_str: str,
+    prereqs_str: str,
+    files: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> None:
+    """
+    Adds the writes for a session to a (sync or async) Redis pipeline. The version is the
+    third command, so it's the third result of the pipeline.
+    """
+    pipe.set(f"{session_id}:history", history_str, ex=SESSION_TTL_SECONDS)
+    pipe.set(f"{session_id}:prereqs", prereqs_str, ex=SESSION_TTL_SECONDS)
+    pipe.incr(f"{session_id}:version")
+    pipe.expire(f"{session_id}:version", SESSION_TTL_SECONDS)
+    if files is not None:
+        # rewritten whole, expired references are dropped from it
+        pipe.delete(f"{session_id}:files")
+        if files:
+            pipe.hset(
+                f"{session_id}:files",
+                mapping={key: json.dumps(ref) for key, ref in files.items()},
+            )
+            pipe.expire(f"{session_id}:files", SESSION_TTL_SECONDS)
+
+
+class SessionState:
+    def __init__(
+        self,
+        history: List[types.Content],
+        prereqs: UserFulfilled,
+        prereqs_raw: Optional[str],
+        version: int,
+        files: Optional[Dict[str, Dict[str, Any]]] = None,
+    ):
+        self.history = history
+        self.prereqs = prereqs
+        # stored profile JSON as loaded, the chatbot prompt includes it as is
+        self.prereqs_raw = prereqs_raw
+        self.version = version
+        self.files = files or {}
+
+    def copy(self) -> "SessionState":
+        return SessionState(
+            list(self.history),
+            self.prereqs.model_copy(deep=True),
+            self.prereqs_raw,
+            self.version,
+            dict(self.files),
+        )
+
+
+class SessionStore:
+    """
+    Loads and saves sessions with the async Redis client, one pipelined round trip per
+    load or save, plus a version check for sessions cached in memory.
+    """
+
+    def __init__(self, max_sessions: int = SESSION_CACHE_SIZE):
+        self.max_sessions = max_sessions
+        self._cache: OrderedDict[str, SessionState] = OrderedDict()
+
+    async def load(self, session_id: str) -> SessionState:
+        redis = c.get_async_redis()
+        cached = self._cache.get(session_id)
+        if cached is not None:
+            version = await redis.get(f"{session_id}:version")
+            if version is not None and int(version) == cached.version:
+                self._cache.move_to_end(session_id)
+                metrics.incr("sessions.cache_hits")
+                return cached.copy()
+            del self._cache[session_id]
+
+        metrics.incr("sessions.cache_misses")
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.get(f"{session_id}:history")
+            pipe.get(f"{session_id}:prereqs")
+            pipe.get(f"{session_id}:version")
+            pipe.hgetall(f"{session_id}:files")
+            history_raw, prereqs_raw, version, files = await pipe.execute()
+
+        return SessionState(
+            load_history(history_raw),
+            load_prereqs(prereqs_raw),
+            prereqs_raw,
+            int(version or 0),
+            {key: json.loads(ref) for key, ref in files.items()},
+        )
+
+    async def save(
+        self,
+        session_id: str,
+        history: List[types.Content],
+        prereqs: UserFulfilled,
+        files: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> None:
+        entries = compact_history(clean_history(history))
+        prereqs_str = dump_prereqs(prereqs)
+        files = files or {}
+
+        async with c.get_async_redis().pipeline(transaction=True) as pipe:
+            queue_session_writes(
+                pipe, session_id, encode_history(entries), prereqs_str, files
+            )
+            results = await pipe.execute()
+
+        # cache what a load from Redis would return
+        self._cache[session_id] = SessionState(
+            [types.Content.model_validate(entry) for entry in entries],
+            prereqs.model_copy(deep=True),
+            prereqs_str,
+            int(results[2]),
+            dict(files),
+        )
+        self._cache.move_to_end(session_id)
+        while len(self._cache) > self.max_sessions:
+            self._cache.popitem(last=False)
+        metrics.set_gauge("sessions.cached", len(self._cache))
+
+
+def load_session_sync(session_id: str) -> Tuple[Optional[str], Optional[str]]:
+    """Reads a session's raw history and prereqs with the sync Redis client."""
+    pipe = c._REDIS.pipeline(transaction=False)
+    pipe.get(f"{session_id}:history")
+    pipe.get(f"{session_id}:prereqs")
+    history_raw, prereqs_raw = pipe.execute()
+    return history_raw, prereqs_raw
+
+
+def save_session_sync(
+    session_id: str, history: List[types.Content], prereqs: UserFulfilled
+) -> None:
+    pipe = c._REDIS.pipeline(transaction=True)
+    queue_session_writes(pipe, session_id, dump_history(history), dump_prereqs(prereqs))
+    pipe.execute()
+
+
+SESSION_STORE = SessionStore()
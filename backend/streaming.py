@@ -0,0 +1,184 @@
+"""
+Helpers for forwarding results from worker threads to the event loop, and for framing
+the /chat stream.
+
+Items are handed to the loop with call_soon_threadsafe, so an awaiting consumer wakes
+up as soon as an item is produced instead of polling a queue.Queue.
+"""
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+from concurrent.futures import Executor
+
+import orjson
+
+from backend import metrics
+from backend.constants import STREAM_COALESCE_CHARS, STREAM_COALESCE_SECONDS
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class AsyncBridge:
+    """
+    A queue that worker threads put into and the event loop consumes.
+    Must be created on the event loop thread.
+    """
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self.closed = False
+
+    def put(self, item: Any) -> None:
+        """Thread-safe. Items put after the consumer stopped listening are dropped."""
+        if self.closed:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+        except RuntimeError:
+            # event loop already closed
+            self.closed = True
+
+    def fail(self, error: BaseException) -> None:
+        self.put(_Failure(error))
+
+    def finish(self) -> None:
+        self.put(_DONE)
+
+    def _unwrap(self, item: Any) -> Any:
+        if isinstance(item, _Failure):
+            raise item.error
+        return item
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        """Yields items until finish() is called, re-raising errors passed to fail()."""
+        try:
+            while True:
+                item = await self._queue.get()
+                if item is _DONE:
+                    return
+                yield self._unwrap(item)
+        finally:
+            self.closed = True
+
+    async def until(self, future: asyncio.Future) -> AsyncIterator[Any]:
+        """Yields items as they arrive until the future is done and the queue is drained."""
+        while not future.done():
+            getter = asyncio.ensure_future(self._queue.get())
+            done, _ = await asyncio.wait(
+                {getter, future}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if getter in done:
+                yield self._unwrap(getter.result())
+            else:
+                getter.cancel()
+
+        while not self._queue.empty():
+            yield self._unwrap(self._queue.get_nowait())
+
+
+async def iterate_in_thread(
+    iterable: Iterable[Any], executor: Optional[Executor] = None
+) -> AsyncIterator[Any]:
+    """
+    Consumes a blocking iterable in a worker thread and yields each item the moment it
+    is produced. Errors raised by the iterable are re-raised here.
+    """
+    loop = asyncio.get_running_loop()
+    bridge = AsyncBridge()
+
+    def produce():
+        try:
+            for item in iterable:
+                if bridge.closed:
+                    break
+                bridge.put(item)
+        except Exception as e:
+            bridge.fail(e)
+        finally:
+            bridge.finish()
+
+    future = loop.run_in_executor(executor, produce)
+    try:
+        async for item in bridge:
+            yield item
+    finally:
+        bridge.closed = True
+    await future
+
+
+def encode_line(chunk: Dict[str, Any]) -> bytes:
+    """One NDJSON line for a StreamChunk-shaped dict."""
+    return orjson.dumps(chunk) + b"\n"
+
+
+async def frame_ndjson(
+    chunks: AsyncIterator[Dict[str, Any]],
+    window: float = STREAM_COALESCE_SECONDS,
+    max_chars: int = STREAM_COALESCE_CHARS,
+) -> AsyncIterator[bytes]:
+    """
+    Serializes stream chunks to NDJSON lines. The first text chunk is sent right away,
+    later text chunks are merged into one line until `window` seconds have passed or
+    `max_chars` are buffered. Other chunks (schedules) flush the buffer and go out
+    immediately. A window of 0 writes one line per chunk.
+    """
+    buffer: List[str] = []
+    buffered_chars = 0
+    deadline = 0.0
+    sent_text = False
+    pending: Optional[asyncio.Future] = None
+    iterator = chunks.__aiter__()
+
+    def flush() -> bytes:
+        nonlocal buffered_chars
+        line = encode_line({"type": "text", "content": "".join(buffer)})
+        buffer.clear()
+        buffered_chars = 0
+        metrics.incr("stream.lines")
+        return line
+
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            timeout = max(0.0, deadline - time.monotonic()) if buffer else None
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                yield flush()
+                continue
+
+            finished, pending = pending, None
+            try:
+                chunk = finished.result()
+            except StopAsyncIteration:
+                break
+            metrics.incr("stream.chunks")
+
+            if chunk["type"] != "text" or window <= 0 or not sent_text:
+                if buffer:
+                    yield flush()
+                sent_text = sent_text or chunk["type"] == "text"
+                metrics.incr("stream.lines")
+                yield encode_line(chunk)
+                continue
+
+            if not buffer:
+                deadline = time.monotonic() + window
+            buffer.append(chunk["content"])
+            buffered_chars += len(chunk["content"])
+            if buffered_chars >= max_chars:
+                yield flush()
+
+        if buffer:
+            yield flush()
+    finally:
+        # the client went away mid-stream, stop the producer
+        if pending is not None and not pending.done():
+            pending.cancel()
@@ -0,0 +1,176 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+import asyncio
+import base64
+import gzip
+
+import pytest
+from google.genai import types
+
+from backend import attachments
+from backend.attachments import (
+    DUPLICATE_NOTE,
+    PDF_MIME_TYPE,
+    AttachmentError,
+    decode_attachment,
+    drop_expired_files,
+    prepare_message_parts,
+    shared_file_uris,
+)
+
+PDF = b"%PDF-1.4 unofficial transcript " + os.urandom(300_000)
+
+
+def encode(data, level=9):
+    return base64.b64encode(gzip.compress(data, compresslevel=level)).decode()
+
+
+def test_decode_round_trip_and_limits():
+    data, digest = decode_attachment(encode(PDF))
+    assert data == PDF
+
+    with pytest.raises(AttachmentError):
+        decode_attachment(encode(PDF), max_bytes=len(PDF) - 1)
+    with pytest.raises(AttachmentError):
+        decode_attachment(encode(PDF)[:1000])
+    with pytest.raises(AttachmentError):
+        decode_attachment("not base64!")
+
+
+class Uploads:
+    """Stand-in for the backend's upload_file, recording what was uploaded."""
+
+    def __init__(self, fail=False):
+        self.data = []
+        self.fail = fail
+
+    def __call__(self, data, mime_type):
+        if self.fail:
+            raise ConnectionError("upload failed")
+        self.data.append(data)
+        return {
+            "uri": f"files/{len(self.data)}",
+            "mime_type": mime_type,
+            "expires_at": None,
+        }
+
+
+def test_transcript_is_uploaded_once(monkeypatch):
+    upload = Uploads()
+    parts, files = prepare_message_parts("here", [encode(PDF)], {}, set(), upload)
+    assert parts[0] == "here" and parts[1].file_data.file_uri == "files/1"
+    assert upload.data == [PDF]
+
+    decoded = []
+    monkeypatch.setattr(
+        attachments,
+        "decode_attachment",
+        lambda encoded: decoded.append(1) or decode_attachment(encoded),
+    )
+    # while the history has the file, re-attaching it only adds a note; the same upload
+    # is not decoded again, the same file compressed differently is but isn't uploaded
+    for attachment in (encode(PDF), encode(PDF, level=1)):
+        parts, new = prepare_message_parts(
+            "again", [attachment], files, {"files/1"}, upload
+        )
+        assert parts[1] == DUPLICATE_NOTE.format(name="Attachment 1")
+        files.update(new)
+    assert len(decoded) == 1 and len(upload.data) == 1
+
+    # once the file left the history it is referenced again, without an upload
+    parts, new = prepare_message_parts("later", [encode(PDF)], files, set(), upload)
+    assert parts[1].file_data.file_uri == "files/1" and not new
+    assert len(upload.data) == 1
+
+    parts, _ = prepare_message_parts("twice", [encode(b"other")] * 2, {}, set(), upload)
+    assert parts[1].file_data.file_uri == "files/2" and isinstance(parts[2], str)
+
+
+def test_failed_upload_sends_the_file_inline():
+    parts, files = prepare_message_parts(
+        "here", [encode(PDF)], {}, set(), Uploads(fail=True)
+    )
+    assert parts[1].inline_data.data == PDF and files == {}
+
+
+def test_expired_files_leave_the_session_and_history():
+    ref = {"uri": "files/1", "mime_type": PDF_MIME_TYPE, "expires_at": 1000.0}
+    kept = {"uri": "files/2", "mime_type": PDF_MIME_TYPE, "expires_at": None}
+    history = [
+        types.Content(
+            role="user",
+            parts=[
+                types.Part(text="here"),
+                types.Part.from_uri(file_uri="files/1", mime_type=PDF_MIME_TYPE),
+            ],
+        ),
+        types.Content(
+            role="user",
+            parts=[types.Part.from_uri(file_uri="files/1", mime_type=PDF_MIME_TYPE)],
+        ),
+        types.Content(
+            role="user",
+            parts=[types.Part.from_uri(file_uri="files/2", mime_type=PDF_MIME_TYPE)],
+        ),
+    ]
+
+    files, trimmed = drop_expired_files({"a": ref, "b": kept}, history, now=0)
+    assert files == {"a": ref, "b": kept} and trimmed is history
+
+    files, trimmed = drop_expired_files({"a": ref, "b": kept}, history, now=1000)
+    assert files == {"b": kept}
+    assert shared_file_uris(trimmed) == {"files/2"}
+    assert trimmed[0].parts[0].text == "here" and len(trimmed) == 2
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    from backend import constants as c
+    from backend import functions
+    from backend.models import FakeBackend
+
+    fakeredis = pytest.importorskip("fakeredis")
+    script = {"rules": [], "reply": "Noted."}
+    backend = FakeBackend(script, token_delay=0, first_token_delay=0)
+    chats = []
+    create_chat = backend.create_chat
+
+    def record(*args, **kwargs):
+        chats.append(create_chat(*args, **kwargs))
+        return chats[-1]
+
+    monkeypatch.setattr(backend, "create_chat", record)
+    monkeypatch.setattr(functions, "get_tools", lambda *args, **kwargs: [])
+    monkeypatch.setattr(
+        c, "_ASYNC_REDIS", fakeredis.FakeAsyncRedis(decode_responses=True)
+    )
+    monkeypatch.setattr(c, "_MODEL_BACKEND", backend)
+    return backend, chats
+
+
+def test_later_messages_reference_the_uploaded_transcript(chat):
+    from backend.functions import gemini_call_stream
+
+    backend, chats = chat
+
+    async def run():
+        for text in ("here is my transcript", "what should I take next?"):
+            stream = gemini_call_stream(text, "transcript-1", "202610", [encode(PDF)])
+            [chunk async for chunk in stream]
+
+    asyncio.run(run())
+
+    # uploaded once, the second chat gets it through the stored history
+    assert list(backend.files.values()) == [PDF]
+    (uri,) = backend.files
+    assert len(chats) == 2
+    assert shared_file_uris(chats[1]._curated_history[:2]) == {uri}
+    second = chats[1]._curated_history[-2]
+    assert second.parts[0].text == "what should I take next?"
+    assert [part.text for part in second.parts[1:]] == [
+        DUPLICATE_NOTE.format(name="Attachment 1")
+    ]
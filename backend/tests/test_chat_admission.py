@@ -0,0 +1,127 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+import asyncio
+from backend.admission import ChatAdmission, AdmissionRejected
+
+
+def test_overlapping_session_rejected():
+    async def run():
+        admission = ChatAdmission(max_active=2, max_queue=2, queue_timeout=1)
+        await admission.acquire("a")
+        try:
+            await admission.acquire("a")
+        except AdmissionRejected as e:
+            assert e.status_code == 429
+        else:
+            raise AssertionError("second message for session 'a' was admitted")
+        admission.release("a")
+        await admission.acquire("a")
+        admission.release("a")
+
+    asyncio.run(run())
+
+
+def test_overlapping_session_queued():
+    async def run():
+        admission = ChatAdmission(
+            max_active=2, max_queue=2, queue_timeout=1, session_policy="queue"
+        )
+        order = []
+
+        async def chat(tag):
+            await admission.acquire("a")
+            order.append(tag)
+            await asyncio.sleep(0.01)
+            admission.release("a")
+
+        await asyncio.gather(chat(1), chat(2))
+        assert order == [1, 2]
+
+    asyncio.run(run())
+
+
+def test_full_queue_rejected_with_retry_hint():
+    async def run():
+        admission = ChatAdmission(max_active=1, max_queue=1, queue_timeout=1)
+        await admission.acquire("a")
+        waiter = asyncio.create_task(admission.acquire("b"))
+        await asyncio.sleep(0)
+
+        try:
+            await admission.acquire("c")
+        except AdmissionRejected as e:
+            assert e.status_code == 503
+            assert e.retry_after >= 1
+        else:
+            raise AssertionError("request was admitted past a full queue")
+
+        admission.release("a")
+        await waiter
+        admission.release("b")
+
+    asyncio.run(run())
+
+
+def test_queue_timeout():
+    async def run():
+        admission = ChatAdmission(max_active=1, max_queue=5, queue_timeout=0.05)
+        await admission.acquire("a")
+        try:
+            await admission.acquire("b")
+        except AdmissionRejected as e:
+            assert e.status_code == 503
+        else:
+            raise AssertionError("request was admitted while the only slot was held")
+        admission.release("a")
+        assert not admission._sessions
+
+    asyncio.run(run())
+
+
+def test_slot_freed_when_the_response_body_never_starts(monkeypatch):
+    from backend import server
+    from backend.types import ChatRequest
+
+    async def chat_stream(*args):
+        yield {"type": "text", "content": "hi"}
+
+    async def disconnected():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        raise OSError("client went away")
+
+    async def run():
+        admission = ChatAdmission(max_active=1, max_queue=1, queue_timeout=0.05)
+        monkeypatch.setattr(server, "CHAT_ADMISSION", admission)
+        monkeypatch.setattr(server, "is_ready", lambda capability: True)
+        monkeypatch.setattr(server, "gemini_call_stream", chat_stream)
+        request = ChatRequest(sessionID="a", query="hi", term="202610")
+
+        # sending the response start fails, and the client disconnects right away
+        for spec_version in ("2.4", "2.0"):
+            response = await server.chat_endpoint(request)
+            scope = {"type": "http", "asgi": {"spec_version": spec_version}}
+            try:
+                await response(scope, disconnected, send)
+            except Exception:
+                pass
+            assert not admission._sessions and admission._active == 0
+
+        # a response sent in full releases once
+        response = await server.chat_endpoint(request)
+        sent = []
+
+        async def collect(message):
+            sent.append(message)
+
+        await response({"type": "http", "asgi": {"spec_version": "2.4"}}, None, collect)
+        assert sent[1]["body"] == b'{"type":"text","content":"hi"}\n'
+        await admission.acquire("a")
+        admission.release("a")
+
+    asyncio.run(run())
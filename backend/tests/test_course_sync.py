@@ -0,0 +1,195 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+import pytest
+from backend import constants as c
+from backend import functions
+from backend.types import CourseInfoModel, UserFulfilled
+from backend.vector_index import COURSE_INDEX
+
+
+class FakeCollection:
+    """The parts of a Chroma collection sync_course_index uses, counting calls."""
+
+    def __init__(self):
+        self.rows = {}
+        self.calls = {"get": 0, "upsert": 0, "delete": 0}
+
+    def get(self, include, limit, offset):
+        self.calls["get"] += 1
+        ids = sorted(self.rows)[offset : offset + limit]
+        return {"ids": ids, "metadatas": [self.rows[i]["metadata"] for i in ids]}
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.calls["upsert"] += 1
+        for i, e, d, m in zip(ids, embeddings, documents, metadatas):
+            self.rows[i] = {"embedding": e, "document": d, "metadata": m}
+
+    def delete(self, ids):
+        self.calls["delete"] += 1
+        for i in ids:
+            del self.rows[i]
+
+
+def course(title, desc):
+    return CourseInfoModel.model_construct(title=title, desc=desc)
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    collection = FakeCollection()
+    embedded = []
+
+    def embed(documents):
+        embedded.extend(documents)
+        return [[float(len(d)), 1.0] for d in documents]
+
+    monkeypatch.setattr(c, "_CHROMA_COLLECTION", collection)
+    monkeypatch.setattr(c, "_ef", embed)
+    saved = dict(c.COURSE_DATA)
+    c.COURSE_DATA.clear()
+    yield collection, embedded
+    c.COURSE_DATA.clear()
+    c.COURSE_DATA.update(saved)
+    COURSE_INDEX.delete(list(collection.rows))
+
+
+def test_sync_upserts_changes_and_deletes_removed_courses(catalog):
+    collection, embedded = catalog
+    for i in range(25):
+        c.COURSE_DATA[f"CS {100 + i}"] = course(f"Course {i}", "desc")
+
+    first = functions.sync_course_index(batch_size=10)
+    assert first["upserted"] == 25 and first["deleted"] == 0
+    assert collection.calls["upsert"] == 3
+    assert len(COURSE_INDEX) == 25
+
+    embedded.clear()
+    c.COURSE_DATA["CS 100"] = course("Course 0", "new desc")
+    del c.COURSE_DATA["CS 101"]
+    c.COURSE_DATA["CS 200"] = course("New", "desc")
+
+    second = functions.sync_course_index(batch_size=10)
+    assert (second["upserted"], second["deleted"]) == (2, 1)
+    assert embedded == ["Course 0 new desc", "New desc"]
+    assert set(collection.rows) == set(c.COURSE_DATA)
+    assert "CS 101" not in {r[0] for r in COURSE_INDEX.query([1.0, 1.0], None, 100)}
+    assert len(COURSE_INDEX) == 25
+
+
+def test_stored_hashes_reads_in_pages(catalog):
+    collection, _ = catalog
+    for i in range(7):
+        collection.rows[f"CS {i}"] = {"metadata": {"hash": str(i)}}
+
+    stored = functions._stored_hashes(page_size=3)
+
+    assert stored == {f"CS {i}": (str(i), "torch") for i in range(7)}
+    assert collection.calls["get"] == 3
+
+
+def test_sync_reembeds_when_the_embedding_variant_changes(catalog, monkeypatch):
+    collection, embedded = catalog
+    for i in range(3):
+        c.COURSE_DATA[f"CS {100 + i}"] = course(f"Course {i}", "desc")
+    functions.sync_course_index()
+
+    embedded.clear()
+    monkeypatch.setattr(functions, "EMBEDDING_VARIANT", "onnx:onnx/model.onnx")
+    result = functions.sync_course_index()
+
+    assert result["upserted"] == 3 and len(embedded) == 3
+    assert {
+        row["metadata"]["embedding_variant"] for row in collection.rows.values()
+    } == {"onnx:onnx/model.onnx"}
+    assert functions.sync_course_index()["upserted"] == 0
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    monkeypatch.setattr(c, "_REDIS", fakeredis.FakeRedis(decode_responses=True))
+    saved = dict(c.COURSE_DATA), set(c.VALID_COURSE_NAMES), dict(c.term_courses)
+    yield c._REDIS
+    for target, values in zip((c.COURSE_DATA, c.VALID_COURSE_NAMES), saved):
+        target.clear()
+        target.update(values)
+    c.term_courses.clear()
+    c.term_courses.update(saved[2])
+
+
+def catalog_records(names):
+    return {
+        name: CourseInfoModel(
+            prereq_tree=None,
+            coreq_tree=None,
+            restrictions=[],
+            desc="desc",
+            title=name,
+            credits=3.0,
+            sections={"202610": {}},
+        )
+        for name in names
+    }
+
+
+def test_readers_never_see_a_refresh_half_done(redis, monkeypatch):
+    import threading
+
+    monkeypatch.setattr(functions, "sync_lexical_index", lambda: None)
+    small = catalog_records(f"CS {i}" for i in range(100, 150))
+    large = catalog_records(f"CS {i}" for i in range(100, 400))
+    functions.set_redis_course_data(small)
+    functions.set_local_data()
+    functions.construct_term_courses()
+
+    errors, sizes = [], []
+    stop = threading.Event()
+
+    def read():
+        try:
+            while not stop.is_set():
+                sizes.append(len(c.COURSE_DATA))
+                functions.get_available_courses(UserFulfilled(), True, True, "202610")
+                functions.best_course_matches("CS 1")
+                functions.construct_term_courses()
+        except Exception as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=read) for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    for i in range(20):
+        functions.set_redis_course_data(large if i % 2 == 0 else small)
+        functions.refresh_course_data()
+    stop.set()
+    for reader in readers:
+        reader.join()
+
+    assert errors == []
+    assert min(sizes) >= 50
+
+
+def test_updates_during_the_startup_sync_sync_again(redis, monkeypatch):
+    synced = []
+    monkeypatch.setattr(functions, "sync_lexical_index", lambda: None)
+    monkeypatch.setattr(functions, "sync_course_index", lambda: synced.append(1))
+    monkeypatch.setattr(c, "get_chroma_collection", lambda: None)
+    monkeypatch.setitem(c.STARTUP_STATE, "search", {"status": "running"})
+    functions.set_redis_course_data(catalog_records(["CS 100"]))
+
+    def initialize_database():
+        # the collection may not be loaded yet, the update must not sync itself
+        functions.refresh_course_data()
+        assert synced == []
+
+    monkeypatch.setattr(functions, "initialize_database", initialize_database)
+    functions._sync_search_stage()
+    assert synced == [1]
+
+    c.STARTUP_STATE["search"]["status"] = "ready"
+    functions.refresh_course_data()
+    assert synced == [1, 1]
@@ -0,0 +1,96 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+import threading
+import time
+
+import pytest
+
+from backend.scrapers.description_cache import (
+    DescriptionCache,
+    process_descriptions,
+    prompt_version,
+)
+
+fakeredis = pytest.importorskip("fakeredis")
+
+TREE = {
+    "prereq_tree": {"type": "COURSE", "course": "CS 100", "min_grade": None},
+    "coreq_tree": None,
+    "restrictions": [],
+}
+
+
+class FakeModel:
+    def __init__(self, result=TREE, delay=0.0):
+        self.result = result
+        self.delay = delay
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, description):
+        with self.lock:
+            self.calls.append(description)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delay)
+        with self.lock:
+            self.running -= 1
+        return self.result
+
+
+@pytest.fixture
+def cache():
+    return DescriptionCache("description_cache", redis=fakeredis.FakeRedis())
+
+
+def test_whitespace_changes_and_cross_listings_hit_the_cache(cache):
+    model = FakeModel()
+    version = prompt_version("prompt", "model")
+
+    first = process_descriptions(
+        ["Prerequisite: CS 100.", "Prerequisite:  CS 100. "], model, cache, version
+    )
+    second = process_descriptions(["\nPrerequisite: CS 100.\n"], model, cache, version)
+
+    assert model.calls == ["Prerequisite: CS 100."]
+    assert list(first.values()) == [TREE, TREE]
+    assert second == {"\nPrerequisite: CS 100.\n": TREE}
+
+
+def test_a_new_prompt_version_misses(cache):
+    model = FakeModel()
+
+    process_descriptions(["CS 100"], model, cache, prompt_version("v1", "model"))
+    process_descriptions(["CS 100"], model, cache, prompt_version("v2", "model"))
+    process_descriptions(["CS 100"], model, cache, prompt_version("v1", "other"))
+
+    assert len(model.calls) == 3
+
+
+def test_failed_calls_are_returned_but_not_cached(cache):
+    version = prompt_version("prompt", "model")
+    for failure in (None, {}, {"error": "JSON Parse Error", "raw_response": "{"}):
+        model = FakeModel(result=failure)
+        assert process_descriptions(["CS 100"], model, cache, version) == {
+            "CS 100": failure
+        }
+        assert model.calls == ["CS 100"]
+
+
+def test_bulk_mode_only_sends_misses_with_bounded_concurrency(cache):
+    version = prompt_version("prompt", "model")
+    process_descriptions(["cached"], FakeModel(), cache, version)
+    model = FakeModel(delay=0.02)
+
+    descriptions = ["cached"] + [f"course {i}" for i in range(12)]
+    results = process_descriptions(descriptions, model, cache, version, workers=3)
+
+    assert sorted(model.calls) == sorted(descriptions[1:])
+    assert model.max_running == 3
+    assert set(results) == set(descriptions)
@@ -0,0 +1,96 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+import asyncio
+
+import pytest
+
+from backend import constants as c
+from backend import functions
+from backend.functions import gemini_call_stream
+from backend.models import FakeBackend
+from backend.types import CourseQueryFormat
+
+fakeredis = pytest.importorskip("fakeredis")
+
+SCRIPT = {
+    "rules": [
+        {"match": "thanks", "calls": []},
+        {
+            "match": ".*",
+            "calls": [
+                {"name": "course_query", "args": {"query": "{message}", "top_n": 3}},
+                {"name": "get_term", "args": {}},
+            ],
+        },
+    ],
+    "reply": "Here are three courses.",
+}
+
+
+@pytest.fixture
+def queries(monkeypatch):
+    received = []
+
+    def course_query(args: CourseQueryFormat):
+        received.append(args)
+        return {"search_result": [{"id": "CS 280"}]}
+
+    def get_term():
+        return {"response": "2026 Fall"}
+
+    monkeypatch.setattr(
+        functions,
+        "get_tools",
+        lambda prereqs, term, on_data=None: [course_query, get_term],
+    )
+    monkeypatch.setattr(
+        c, "_ASYNC_REDIS", fakeredis.FakeAsyncRedis(decode_responses=True)
+    )
+    monkeypatch.setattr(
+        c, "_MODEL_BACKEND", FakeBackend(SCRIPT, token_delay=0, first_token_delay=0)
+    )
+    return received
+
+
+async def chat(message, session_id):
+    chunks = [c async for c in gemini_call_stream(message, session_id, "202610")]
+    return chunks, (await functions.SESSION_STORE.load(session_id)).history
+
+
+def test_scripted_turns_replay_through_the_chat_stream(queries):
+    chunks, history = asyncio.run(chat('intro "ML" courses', "fake-1"))
+
+    assert "".join(chunk["content"] for chunk in chunks) == SCRIPT["reply"]
+    assert {chunk["type"] for chunk in chunks} == {"text"}
+    # the scripted calls ran the tools with the message substituted in
+    assert queries == [CourseQueryFormat(query='intro "ML" courses', top_n=3)]
+
+    assert [content.role for content in history] == ["user", "model", "user", "model"]
+    assert history[0].parts[0].text == 'intro "ML" courses'
+    assert [part.function_call.name for part in history[1].parts] == [
+        "course_query",
+        "get_term",
+    ]
+    assert [part.function_response.response for part in history[2].parts] == [
+        {"search_result": [{"id": "CS 280"}]},
+        {"response": "2026 Fall"},
+    ]
+    assert history[3].parts[0].text == SCRIPT["reply"]
+
+
+def test_messages_without_scripted_calls_get_the_reply(queries):
+    async def run():
+        await chat("courses on databases", "fake-2")
+        return await chat("thanks!", "fake-2")
+
+    chunks, history = asyncio.run(run())
+
+    assert "".join(chunk["content"] for chunk in chunks) == SCRIPT["reply"]
+    assert len(queries) == 1
+    # the second message continued the stored conversation
+    assert [content.role for content in history[4:]] == ["user", "model"]
+    assert history[-1].parts[0].text == SCRIPT["reply"]
@@ -0,0 +1,77 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+import json
+from backend.history import (
+    compact_history,
+    decode_history,
+    encode_history,
+    split_turns,
+)
+
+
+def make_turn(i, results=20):
+    return [
+        {"role": "user", "parts": [{"text": f"message {i}"}]},
+        {
+            "role": "model",
+            "parts": [{"function_call": {"name": "course_query", "args": {}}}],
+        },
+        {
+            "role": "user",
+            "parts": [
+                {
+                    "function_response": {
+                        "name": "course_query",
+                        "response": {
+                            "search_result": [
+                                {"id": f"CS {j}", "document": "x" * 200}
+                                for j in range(results)
+                            ]
+                        },
+                    }
+                }
+            ],
+        },
+        {"role": "model", "parts": [{"text": f"answer {i}"}]},
+    ]
+
+
+def test_turns_capped_and_paired():
+    entries = [entry for i in range(12) for entry in make_turn(i)]
+    compacted = compact_history(entries, max_turns=5, max_tokens=10**6)
+
+    turns = split_turns(compacted)
+    assert len(turns) == 5
+    assert turns[0][0]["parts"][0]["text"] == "message 7"
+    for turn in turns:
+        assert "function_call" in turn[1]["parts"][0]
+        assert "function_response" in turn[2]["parts"][0]
+
+
+def test_older_tool_outputs_compacted():
+    entries = make_turn(0) + make_turn(1)
+    compacted = compact_history(entries, max_turns=5, max_tokens=10**6)
+
+    old = compacted[2]["parts"][0]["function_response"]["response"]
+    latest = compacted[6]["parts"][0]["function_response"]["response"]
+    assert old == {"course_ids": [f"CS {j}" for j in range(20)]}
+    assert len(latest["search_result"]) == 20
+
+    # compacting again must not change already compacted turns
+    assert compact_history(compacted, max_turns=5, max_tokens=10**6) == compacted
+
+
+def test_token_budget_keeps_latest_turn():
+    entries = [entry for i in range(5) for entry in make_turn(i, results=50)]
+    compacted = compact_history(entries, max_turns=5, max_tokens=100)
+    assert split_turns(compacted) == [make_turn(4, results=50)]
+
+
+def test_encoding_round_trip_and_legacy():
+    entries = make_turn(0)
+    assert decode_history(encode_history(entries)) == entries
+    assert decode_history(json.dumps(entries)) == entries
@@ -0,0 +1,45 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+import json
+
+import pytest
+
+from backend.scrapers.parsing import parse_catalog_html, parse_sections_html
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def fixture(name: str, mode: str = "r"):
+    encoding = None if "b" in mode else "utf-8"
+    with open(os.path.join(FIXTURES_DIR, name), mode, encoding=encoding) as f:
+        return json.load(f) if name.endswith(".json") else f.read()
+
+
+# the golden files hold the output of the original BeautifulSoup parser
+@pytest.mark.parametrize("engine", ["bs4", "lxml"])
+def test_section_page_matches_the_golden_output(engine):
+    parsed = parse_sections_html(fixture("sections_cs.html"), engine=engine)
+
+    assert parsed == fixture("sections_cs.json")
+
+
+@pytest.mark.parametrize("engine", ["bs4", "lxml"])
+@pytest.mark.parametrize("mode", ["r", "rb"])
+def test_catalog_page_matches_the_golden_output(engine, mode):
+    parsed = parse_catalog_html(fixture("catalog_computing.html", mode), engine=engine)
+
+    assert parsed == fixture("catalog_computing.json")
+
+
+def test_pages_lxml_cannot_read_fall_back_to_bs4():
+    assert parse_sections_html("", engine="lxml") == []
+    assert parse_catalog_html(b"", engine="lxml") == []
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        parse_sections_html("<h4></h4>", engine="regex")
@@ -0,0 +1,63 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+import threading
+
+import numpy as np
+import pytest
+from backend.inference import EmbeddingCache, MicroBatcher, embed_query
+
+
+def test_concurrent_calls_share_a_batch_and_get_their_own_results():
+    batches = []
+
+    def double(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher("test", double, window=0.05, max_batch=100)
+    results = {}
+
+    def call(i):
+        results[i] = batcher([i, i + 100])
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == {i: [2 * i, 2 * (i + 100)] for i in range(8)}
+    assert len(batches) < 8
+    assert sum(len(b) for b in batches) == 16
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    def fail(items):
+        raise RuntimeError("model failed")
+
+    batcher = MicroBatcher("test", fail, window=0.01)
+    with pytest.raises(RuntimeError):
+        batcher(["a"])
+    # the worker keeps serving later calls
+    with pytest.raises(RuntimeError):
+        batcher(["b"])
+
+
+def test_embed_query_caches_normalized_queries():
+    calls = []
+
+    def embed(texts):
+        calls.append(texts)
+        return [np.ones(4) * len(t) for t in texts]
+
+    cache = EmbeddingCache()
+    first = embed_query("Intro  Machine Learning", cache=cache, embed=embed)
+    second = embed_query("intro machine learning ", cache=cache, embed=embed)
+
+    assert calls == [["intro machine learning"]]
+    assert second is first
+    assert not first.flags.writeable
@@ -0,0 +1,54 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from backend.lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+
+COURSES = {
+    "CS 341": "Foundations of Computer Science II Automata, grammars and computability.",
+    "CS 490": "Guided Design in Software Engineering Capstone project in teams.",
+    "CS 100": "Roadmap to Computing Introduction to programming in Python.",
+    "MATH 341": "Statistical Methods II Regression and analysis of variance.",
+}
+
+
+def test_course_codes_match_in_any_spelling():
+    assert "cs341" in tokenize("CS 341")
+    assert "cs341" in tokenize("cs-341")
+    assert tokenize("cs341") == ["cs", "341", "cs341"]
+
+
+def test_query_ranks_exact_matches_first():
+    index = LexicalIndex()
+    index.sync(COURSES)
+
+    assert index.query("CS 341", 2)[0][0] == "CS 341"
+    assert index.query("a capstone course", 2)[0][0] == "CS 490"
+    assert [i for i, _ in index.query("python", 5)] == ["CS 100"]
+    assert index.query(
+        "CS 341", 5, allowed=lambda ids: [i for i in ids if "MATH" in i]
+    )[0][0] == ("MATH 341")
+
+
+def test_sync_only_reindexes_changes():
+    index = LexicalIndex()
+    assert index.sync(COURSES) == (4, 0)
+
+    changed = dict(COURSES)
+    changed["CS 100"] = "Roadmap to Computing Introduction to programming in Java."
+    del changed["CS 490"]
+
+    assert index.sync(changed) == (1, 1)
+    assert len(index) == 3
+    assert index.query("python", 5) == []
+    assert index.query("capstone", 5) == []
+    assert index.query("java", 5)[0][0] == "CS 100"
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]])
+
+    assert [i for i, _ in fused][:2] == ["c", "a"]
+    assert {i for i, _ in fused} == {"a", "b", "c", "d"}
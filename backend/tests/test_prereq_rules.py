@@ -0,0 +1,73 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+import json
+
+import pytest
+
+from backend.scrapers.prereq_rules import canonical_tree, parse_description
+from backend.types import CourseInfoModel
+
+with open(
+    os.path.join(os.path.dirname(__file__), "fixtures", "prereq_trees.json"),
+    "r",
+    encoding="utf-8",
+) as f:
+    # descriptions with trees in the model's output format, "fallback" ones are left to it
+    CASES = json.load(f)
+
+with open(
+    os.path.join(os.path.dirname(__file__), "fixtures", "catalog_prereqs.json"),
+    "r",
+    encoding="utf-8",
+) as f:
+    # descriptions as scraped from the catalog, unedited
+    CATALOG = json.load(f)
+
+
+@pytest.mark.parametrize(
+    "case", [c for c in CASES if not c.get("fallback")], ids=lambda c: c["desc"][:40]
+)
+def test_rules_match_the_model_trees(case):
+    parsed = parse_description(case["desc"])
+
+    assert parsed is not None
+    assert canonical_tree(parsed["prereq_tree"]) == canonical_tree(case["prereq_tree"])
+    assert parsed["coreq_tree"] is None and parsed["restrictions"] == []
+    CourseInfoModel.model_validate(
+        dict(parsed, desc=case["desc"], title="", sections={})
+    )
+
+
+@pytest.mark.parametrize(
+    "case", [c for c in CASES if c.get("fallback")], ids=lambda c: c["desc"][:40]
+)
+def test_anything_unusual_falls_back_to_the_model(case):
+    assert parse_description(case["desc"]) is None
+
+
+def test_rules_on_real_catalog_descriptions():
+    for case in CATALOG:
+        parsed = parse_description(case["desc"])
+        if case.get("fallback"):
+            assert parsed is None, case["desc"]
+        else:
+            assert parsed is not None, case["desc"]
+            assert canonical_tree(parsed["prereq_tree"]) == canonical_tree(
+                case["prereq_tree"]
+            )
+
+
+def test_canonical_tree_ignores_order_and_nesting_of_the_same_operator():
+    a = {"type": "COURSE", "course": "CS 100", "min_grade": None}
+    b = {"type": "COURSE", "course": "CS 101", "min_grade": None}
+    c = {"type": "COURSE", "course": "CS 102", "min_grade": "C"}
+
+    nested = {"type": "AND", "children": [a, {"type": "AND", "children": [c, b]}]}
+    flat = {"type": "AND", "children": [b, c, a]}
+
+    assert canonical_tree(nested) == canonical_tree(flat)
+    assert canonical_tree({"type": "OR", "children": [a, b, c]}) != canonical_tree(flat)
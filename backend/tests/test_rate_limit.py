@@ -0,0 +1,59 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+import threading
+import time
+
+from backend.scrapers.rate_limit import RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_requests_are_spaced_by_the_rate_after_the_burst():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=10, burst=2, clock=clock, sleep=clock.sleep)
+
+    waits = [limiter.acquire() for _ in range(5)]
+
+    assert waits[:2] == [0.0, 0.0]
+    assert all(abs(w - 0.1) < 1e-9 for w in waits[2:])
+    assert abs(clock.now - 0.3) < 1e-9
+
+
+def test_idle_time_refills_up_to_the_burst():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=10, burst=3, clock=clock, sleep=clock.sleep)
+    for _ in range(3):
+        limiter.acquire()
+
+    clock.now += 10
+    assert [limiter.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire() > 0
+
+
+def test_concurrent_workers_share_the_rate():
+    limiter = RateLimiter(rate=200)
+    start = time.monotonic()
+    threads = [
+        threading.Thread(target=lambda: [limiter.acquire() for _ in range(10)])
+        for _ in range(4)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # 40 requests at 200/s after a burst of 1
+    assert time.monotonic() - start >= 39 / 200 * 0.9
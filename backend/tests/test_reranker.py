@@ -0,0 +1,81 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from backend.reranker import ScoreCache, rerank, select_candidates
+
+
+def make_candidates(distances):
+    return [
+        {"id": f"CS {100 + i}", "document": f"doc {i}", "init_distance": d}
+        for i, d in enumerate(distances)
+    ]
+
+
+class CountingScorer:
+    """Scores documents by a fixed table and counts the pairs it was asked for."""
+
+    def __init__(self, scores):
+        self.scores = scores
+        self.pairs = 0
+
+    def __call__(self, pairs):
+        self.pairs += len(pairs)
+        return [self.scores[document] for _, document in pairs]
+
+
+def test_select_candidates_scales_with_top_n_and_close_distances():
+    spread = make_candidates([0.1 * i for i in range(100)])
+    assert len(select_candidates(spread, 2, min_candidates=10, per_result=5)) == 10
+    assert len(select_candidates(spread, 4, min_candidates=10, per_result=5)) == 20
+
+    # everything within the margin of the top_n-th candidate is kept
+    bunched = make_candidates([0.5 + 0.001 * i for i in range(100)])
+    assert (
+        len(
+            select_candidates(
+                bunched, 2, min_candidates=10, per_result=5, max_candidates=60
+            )
+        )
+        == 60
+    )
+
+
+def test_rerank_stops_early_and_matches_full_rerank():
+    candidates = make_candidates([0.01 * i for i in range(64)])
+    # the bi-encoder order is mostly right, a few near the top are swapped
+    scores = {c["document"]: 10.0 - i for i, c in enumerate(candidates)}
+    scores["doc 3"], scores["doc 0"] = scores["doc 0"], scores["doc 3"]
+    scorer = CountingScorer(scores)
+    full = rerank(
+        "ml",
+        candidates,
+        3,
+        batch_size=8,
+        stop_margin=None,
+        cache=None,
+        score_fn=CountingScorer(scores),
+    )
+
+    staged = rerank(
+        "ml", candidates, 3, batch_size=8, stop_margin=3, cache=None, score_fn=scorer
+    )
+
+    assert [c["id"] for c in staged[:3]] == [c["id"] for c in full[:3]]
+    assert staged[0]["id"] == "CS 103"
+    assert scorer.pairs < len(candidates)
+
+
+def test_rerank_reuses_cached_scores():
+    candidates = make_candidates([0.1, 0.2, 0.3])
+    scorer = CountingScorer({"doc 0": 1.0, "doc 1": 3.0, "doc 2": 2.0})
+    cache = ScoreCache()
+
+    first = rerank("Databases ", candidates, 2, cache=cache, score_fn=scorer)
+    second = rerank("databases", candidates, 2, cache=cache, score_fn=scorer)
+
+    assert [c["id"] for c in first] == ["CS 101", "CS 102", "CS 100"]
+    assert second == first
+    assert scorer.pairs == 3
@@ -0,0 +1,92 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from backend.resilience import CircuitBreaker, ModelUnavailable, ResilientChat
+
+EXECUTOR = ThreadPoolExecutor(8)
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class ScriptedChat:
+    """Answers with `behaviour`: a delay before the first chunk, or an error to raise."""
+
+    def __init__(self, history, behaviour):
+        self._curated_history = list(history)
+        self.behaviour = behaviour
+
+    def send_message_stream(self, message):
+        if isinstance(self.behaviour, Exception):
+            raise self.behaviour
+        time.sleep(self.behaviour)
+        for word in ("hello", " world"):
+            yield Chunk(word)
+        self._curated_history.append(message)
+
+
+def make_chat(behaviours, breaker=None, **kwargs):
+    behaviours = iter(behaviours)
+    return ResilientChat(
+        lambda history: ScriptedChat(history, next(behaviours)),
+        [],
+        breaker=breaker or CircuitBreaker(failure_threshold=100),
+        executor=EXECUTOR,
+        **kwargs,
+    )
+
+
+async def collect(chat, message="hi"):
+    return "".join([chunk.text async for chunk in chat.send_message_stream(message)])
+
+
+def test_hedge_answers_when_primary_stalls():
+    chat = make_chat([2.0, 0.0], hedge=True, hedge_after=0.05)
+    start = time.monotonic()
+    assert asyncio.run(collect(chat)) == "hello world"
+    assert time.monotonic() - start < 1
+    assert chat.history == ["hi"]
+
+
+def test_transient_errors_retried():
+    chat = make_chat([ConnectionError("reset")], hedge=False, max_retries=2)
+    # the chat is created once, later attempts reuse it: fail once, then answer
+    chat.chat.behaviour = ConnectionError("reset")
+
+    async def run():
+        task = asyncio.ensure_future(collect(chat))
+        await asyncio.sleep(0.05)
+        chat.chat.behaviour = 0.0
+        return await task
+
+    assert asyncio.run(run()) == "hello world"
+
+    chat = make_chat([ValueError("bad request")], hedge=False, max_retries=2)
+    with pytest.raises(ModelUnavailable):
+        asyncio.run(collect(chat))
+
+
+def test_deadlines_and_circuit_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+    chat = make_chat(
+        [1.0], breaker, hedge=False, max_retries=0, first_chunk_timeout=0.05
+    )
+    with pytest.raises(ModelUnavailable):
+        asyncio.run(collect(chat))
+    assert breaker.is_open
+
+    # fails fast without calling the model
+    chat = make_chat([ValueError("not called")], breaker, hedge=False)
+    start = time.monotonic()
+    with pytest.raises(ModelUnavailable):
+        asyncio.run(collect(chat))
+    assert time.monotonic() - start < 0.05
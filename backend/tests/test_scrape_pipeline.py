@@ -0,0 +1,114 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+import threading
+import time
+
+from backend.scrapers.pipeline import run_pipeline
+
+
+def test_every_item_is_fetched_parsed_and_applied_on_the_calling_thread():
+    applied = {}
+    threads = set()
+
+    def apply(item, parsed):
+        threads.add(threading.get_ident())
+        applied[item] = parsed
+
+    stats = run_pipeline(
+        range(20),
+        fetch=lambda i: i * 2,
+        parse=lambda i, data: data + 1,
+        apply=apply,
+        fetch_workers=4,
+        parse_workers=2,
+        depth=3,
+    )
+
+    assert applied == {i: i * 2 + 1 for i in range(20)}
+    assert threads == {threading.get_ident()}
+    assert stats["applied"] == 20 and stats["failed"] == 0
+
+
+def test_items_between_fetch_and_apply_are_bounded_by_the_depth():
+    lock = threading.Lock()
+    held = {"now": 0, "max": 0}
+
+    def fetch(i):
+        with lock:
+            held["now"] += 1
+            held["max"] = max(held["max"], held["now"])
+        time.sleep(0.001)
+        return i
+
+    def apply(item, parsed):
+        time.sleep(0.002)
+        with lock:
+            held["now"] -= 1
+
+    stats = run_pipeline(
+        range(50),
+        fetch=fetch,
+        parse=lambda i, data: data,
+        apply=apply,
+        fetch_workers=8,
+        depth=4,
+    )
+
+    assert stats["applied"] == 50
+    assert held["max"] <= 4
+    assert stats["max_in_flight"] == 4
+
+
+def test_parsing_starts_before_the_slow_fetches_finish():
+    release = threading.Event()
+    parsed_early = []
+
+    def fetch(i):
+        if i == 0:
+            release.wait(5)
+        return i
+
+    def parse(i, data):
+        if i != 0:
+            parsed_early.append(i)
+            if len(parsed_early) == 3:
+                release.set()
+        return data
+
+    stats = run_pipeline(
+        range(4), fetch=fetch, parse=parse, apply=lambda i, p: None, fetch_workers=4
+    )
+
+    assert stats["applied"] == 4
+    assert sorted(parsed_early) == [1, 2, 3]
+
+
+def test_failures_are_reported_and_skipped():
+    errors = []
+    applied = []
+
+    def fetch(i):
+        if i == 1:
+            raise ConnectionError("timed out")
+        return i
+
+    def parse(i, data):
+        if i == 2:
+            raise ValueError("bad html")
+        return data
+
+    stats = run_pipeline(
+        range(5),
+        fetch=fetch,
+        parse=parse,
+        apply=lambda i, p: applied.append(i),
+        on_error=lambda i, e: errors.append((i, type(e))),
+    )
+
+    assert sorted(applied) == [0, 3, 4]
+    assert sorted(errors) == [(1, ConnectionError), (2, ValueError)]
+    assert stats == {"applied": 3, "failed": 2, "max_in_flight": 5}
@@ -0,0 +1,159 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+import json
+
+import pytest
+from backend import constants as c
+from backend import functions
+from backend.scrapers.deltas import section_events, term_section_events
+from backend.types import CourseInfoModel
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def row(section, crn, now="10", instructor="Itani, Ali", times="10:00 AM - 11:20 AM"):
+    return [
+        section,
+        crn,
+        "MW",
+        times,
+        "GITC 3700",
+        "Open",
+        "40",
+        now,
+        instructor,
+        "Face-to-Face",
+        "3",
+        "Info",
+        "",
+    ]
+
+
+def course(title="Intensive Programming in Linux", sections=None):
+    return CourseInfoModel(
+        prereq_tree=None,
+        coreq_tree=None,
+        restrictions=[],
+        desc="Linux",
+        title=title,
+        credits=3.0,
+        sections={"202610": sections or {"002": row("002", "12043")}},
+    )
+
+
+def test_section_events_are_keyed_by_crn():
+    old = {
+        "002": row("002", "12043"),
+        "004": row("004", "12044"),
+        "006": row("006", "12045"),
+    }
+    new = {
+        "002": row("002", "12043", now="11"),
+        "004": row("004", "12044", instructor="Sun, Chang", times="1:00 PM"),
+        "006": row("006", "12045"),
+        "101": row("101", "12046"),
+    }
+    del old["006"], new["006"]
+    old["008"] = row("008", "12047")
+
+    events = section_events("202610", "CS 288", old, new)
+    by_type = {(e["type"], e["crn"]): e for e in events}
+
+    assert set(by_type) == {
+        ("seats_changed", "12043"),
+        ("instructor_changed", "12044"),
+        ("section_updated", "12044"),
+        ("section_added", "12046"),
+        ("section_removed", "12047"),
+    }
+    seats = by_type[("seats_changed", "12043")]
+    assert seats["old"] == {"status": "Open", "max": "40", "now": "10"}
+    assert seats["new"]["now"] == "11"
+    assert seats["course"] == "CS 288" and seats["term"] == "202610"
+    instructor = by_type[("instructor_changed", "12044")]
+    assert (instructor["old"], instructor["new"]) == ("Itani, Ali", "Sun, Chang")
+    assert by_type[("section_updated", "12044")]["fields"] == {
+        "times": ["10:00 AM - 11:20 AM", "1:00 PM"]
+    }
+
+
+def test_unchanged_courses_and_tuples_produce_no_events():
+    old = {"CS 288": {"002": tuple(row("002", "12043"))}}
+    new = {"CS 288": {"002": row("002", "12043")}, "CS 100": {}}
+
+    assert term_section_events("202610", old, new) == []
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    server = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(c, "_REDIS", server)
+    saved = dict(c.COURSE_DATA)
+    c.COURSE_DATA.clear()
+    yield server
+    c.COURSE_DATA.clear()
+    c.COURSE_DATA.update(saved)
+
+
+def test_only_changed_records_are_written(redis):
+    functions.set_redis_course_data({"CS 288": course(), "CS 100": course("Roadmap")})
+
+    changed = course(sections={"002": row("002", "12043", now="12")})
+    functions.update_redis_course_data({"CS 288": changed}, removed=["CS 100"])
+
+    stored = functions.get_redis_course_data()
+    assert set(stored) == {"CS 288"}
+    assert stored["CS 288"].sections["202610"]["002"][7] == "12"
+
+
+def test_course_data_written_as_one_blob_is_still_read(redis):
+    redis.set(
+        c.REDIS_COURSES_KEY, json.dumps({"CS 288": course().model_dump(mode="json")})
+    )
+
+    assert set(functions.get_redis_course_data()) == {"CS 288"}
+    # moved into the records hash on the first read
+    assert redis.hkeys(c.REDIS_COURSE_RECORDS_KEY) == ["CS 288"]
+    assert not redis.exists(c.REDIS_COURSES_KEY)
+
+
+def test_partial_update_over_a_blob_keeps_the_other_courses(redis):
+    blob = {"CS 288": course(), "CS 100": course("Roadmap")}
+    redis.set(
+        c.REDIS_COURSES_KEY,
+        json.dumps({k: v.model_dump(mode="json") for k, v in blob.items()}),
+    )
+
+    changed = course(sections={"002": row("002", "12043", now="12")})
+    functions.update_redis_course_data({"CS 288": changed})
+
+    stored = functions.get_redis_course_data()
+    assert set(stored) == {"CS 288", "CS 100"}
+    assert stored["CS 288"].sections["202610"]["002"][7] == "12"
+    assert stored["CS 100"].title == "Roadmap"
+
+
+def test_change_messages_reload_only_the_listed_courses(redis, monkeypatch):
+    functions.set_redis_course_data({"CS 288": course(), "CS 100": course("Roadmap")})
+    functions.set_local_data()
+    untouched = c.COURSE_DATA["CS 100"]
+    functions.update_redis_course_data(
+        {"CS 288": course(sections={"002": row("002", "12043", now="12")})}
+    )
+    refreshed = []
+    monkeypatch.setattr(functions, "refresh_course_data", lambda: refreshed.append(1))
+
+    functions.handle_course_update(
+        json.dumps({"term": "202610", "courses": ["CS 288"], "events": []})
+    )
+
+    assert c.COURSE_DATA["CS 288"].sections["202610"]["002"][7] == "12"
+    assert c.COURSE_DATA["CS 100"] is untouched
+    assert refreshed == []
+
+    functions.handle_course_update("refresh")
+    assert refreshed == [1]
@@ -0,0 +1,121 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+import asyncio
+
+import pytest
+from google.genai import types
+
+from backend import constants as c
+from backend import metrics
+from backend.constants import SESSION_TTL_SECONDS
+from backend.sessions import SessionStore, load_session_sync, save_session_sync
+from backend.types import UserCourseInfo, UserFulfilled
+
+fakeredis = pytest.importorskip("fakeredis")
+
+FILES = {
+    "abc": {"uri": "files/abc", "mime_type": "application/pdf", "expires_at": None}
+}
+
+
+def history(answer):
+    return [
+        types.Content(role="user", parts=[types.Part(text="what can I take?")]),
+        types.Content(
+            role="model",
+            parts=[
+                types.Part.from_function_call(name="get_term", args={}),
+            ],
+        ),
+        types.Content(
+            role="user",
+            parts=[
+                types.Part.from_function_response(
+                    name="get_term", response={"response": "2026 Fall"}
+                )
+            ],
+        ),
+        types.Content(role="model", parts=[types.Part(text=answer)]),
+    ]
+
+
+def profile():
+    return UserFulfilled(
+        new_user=False,
+        courses={"CS 100": UserCourseInfo(name="CS 100", grade="B")},
+        standing="JUNIOR",
+    )
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    server = fakeredis.FakeServer()
+    async_redis = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    sync_redis = fakeredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr(c, "_ASYNC_REDIS", async_redis)
+    monkeypatch.setattr(c, "_REDIS", sync_redis)
+    return sync_redis
+
+
+def test_save_then_load_round_trip(redis):
+    async def run():
+        await SessionStore().save("s1", history("CS 280"), profile(), FILES)
+        # a fresh store has nothing cached and reads Redis
+        return await SessionStore().load("s1")
+
+    session = asyncio.run(run())
+    assert [h.model_dump(exclude_none=True) for h in session.history] == [
+        h.model_dump(exclude_none=True) for h in history("CS 280")
+    ]
+    assert session.prereqs == profile()
+    assert session.prereqs_raw == profile().model_dump_json()
+    assert session.files == FILES
+    assert session.version == 1
+
+
+def test_cached_session_is_rejected_after_another_write(redis):
+    async def run():
+        worker, other = SessionStore(), SessionStore()
+        await worker.save("s2", history("first"), profile())
+
+        hits = metrics.snapshot()["counters"].get("sessions.cache_hits", 0)
+        cached = await worker.load("s2")
+        assert metrics.snapshot()["counters"]["sessions.cache_hits"] == hits + 1
+        # changes to a loaded session don't leak into the cache
+        cached.history.clear()
+        assert len((await worker.load("s2")).history) == 4
+
+        # another worker answers the next message and bumps the version
+        await other.save("s2", history("second"), UserFulfilled())
+        return await worker.load("s2")
+
+    session = asyncio.run(run())
+    assert session.history[-1].parts[0].text == "second"
+    assert session.prereqs == UserFulfilled()
+    assert session.version == 2
+
+
+def test_least_recently_used_sessions_are_evicted(redis):
+    async def run():
+        store = SessionStore(max_sessions=2)
+        for session_id in ("a", "b", "c"):
+            await store.save(session_id, history(session_id), profile())
+        return list(store._cache)
+
+    assert asyncio.run(run()) == ["b", "c"]
+
+
+def test_every_session_key_expires(redis):
+    asyncio.run(SessionStore().save("s3", history("x"), profile(), FILES))
+    save_session_sync("s4", history("y"), profile())
+
+    for key in ("s3:history", "s3:prereqs", "s3:version", "s3:files"):
+        assert 0 < redis.ttl(key) <= SESSION_TTL_SECONDS
+    for key in ("s4:history", "s4:prereqs", "s4:version"):
+        assert 0 < redis.ttl(key) <= SESSION_TTL_SECONDS
+    history_raw, prereqs_raw = load_session_sync("s4")
+    assert history_raw and prereqs_raw == profile().model_dump_json()
@@ -0,0 +1,65 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+import threading
+import time
+
+from backend import constants as c
+from backend import metrics
+from backend.metrics import InstrumentedExecutor
+
+
+def test_prompt_is_reread_only_when_it_changes(tmp_path):
+    path = str(tmp_path / "prompt.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("first prompt")
+    assert c.read_prompt(path) == "first prompt"
+
+    # same mtime, the cached text is returned
+    mtime = os.path.getmtime(path)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("edited in place")
+    os.utime(path, (mtime, mtime))
+    assert c.read_prompt(path) == "first prompt"
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("second prompt")
+    os.utime(path, (mtime + 1, mtime + 1))
+    assert c.read_prompt(path) == "second prompt"
+
+
+def test_executor_reports_queue_and_run_metrics():
+    executor = InstrumentedExecutor("test_pool", max_workers=1)
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocking():
+        started.set()
+        release.wait(5)
+        return "first"
+
+    first = executor.submit(blocking)
+    assert started.wait(5)
+    second = executor.submit(lambda: "second")
+
+    gauges = metrics.snapshot()["gauges"]
+    assert gauges["executor.test_pool.workers"] == 1
+    assert gauges["executor.test_pool.active"] == 1
+    assert gauges["executor.test_pool.queued"] == 1
+    assert gauges["executor.test_pool.utilization"] == 1.0
+
+    time.sleep(0.05)
+    release.set()
+    assert (first.result(5), second.result(5)) == ("first", "second")
+    executor.shutdown()
+
+    snapshot = metrics.snapshot()
+    assert snapshot["gauges"]["executor.test_pool.active"] == 0
+    assert snapshot["gauges"]["executor.test_pool.queued"] == 0
+    waits = snapshot["timings"]["executor.test_pool.wait_seconds"]
+    assert waits["count"] == 2
+    # the second task waited for the only worker
+    assert waits["max"] >= 0.05
@@ -0,0 +1,106 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import functions
+from backend.constants import STARTUP_STATE
+from backend.server import app
+
+
+@pytest.fixture
+def client():
+    saved = dict(STARTUP_STATE)
+    STARTUP_STATE.clear()
+    # without a with block the startup event (and its background threads) doesn't run
+    yield TestClient(app)
+    STARTUP_STATE.clear()
+    STARTUP_STATE.update(saved)
+
+
+def stub_stages(monkeypatch, **fns):
+    stages = {
+        name: (fns.get(name, lambda: None), deps)
+        for name, (_, deps) in functions.STARTUP_STAGES.items()
+    }
+    monkeypatch.setattr(functions, "STARTUP_STAGES", stages)
+
+
+def test_ready_is_503_while_stages_run_or_failed(client, monkeypatch):
+    loaded = threading.Event()
+    running = threading.Event()
+
+    def load_data():
+        running.set()
+        assert loaded.wait(5)
+
+    def load_embeddings():
+        raise RuntimeError("no model")
+
+    stub_stages(monkeypatch, data=load_data, embeddings=load_embeddings)
+    startup = threading.Thread(target=functions.run_startup_stages)
+    startup.start()
+    assert running.wait(5)
+
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["stages"]["data"]["status"] == "running"
+    response = client.get("/getcourses")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+
+    loaded.set()
+    startup.join(5)
+
+    response = client.get("/ready")
+    body = response.json()
+    assert response.status_code == 503
+    assert body["capabilities"] == {"courses": True, "profs": True, "chat": False}
+    assert body["stages"]["embeddings"]["status"] == "failed"
+    assert body["stages"]["search"]["status"] == "skipped"
+    assert client.get("/getcourses").status_code == 200
+    response = client.post(
+        "/chat", json={"query": "hi", "sessionID": "a", "term": "202610"}
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+
+
+def test_ready_once_every_stage_is_ready(client, monkeypatch):
+    stub_stages(monkeypatch)
+    functions.run_startup_stages()
+
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["ready"] is True
+
+
+def test_concurrent_getters_build_one_singleton(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from backend import constants as c
+    from backend import metrics
+
+    monkeypatch.setattr(c, "_TOOL_EXECUTOR", None)
+    built = []
+
+    class SlowExecutor(metrics.InstrumentedExecutor):
+        def __init__(self, *args):
+            time.sleep(0.05)
+            built.append(self)
+            super().__init__(*args)
+
+    monkeypatch.setattr(metrics, "InstrumentedExecutor", SlowExecutor)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        executors = list(pool.map(lambda _: c.get_tool_executor(), range(8)))
+
+    assert len(built) == 1
+    assert all(executor is built[0] for executor in executors)
+    built[0].shutdown()
@@ -0,0 +1,118 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from backend.streaming import AsyncBridge, frame_ndjson, iterate_in_thread
+
+
+async def chunks(items, delay):
+    for item in items:
+        await asyncio.sleep(delay)
+        yield item
+
+
+def text(content):
+    return {"type": "text", "content": content}
+
+
+async def collect(items, delay, **kwargs):
+    return [
+        json.loads(line) async for line in frame_ndjson(chunks(items, delay), **kwargs)
+    ]
+
+
+def test_coalesces_text_and_flushes_schedules():
+    items = [text("a"), text("b"), text("c"), {"type": "schedule", "content": 1}]
+    items += [text("d"), text("e")]
+    lines = asyncio.run(collect(items, 0.001, window=1, max_chars=100))
+    assert lines == [
+        text("a"),
+        text("bc"),
+        {"type": "schedule", "content": 1},
+        text("de"),
+    ]
+
+
+def test_window_and_size_limits():
+    items = [text("a")] + [text("x" * 10)] * 4
+    # the window passes between chunks, every chunk gets its own line
+    assert len(asyncio.run(collect(items, 0.05, window=0.01, max_chars=100))) == 5
+    # size limit reached every two chunks
+    lines = asyncio.run(collect(items, 0.001, window=1, max_chars=20))
+    assert [line["content"] for line in lines] == ["a", "x" * 20, "x" * 20]
+    # no window, one line per chunk
+    assert asyncio.run(collect(items, 0, window=0)) == items
+
+
+def test_thread_items_arrive_in_order():
+    async def run():
+        return [item async for item in iterate_in_thread(iter(range(200)))]
+
+    assert asyncio.run(run()) == list(range(200))
+
+
+def test_worker_errors_reach_the_consumer():
+    def failing():
+        yield 1
+        raise ValueError("model stream broke")
+
+    async def run():
+        received = []
+        with pytest.raises(ValueError, match="model stream broke"):
+            async for item in iterate_in_thread(failing()):
+                received.append(item)
+        return received
+
+    assert asyncio.run(run()) == [1]
+
+
+def test_worker_stops_when_the_consumer_stops_early():
+    produced = []
+    stopped = threading.Event()
+
+    def endless():
+        try:
+            while True:
+                produced.append(len(produced))
+                yield produced[-1]
+                time.sleep(0.001)
+        finally:
+            stopped.set()
+
+    async def run():
+        items = iterate_in_thread(endless())
+        received = [await items.__anext__(), await items.__anext__()]
+        await items.aclose()
+        return received
+
+    assert asyncio.run(run()) == [0, 1]
+    assert stopped.wait(1)
+    count = len(produced)
+    time.sleep(0.02)
+    assert len(produced) == count
+
+
+def test_bridge_forwards_tool_updates_until_the_calls_finish():
+    async def run():
+        bridge = AsyncBridge()
+        loop = asyncio.get_running_loop()
+
+        def tool():
+            for i in range(3):
+                bridge.put(i)
+                time.sleep(0.005)
+            return "done"
+
+        pending = loop.run_in_executor(None, tool)
+        updates = [item async for item in bridge.until(pending)]
+        return updates, await pending
+
+    assert asyncio.run(run()) == ([0, 1, 2], "done")
@@ -0,0 +1,59 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+import time
+from backend.tool_cache import ToolCache
+
+
+def make_tool(cache, results):
+    calls = []
+
+    def tool(query):
+        """Docstring the model sees."""
+        calls.append(query)
+        return results(query)
+
+    return cache.wrap(tool, lambda query: query.lower()), calls
+
+
+def test_hits_share_results_and_keep_metadata():
+    cache = ToolCache(max_entries=10, ttl=60)
+    tool, calls = make_tool(cache, lambda q: {"search_result": [q]})
+
+    first = tool("Intro ML")
+    first["search_result"].append("edited by caller")
+    assert tool("intro ml") == {"search_result": ["Intro ML"]}
+    assert calls == ["Intro ML"]
+    assert tool.__name__ == "tool" and tool.__doc__ == "Docstring the model sees."
+    assert cache.hit_rate() == 0.5
+
+
+def test_lru_ttl_and_errors():
+    cache = ToolCache(max_entries=2, ttl=0.05)
+    tool, calls = make_tool(cache, lambda q: {"error": "down"} if q == "x" else q)
+
+    tool("a"), tool("b"), tool("c"), tool("a")
+    assert calls == ["a", "b", "c", "a"]
+
+    tool("x"), tool("x")
+    assert calls[-2:] == ["x", "x"]
+
+    time.sleep(0.06)
+    tool("c")
+    assert calls[-1] == "c"
+
+
+def test_invalidate_drops_entries_and_results_from_old_version():
+    cache = ToolCache(max_entries=10, ttl=60)
+
+    def slow(query):
+        # the data changes while this call is running
+        cache.invalidate()
+        return query
+
+    tool = cache.wrap(slow, lambda query: query)
+    tool("a")
+    assert cache.get((slow.__name__, cache.data_version, "a")) == (False, None)
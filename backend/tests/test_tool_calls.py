@@ -0,0 +1,184 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+import asyncio
+import threading
+import time
+
+import pytest
+from google.genai import types
+
+from backend import constants as c
+from backend import functions
+from backend.functions import batch_tool_calls, execute_tool_call, gemini_call_stream
+from backend.models import FakeBackend
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def calls(*names):
+    return [types.FunctionCall(name=name, args={}) for name in names]
+
+
+def test_read_only_calls_share_a_batch():
+    assert batch_tool_calls(calls("course_query", "get_term", "can_take_course")) == [
+        [0, 1, 2]
+    ]
+
+
+def test_mutating_calls_run_alone():
+    batches = batch_tool_calls(
+        calls(
+            "course_query",
+            "update_user_profile",
+            "update_user_profile",
+            "can_take_course",
+            "get_term",
+        )
+    )
+    assert batches == [[0], [1], [2], [3, 4]]
+
+
+def test_one_streaming_call_per_batch():
+    batches = batch_tool_calls(
+        calls("make_schedule", "course_query", "make_schedule", "get_term")
+    )
+    assert batches == [[0, 1], [2, 3]]
+
+
+class Tools:
+    """Stub tools with the real names, recording which of them overlapped."""
+
+    def __init__(self, on_data=None):
+        self.on_data = on_data
+        self.running = set()
+        self.overlaps = {}
+        self.lock = threading.Lock()
+
+    def _run(self, name, seconds, result):
+        with self.lock:
+            self.overlaps.setdefault(name, set()).update(self.running)
+            for other in self.running:
+                self.overlaps.setdefault(other, set()).add(name)
+            self.running.add(name)
+        time.sleep(seconds)
+        with self.lock:
+            self.running.discard(name)
+        return result
+
+    def all(self):
+        def course_query(args):
+            return self._run("course_query", 0.05, {"courses": [args.query]})
+
+        def update_user_profile(args):
+            return self._run("update_user_profile", 0.01, {"standing": args.standing})
+
+        def get_term():
+            return self._run("get_term", 0.02, {"response": "2026 Fall"})
+
+        def make_schedule(args):
+            for course in args.courses:
+                self.on_data({"course": course})
+            return self._run("make_schedule", 0.01, {"courses": args.courses})
+
+        def can_take_course(args):
+            raise ValueError(f"{args.course_name} is not a course")
+
+        return [
+            course_query,
+            update_user_profile,
+            get_term,
+            make_schedule,
+            can_take_course,
+        ]
+
+
+def test_execute_tool_call_validates_and_reports_errors():
+    tool_map = {f.__name__: f for f in Tools().all()}
+
+    def run(name, args):
+        call = types.FunctionCall(name=name, args=args)
+        return asyncio.run(execute_tool_call(call, tool_map))
+
+    assert run("course_query", {"query": "ml"}) == {"courses": ["ml"]}
+    # arguments wrapped in "args" by the model
+    assert run("course_query", {"args": {"query": "ml"}}) == {"courses": ["ml"]}
+    assert run("get_term", {}) == {"response": "2026 Fall"}
+    assert run("search_web", {}) == {"error": "Tool search_web not found"}
+    assert run("can_take_course", {"course_name": "XX 1"}) == {
+        "error": "XX 1 is not a course"
+    }
+    assert "error" in run("course_query", {"top_n": 5})
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    tools = Tools()
+
+    def get_tools(prereqs, term, on_data=None):
+        tools.on_data = on_data
+        return tools.all()
+
+    script = {
+        "rules": [
+            {
+                "match": ".*",
+                "calls": [
+                    {"name": "course_query", "args": {"query": "ml"}},
+                    {"name": "get_term", "args": {}},
+                    {"name": "update_user_profile", "args": {"standing": "JUNIOR"}},
+                    {"name": "make_schedule", "args": {"courses": ["CS 100"]}},
+                    {"name": "make_schedule", "args": {"courses": ["CS 280"]}},
+                ],
+            }
+        ],
+        "reply": "Done.",
+    }
+    monkeypatch.setattr(functions, "get_tools", get_tools)
+    monkeypatch.setattr(
+        c, "_ASYNC_REDIS", fakeredis.FakeAsyncRedis(decode_responses=True)
+    )
+    monkeypatch.setattr(
+        c, "_MODEL_BACKEND", FakeBackend(script, token_delay=0, first_token_delay=0)
+    )
+    return tools
+
+
+def test_turn_runs_batches_and_returns_results_in_call_order(chat):
+    async def run():
+        chunks = [
+            chunk
+            async for chunk in gemini_call_stream("plan my term", "tools-1", "202610")
+        ]
+        session = await functions.SESSION_STORE.load("tools-1")
+        return chunks, session.history
+
+    chunks, history = asyncio.run(run())
+
+    # course_query and get_term ran together, the profile update ran on its own
+    assert chat.overlaps == {
+        "course_query": {"get_term"},
+        "get_term": {"course_query"},
+        "update_user_profile": set(),
+        # the two schedules ran in separate batches
+        "make_schedule": set(),
+    }
+    # the streaming tools' updates arrive in call order
+    assert [c["content"] for c in chunks if c["type"] == "schedule"] == [
+        {"course": "CS 100"},
+        {"course": "CS 280"},
+    ]
+    responses = [part.function_response for part in history[2].parts]
+    assert [r.name for r in responses] == [
+        "course_query",
+        "get_term",
+        "update_user_profile",
+        "make_schedule",
+        "make_schedule",
+    ]
+    assert responses[0].response == {"courses": ["ml"]}
+    assert responses[1].response == {"response": "2026 Fall"}
+    assert responses[4].response == {"courses": ["CS 280"]}
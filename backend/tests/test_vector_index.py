@@ -0,0 +1,116 @@
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+import numpy as np
+import pytest
+from backend.vector_index import VectorIndex
+
+
+def make_index(n=50, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    ids = [f"CS {100 + i}" for i in range(n)]
+    index = VectorIndex()
+    index.upsert(ids, vectors, [f"doc {i}" for i in ids])
+    return index, ids, vectors
+
+
+def test_query_matches_brute_force_within_mask():
+    index, ids, vectors = make_index()
+    query = vectors[3] + 0.1
+    allowed = ids[::2]
+
+    results = index.query(query, index.mask(allowed), 5)
+
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    similarities = normalized @ (query / np.linalg.norm(query))
+    expected = sorted(allowed, key=lambda i: -similarities[ids.index(i)])[:5]
+    assert [r[0] for r in results] == expected
+    assert results[0][1] == f"doc {expected[0]}"
+    assert np.isclose(results[0][2], 2 - 2 * similarities[ids.index(expected[0])])
+
+
+def test_upsert_updates_rows_and_invalidates_masks():
+    index, ids, vectors = make_index()
+    mask = index.mask(ids)
+
+    index.upsert(["CS 100", "MATH 111"], [vectors[7], vectors[9]], ["new", "math"])
+    assert len(index) == 51
+    top = [r[0] for r in index.query(vectors[7], None, 2)]
+    assert sorted(top) == ["CS 100", "CS 107"]
+    assert index.query(vectors[9], index.mask(["MATH 111"]), 3)[0][:2] == (
+        "MATH 111",
+        "math",
+    )
+
+    with pytest.raises(ValueError):
+        index.query(vectors[0], mask, 5)
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    from backend import constants as c
+    from backend.types import CourseInfoModel
+    from backend.vector_index import COURSE_INDEX
+
+    ids = [f"CS {100 + i}" for i in range(10)]
+    saved = dict(c.COURSE_DATA)
+    c.COURSE_DATA.clear()
+    c.COURSE_DATA.update(
+        {i: CourseInfoModel.model_construct(prereq_tree=None) for i in ids}
+    )
+    vectors = np.eye(10, dtype=np.float32)
+    COURSE_INDEX.upsert(ids, vectors, [f"doc {i}" for i in ids])
+    yield ids, vectors
+    c.COURSE_DATA.clear()
+    c.COURSE_DATA.update(saved)
+    COURSE_INDEX.delete(ids + ["MATH 111"])
+
+
+def resync():
+    """Stands in for sync_course_index running on another thread."""
+    from backend.vector_index import COURSE_INDEX
+
+    COURSE_INDEX.upsert(["MATH 111"], [np.ones(10, dtype=np.float32)], ["math"])
+
+
+def test_mask_is_rebuilt_when_the_index_syncs_while_it_is_built(catalog, monkeypatch):
+    from backend import functions
+    from backend.types import UserFulfilled
+    from backend.vector_index import COURSE_INDEX
+
+    get_available_courses = functions.get_available_courses
+
+    def syncing(*args):
+        resync()
+        return get_available_courses(*args)
+
+    monkeypatch.setattr(functions, "get_available_courses", syncing)
+    mask = functions.available_mask(UserFulfilled(), True, False, "202610")
+    assert mask.version == COURSE_INDEX.version
+    assert COURSE_INDEX.filter(catalog[0], mask) == catalog[0]
+
+
+def test_course_query_survives_a_sync_during_the_query(catalog, monkeypatch):
+    from backend import functions
+    from backend.types import CourseQueryFormat, UserFulfilled
+
+    ids, vectors = catalog
+    # the sync lands between building the mask and searching with it
+    monkeypatch.setattr(functions, "embed_query", lambda text: resync() or vectors[3])
+    monkeypatch.setattr(functions, "rerank", lambda query, candidates, n: candidates)
+    tools = {f.__name__: f for f in functions.get_tools(UserFulfilled(), "202610")}
+
+    result = tools["course_query"](
+        CourseQueryFormat(
+            query="CS 103",
+            top_n=3,
+            only_prereqs_fulfilled=True,
+            only_current_semester=False,
+        )
+    )
+    assert "error" not in result
+    assert result["search_result"][0]["id"] == "CS 103"
@@ -0,0 +1,134 @@
+"""
+Shared cache for the read-only chatbot tools.
+
+course_query, get_course_description and get_term return the same result for the same
+arguments as long as the course data doesn't change (and, for course_query with
+only_prereqs_fulfilled, the same profile). get_tools wraps them with TOOL_CACHE.wrap so
+every session shares the results. Keys include the data version, which
+refresh_course_data bumps when the scraper publishes on course_updates.
+"""
+
+import copy
+import functools
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+from backend import metrics
+from backend.constants import TOOL_CACHE_SIZE, TOOL_CACHE_TTL_SECONDS
+from backend.types import UserFulfilled
+
+
+def normalize_text(text: str) -> str:
+    """Lowercases and collapses whitespace, the embedding and reranker models are uncased."""
+    return " ".join(text.lower().split())
+
+
+def profile_hash(user_prereqs: UserFulfilled) -> str:
+    """Hashes the parts of the profile that decide which prerequisites are satisfied."""
+    state = {
+        "courses": {
+            name: info.model_dump() for name, info in user_prereqs.courses.items()
+        },
+        "equivalents": sorted(user_prereqs.equivalents),
+        "standing": user_prereqs.standing,
+        "semesters_left": user_prereqs.semesters_left,
+    }
+    return hashlib.sha1(json.dumps(state, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def is_cacheable(result: Any) -> bool:
+    # errors from Chroma or the models may be transient, don't keep them
+    return not (isinstance(result, dict) and "error" in result)
+
+
+class ToolCache:
+    """
+    Thread-safe LRU cache with a TTL. Tools run on the tool executor, so lookups and
+    inserts happen from worker threads.
+    """
+
+    def __init__(
+        self, max_entries: int = TOOL_CACHE_SIZE, ttl: float = TOOL_CACHE_TTL_SECONDS
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.data_version = 0
+        self._lock = threading.Lock()
+        # key -> (expires_at, result)
+        self._entries: OrderedDict[Hashable, Tuple[float, Any]] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+        metrics.register_gauge("tool_cache.entries", lambda: len(self._entries))
+        metrics.register_gauge("tool_cache.hit_rate", self.hit_rate)
+
+    def hit_rate(self) -> float:
+        total = self._hits + self._misses
+        return round(self._hits / total, 4) if total else 0.0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._hits += 1
+                found = True
+            else:
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                found = False
+
+        metrics.incr("tool_cache.hits" if found else "tool_cache.misses")
+        # callers get their own copy, results end up in (and get edited with) the history
+        return found, copy.deepcopy(entry[1]) if found else None
+
+    def put(self, key: Hashable, result: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                metrics.incr("tool_cache.evictions")
+
+    def invalidate(self) -> None:
+        """Drops every entry and bumps the data version, called when course data changes."""
+        with self._lock:
+            self.data_version += 1
+            self._entries.clear()
+        metrics.incr("tool_cache.invalidations")
+
+    def wrap(
+        self, fn: Callable[..., Any], key_fn: Callable[..., Optional[Hashable]]
+    ) -> Callable[..., Any]:
+        """
+        Returns fn going through the cache. key_fn gets the tool's arguments and returns
+        the key, or None to skip the cache. functools.wraps keeps the name, docstring and
+        signature the model's function declarations are built from.
+        """
+
+        @functools.wraps(fn)
+        def cached(*args):
+            key = key_fn(*args)
+            if key is None:
+                return fn(*args)
+            # taken before the call, so a result computed across a refresh is never
+            # stored under the new version
+            key = (fn.__name__, self.data_version, key)
+
+            found, result = self.get(key)
+            if found:
+                return result
+            result = fn(*args)
+            if is_cacheable(result):
+                self.put(key, result)
+            return result
+
+        return cached
+
+
+TOOL_CACHE = ToolCache()
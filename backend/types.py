@@ -326,6 +326,8 @@ class CourseMetadata(BaseModel):
     title: str
     description: str
     hash: str
+    # INFERENCE_BACKEND the embedding was computed with
+    embedding_variant: str = "torch"
 
 
 #### ---- TYPES - END ---- ####
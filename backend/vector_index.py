@@ -0,0 +1,224 @@
+"""
+In-memory vector index over the course embeddings.
+
+The catalog is small, so all course embeddings fit in one normalized float32 matrix.
+course_query selects its candidates with a boolean row mask (term and prerequisite
+filters) and a single matrix-vector product plus argpartition, instead of sending the
+allowed ids to Chroma on every call. Chroma stays the persistent store: the index is
+loaded from the collection and kept in step with it by sync_course_index.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+STALE_MASK = "Mask was built for another version of the index."
+
+
+class StaleMaskError(ValueError):
+    """A mask was used with another version of the index than it was built for."""
+
+
+class RowMask:
+    """Rows of one version of the index that a query may return."""
+
+    def __init__(self, version: int, rows: np.ndarray):
+        self.version = version
+        self.rows = rows
+
+    def __and__(self, other: "RowMask") -> "RowMask":
+        if self.version != other.version:
+            raise StaleMaskError(STALE_MASK)
+        return RowMask(self.version, self.rows & other.rows)
+
+
+class _Snapshot:
+    """Immutable state of the index, replaced as a whole on every update."""
+
+    def __init__(
+        self, ids: List[str], matrix: np.ndarray, documents: List[str], version: int
+    ):
+        self.ids = ids
+        self.positions = {course_id: i for i, course_id in enumerate(ids)}
+        self.matrix = matrix
+        self.documents = documents
+        self.version = version
+
+
+class VectorIndex:
+    def __init__(self, dim: Optional[int] = None):
+        self._lock = threading.Lock()
+        self._snapshot = _Snapshot([], np.zeros((0, dim or 0), dtype=np.float32), [], 0)
+
+    def __len__(self) -> int:
+        return len(self._snapshot.ids)
+
+    @property
+    def version(self) -> int:
+        """Changes on every update, masks built for an older version are stale."""
+        return self._snapshot.version
+
+    def load(self, collection) -> None:
+        """Replaces the index with everything stored in a Chroma collection."""
+        data = collection.get(include=["embeddings", "documents"])
+        with self._lock:
+            self._snapshot = _Snapshot(
+                list(data["ids"]),
+                (
+                    normalize_rows(data["embeddings"])
+                    if len(data["ids"])
+                    else self._snapshot.matrix[:0]
+                ),
+                list(data["documents"]),
+                self._snapshot.version + 1,
+            )
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        documents: Sequence[str],
+    ) -> None:
+        rows = normalize_rows(embeddings)
+        with self._lock:
+            old = self._snapshot
+            if len(old.ids) and old.matrix.shape[1] != rows.shape[1]:
+                raise ValueError("Embedding dimension does not match the index.")
+            new_ids = [i for i in dict.fromkeys(ids) if i not in old.positions]
+            # a new matrix, queries running on the old snapshot are not affected
+            matrix = np.vstack(
+                [
+                    old.matrix.reshape(len(old.ids), rows.shape[1]),
+                    np.zeros((len(new_ids), rows.shape[1]), np.float32),
+                ]
+            )
+            all_ids = old.ids + new_ids
+            all_documents = old.documents + [""] * len(new_ids)
+            positions = {course_id: i for i, course_id in enumerate(all_ids)}
+            for course_id, row, document in zip(ids, rows, documents):
+                matrix[positions[course_id]] = row
+                all_documents[positions[course_id]] = document
+            self._snapshot = _Snapshot(all_ids, matrix, all_documents, old.version + 1)
+
+    def delete(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            old = self._snapshot
+            removed = {i for i in ids if i in old.positions}
+            if not removed:
+                return
+            keep = [
+                i for i, course_id in enumerate(old.ids) if course_id not in removed
+            ]
+            self._snapshot = _Snapshot(
+                [old.ids[i] for i in keep],
+                old.matrix[keep],
+                [old.documents[i] for i in keep],
+                old.version + 1,
+            )
+
+    def mask(self, course_ids: Iterable[str]) -> RowMask:
+        """Row mask selecting the given courses."""
+        snapshot = self._snapshot
+        rows = np.zeros(len(snapshot.ids), dtype=bool)
+        rows[[snapshot.positions[i] for i in course_ids if i in snapshot.positions]] = (
+            True
+        )
+        return RowMask(snapshot.version, rows)
+
+    def query(
+        self, embedding: Sequence[float], mask: Optional[RowMask], k: int
+    ) -> List[Tuple[str, str, float]]:
+        """
+        Returns up to k (id, document, distance) of the rows in mask closest to the
+        embedding. The distance is the squared L2 distance of the normalized vectors,
+        which is what the Chroma collection reports.
+        """
+        snapshot = self._snapshot
+        if not len(snapshot.ids):
+            return []
+        similarities = snapshot.matrix @ normalize_rows(embedding)[0]
+        if mask is not None:
+            if mask.version != snapshot.version:
+                raise StaleMaskError(STALE_MASK)
+            candidates = np.flatnonzero(mask.rows)
+        else:
+            candidates = np.arange(len(similarities))
+        if k < len(candidates):
+            top = np.argpartition(-similarities[candidates], k)[:k]
+            candidates = candidates[top]
+        candidates = candidates[np.argsort(-similarities[candidates], kind="stable")]
+
+        return [
+            (
+                snapshot.ids[i],
+                snapshot.documents[i],
+                float(2.0 - 2.0 * similarities[i]),
+            )
+            for i in candidates
+        ]
+
+    def lookup(
+        self, embedding: Sequence[float], ids: Iterable[str], mask: Optional[RowMask]
+    ) -> List[Tuple[str, str, float]]:
+        """(id, document, distance) of the given courses that are indexed and in mask."""
+        snapshot = self._snapshot
+        if mask is not None and mask.version != snapshot.version:
+            raise StaleMaskError(STALE_MASK)
+        rows = [snapshot.positions[i] for i in ids if i in snapshot.positions]
+        if mask is not None:
+            rows = [i for i in rows if mask.rows[i]]
+        if not rows:
+            return []
+        similarities = snapshot.matrix[rows] @ normalize_rows(embedding)[0]
+        return [
+            (snapshot.ids[i], snapshot.documents[i], float(2.0 - 2.0 * similarity))
+            for i, similarity in zip(rows, similarities)
+        ]
+
+    def filter(self, ids: Iterable[str], mask: RowMask) -> List[str]:
+        """The given course ids that are in mask."""
+        snapshot = self._snapshot
+        if mask.version != snapshot.version:
+            raise StaleMaskError(STALE_MASK)
+        positions = snapshot.positions
+        return [i for i in ids if i in positions and mask.rows[positions[i]]]
+
+
+class MaskCache:
+    """
+    Small thread-safe LRU of row masks. Masks built for an older version of the index
+    are rebuilt, keys must cover everything else the mask depends on.
+    """
+
+    def __init__(self, index: VectorIndex, max_entries: int = 256):
+        self.index = index
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._masks: OrderedDict[Hashable, RowMask] = OrderedDict()
+
+    def get(self, key: Hashable, build: Callable[[], RowMask]) -> RowMask:
+        with self._lock:
+            mask = self._masks.get(key)
+            if mask is not None and mask.version == self.index.version:
+                self._masks.move_to_end(key)
+                return mask
+        mask = build()
+        with self._lock:
+            self._masks[key] = mask
+            while len(self._masks) > self.max_entries:
+                self._masks.popitem(last=False)
+        return mask
+
+
+COURSE_INDEX = VectorIndex()